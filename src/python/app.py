@@ -1,22 +1,44 @@
 import os
-import shutil
 import aiofiles
 import asyncio
 from typing import List
+from contextlib import aclosing
 from asyncio import gather
 from fastapi import Request, UploadFile, File, HTTPException
-from fastapi.responses import StreamingResponse, HTMLResponse
+from fastapi.responses import HTMLResponse, JSONResponse
 
 from services import Services
 from prompt_request import PromptRequest
+from generation_scheduler import SchedulerFullError
+from closing_streaming_response import ClosingStreamingResponse
 
 services = Services()
 app = services.get_app()
 logger = services.get_logger()
 templates = services.get_templates()
 response_generator = services.get_response_generator()
-document_indexer = services.get_document_indexer()
-database_manager = services.get_database_manager()
+generation_scheduler = services.get_generation_scheduler()
+generation_coalescer = services.get_generation_coalescer()
+ollama_router = services.get_ollama_router()
+chat_session_store = services.get_chat_session_store()
+ingestion_queue = services.get_ingestion_queue()
+
+
+@app.get("/healthz")
+async def healthz_api():
+    # Liveness: the server answers, even while the components are still initializing
+    return {"status": "ok"}
+
+
+@app.get("/readyz")
+async def readyz_api():
+    # Readiness: every component is initialized
+    components = services.get_readiness()
+    ready = all(state == "ready" for state in components.values())
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"status": "ready" if ready else "not ready", "components": components}
+    )
 
 
 # Route to serve the main index HTML page
@@ -49,42 +71,50 @@ async def set_system_prompt_api(request: Request):
         raise HTTPException(status_code=500, detail="Failed to set system prompt.")
 
 
-@app.post("/upload-documents/")
+@app.post("/upload-documents/", status_code=202)
 async def upload_documents_api(files: List[UploadFile] = File(...)):
-    # Define the path for the temporary directory
-    temp_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), r"../resources/data"))
-    os.makedirs(temp_directory, exist_ok=True)
+    # Each upload gets its own workspace, so concurrent uploads never touch each other's files
+    job_id, workspace = ingestion_queue.create_workspace()
 
     try:
+        # Only the base names are kept so the files stay inside the workspace. Files with the same base name would
+        # overwrite each other, so they are rejected before anything is saved.
+        filenames = [os.path.basename(file.filename or "") for file in files]
+        if not all(filenames):
+            raise HTTPException(status_code=400, detail="Every uploaded file must have a name.")
+        duplicates = sorted({filename for filename in filenames if filenames.count(filename) > 1})
+        if duplicates:
+            raise HTTPException(status_code=400, detail=f"Several uploaded files are named {', '.join(duplicates)}.")
+
         # Asynchronous function to save a file
-        async def save_file(file: UploadFile):
-            file_path = os.path.join(temp_directory, file.filename)
-            async with aiofiles.open(file_path, "wb") as buffer:
+        async def save_file(file: UploadFile, filename: str):
+            async with aiofiles.open(os.path.join(workspace, filename), "wb") as buffer:
                 content = await file.read()
                 await buffer.write(content)
-            return file_path
 
         # Save the files asynchronously
-        tasks = [save_file(file) for file in files]
-        file_paths = await gather(*tasks)
-
-        # Index the documents using a thread for synchronous indexing
-        await asyncio.to_thread(document_indexer.index_documents, temp_directory)
+        tasks = [save_file(file, filename) for file, filename in zip(files, filenames)]
+        await gather(*tasks)
 
-        logger.info("Documents uploaded and indexed successfully.")
-        return {"message": "Documents uploaded and indexed successfully."}
+        # The documents are indexed in the background, the client follows the progress at /jobs/{job_id}
+        await asyncio.to_thread(ingestion_queue.submit, job_id, filenames)
+        return {"message": "Documents uploaded, indexing in progress.", "job_id": job_id}
 
     except Exception as e:
-        logger.error(f"Failed to index uploaded documents: {e}")
-        raise HTTPException(status_code=500, detail="Failed to index uploaded documents.")
+        await asyncio.to_thread(ingestion_queue.remove_workspace, job_id)
+        if isinstance(e, HTTPException):
+            raise
+        logger.error(f"Failed to upload documents: {e}")
+        raise HTTPException(status_code=500, detail="Failed to upload documents.")
 
-    finally:
-        # Clean up by removing the temporary directory and its contents
-        try:
-            shutil.rmtree(temp_directory)
-            logger.info("Temporary files cleaned up successfully.")
-        except Exception as e:
-            logger.error(f"Failed to delete temporary directory {temp_directory}: {e}")
+
+@app.get("/jobs/{job_id}")
+async def get_job_api(job_id: str):
+    # Report the status of an upload, the progress and errors of each file, and the indexing rate
+    job = await asyncio.to_thread(ingestion_queue.get_job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return job
 
 
 @app.post("/toggle-rag/")
@@ -127,7 +157,6 @@ async def generate_response_api(request: PromptRequest):
         if not request.prompt or not request.prompt.strip():
             raise HTTPException(status_code=400, detail="Prompt cannot be empty.")
         
-        await services.set_generating_response(True)
         prompt = request.prompt.strip()
         top_n = request.top_n if request.top_n is not None else 3
         num_ctx = request.num_ctx
@@ -147,35 +176,136 @@ async def generate_response_api(request: PromptRequest):
                     f"temperature: {temperature}, repeat_last_n: {repeat_last_n}, "
                     f"repeat_penalty: {repeat_penalty}")
 
-        async def generate():
+        rag_enabled = services.is_rag_enabled()
+        if rag_enabled and not services.is_ready("document_retriever"):
+            raise HTTPException(
+                status_code=503,
+                detail="Document retrieval is still initializing. Please retry later.",
+                headers={"Retry-After": "5"}
+            )
+
+        # Continue the chat session of the client, or start a new one if the ID is unknown or expired.
+        # Requests without a session ID are answered without conversation history.
+        session_id = None
+        if chat_session_store and request.session_id:
+            session_id = chat_session_store.open_session(request.session_id)
+
+        # Identical requests in flight share one upstream generation
+        coalesce_key = None
+        if generation_coalescer:
+            database_manager = services.get_ready_component("database_manager")
+            coalesce_key = generation_coalescer.make_key(
+                prompt,
+                rag_enabled=rag_enabled,
+                top_n=top_n if rag_enabled else None,
+                num_ctx=num_ctx,
+                temperature=temperature,
+                repeat_last_n=repeat_last_n,
+                repeat_penalty=repeat_penalty,
+                model=response_generator.model,
+                system_prompt=response_generator.system_prompt,
+                corpus_version=database_manager.get_corpus_version() if database_manager else None,
+                session_id=session_id
+            )
+
+        # Look up the caches before reserving a generation slot, so that cached answers are replayed without one:
+        # they neither wait behind the running generations nor get rejected when the queue is full.
+        # Requests joining an identical generation in progress are prepared by that generation.
+        prepared = None
+        joining = coalesce_key is not None and generation_coalescer.is_in_flight(coalesce_key)
+        if not joining:
+            prepared = await response_generator.prepare_response(
+                prompt,
+                num_ctx=num_ctx,
+                temperature=temperature,
+                repeat_last_n=repeat_last_n,
+                repeat_penalty=repeat_penalty,
+                top_n=top_n if rag_enabled else None,
+                session_id=session_id
+            )
+        cached = prepared is not None and prepared["cached_chunks"] is not None
+
+        # Reserve a generation slot or a place in the queue, rejecting the request if the queue is full
+        ticket = None
+        if not joining and not cached:
+            try:
+                ticket = generation_scheduler.reserve()
+            except SchedulerFullError as e:
+                raise HTTPException(
+                    status_code=429,
+                    detail="Too many generations in progress. Please retry later.",
+                    headers={"Retry-After": str(e.retry_after)}
+                )
+        queue_position = ticket.position if ticket else 0
+
+        # Register the generation so the client can stop it using the ID returned in the response headers
+        generation_id = response_generator.start_generation()
+        logger.info(f"Started generation {generation_id} at queue position {queue_position}.")
+
+        async def produce(upstream_generation_id=None):
+            nonlocal ticket
+            # The reservation is handed over to the upstream generation, which releases it
+            own_ticket = ticket
+            ticket = None
             try:
-                if services.is_rag_enabled():
+                await generation_scheduler.wait(own_ticket)
+
+                if rag_enabled:
                     logger.info("Using RAG-enabled response generation.")
-                    # Use RAG-based response generation
-                    async for chunk in response_generator.generate_response_with_retriever(
-                        prompt,
-                        top_n=top_n,
-                        num_ctx=num_ctx,
-                        temperature=temperature,
-                        repeat_last_n=repeat_last_n,
-                        repeat_penalty=repeat_penalty
-                    ):
-                        yield chunk
                 else:
                     logger.info("Using standard response generation.")
-                    # Use standard response generation
-                    async for chunk in response_generator.generate_response(
-                        prompt,
-                        num_ctx=num_ctx,
-                        temperature=temperature,
-                        repeat_last_n=repeat_last_n,
-                        repeat_penalty=repeat_penalty
-                    ):
-                        yield chunk
+                async for chunk in response_generator.generate_prepared_response(prepared, upstream_generation_id):
+                    yield chunk
             finally:
-                await services.set_generating_response(False)
+                generation_scheduler.release(own_ticket)
+
+        # Join the identical generation seen in flight above, with no await in between so that it cannot finish first,
+        # or start one with the reservation. If an identical generation started while this one was prepared, it is
+        # joined instead and the unused reservation is released when the response ends.
+        flight = generation_coalescer.join(coalesce_key, produce) if coalesce_key is not None and not cached else None
+
+        def close_generation():
+            # Runs when the response ends, including when the client left before its body was iterated
+            nonlocal ticket, flight
+            response_generator.end_generation(generation_id)
+            # Release the reservation if it was not handed over to the upstream generation
+            if ticket is not None:
+                generation_scheduler.release(ticket)
+                ticket = None
+            # The upstream generation is cancelled once every subscriber has left
+            if flight is not None:
+                generation_coalescer.leave(flight)
+                flight = None
 
-        return StreamingResponse(generate(), media_type="text/plain")
+        async def generate():
+            try:
+                if cached:
+                    stream = response_generator.generate_prepared_response(prepared, generation_id)
+                elif flight is None:
+                    stream = produce(generation_id)
+                else:
+                    # Stopping this generation only unsubscribes it
+                    stream = generation_coalescer.stream(flight, stop_event=response_generator.get_stop_event(generation_id))
+                async with aclosing(stream):
+                    async for chunk in stream:
+                        yield chunk
+            except (asyncio.CancelledError, GeneratorExit):
+                # The client disconnected: closing the stream aborts the upstream Ollama request
+                logger.info(f"Client disconnected, generation {generation_id} aborted.")
+                raise
+            finally:
+                close_generation()
+
+        headers = {"X-Generation-ID": generation_id, "X-Queue-Position": str(queue_position)}
+        if session_id:
+            headers["X-Session-ID"] = session_id
+
+        return ClosingStreamingResponse(
+            generate(),
+            on_close=close_generation,
+            media_type="text/plain",
+            headers=headers
+        )
     
     except HTTPException:
         raise
@@ -184,9 +314,24 @@ async def generate_response_api(request: PromptRequest):
         raise HTTPException(status_code=500, detail="Failed to generate response.")
 
 
-@app.post("/stop-generation")
-async def stop_generation():
-    response_generator.stop_generation = True
+@app.get("/scheduler-stats/")
+async def scheduler_stats_api():
+    # Report the current load of the generation scheduler and the coalesced requests
+    stats = generation_scheduler.get_stats()
+    stats["coalescer"] = generation_coalescer.get_stats() if generation_coalescer else None
+    return stats
+
+
+@app.get("/backend-stats/")
+async def backend_stats_api():
+    # Report the health and the load of each Ollama backend
+    return {"backends": ollama_router.get_stats()}
+
+
+@app.post("/stop-generation/{generation_id}")
+async def stop_generation_api(generation_id: str):
+    if not response_generator.stop_generation(generation_id):
+        raise HTTPException(status_code=404, detail="No generation in progress with this ID.")
     return {"message": "Generation stopped."}
 
 
@@ -194,7 +339,8 @@ async def stop_generation():
 async def cleanup_database_api():
     try:
         # Clean up the database by deleting records and resetting the FAISS index
-        database_manager.clean_database()
+        database_manager = await services.wait_for_component("database_manager")
+        await asyncio.to_thread(database_manager.clean_database)
         logger.info("Database cleaned successfully.")
         return {"message": "Database cleaned successfully."}
 
@@ -203,6 +349,20 @@ async def cleanup_database_api():
         raise HTTPException(status_code=500, detail="Failed to clean the database.")
 
 
+@app.get("/cache-stats/")
+async def cache_stats_api():
+    # Report the hit and miss counters of the enabled caches
+    embedding_cache = services.get_ready_component("embedding_cache")
+    response_cache = services.get_ready_component("response_cache")
+    semantic_cache = services.get_ready_component("semantic_cache")
+    return {
+        "embedding_cache": embedding_cache.get_stats() if embedding_cache else None,
+        "response_cache": response_cache.get_stats() if response_cache else None,
+        "semantic_cache": semantic_cache.get_stats() if semantic_cache else None,
+        "chat_sessions": chat_session_store.get_stats() if chat_session_store else None
+    }
+
+
 # Entry point to run the FastAPI application using Uvicorn
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,131 @@
+import time
+import uuid
+import threading
+from collections import OrderedDict
+
+class ChatSessionStore:
+    """
+    Server-side conversation history of the chat sessions.
+    Each session keeps the messages exchanged with the model, exactly as they were sent, so that follow-up turns
+    extend the previous prompt and Ollama only has to prefill the new tokens. The history sent with a turn is
+    capped by a token budget, dropping the oldest turns first. Sessions expire after a TTL and the least recently
+    used ones are evicted beyond the size limit.
+    """
+
+    def __init__(self, logger=None, token_counter=None, max_history_tokens=2048, ttl=3600, max_sessions=1000):
+        self.logger = logger
+        self.token_counter = token_counter
+        self.max_history_tokens = max_history_tokens
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+
+    def open_session(self, session_id=None):
+        """
+        Resume a session, or start a new one if the session does not exist or expired.
+
+        Args:
+            session_id (str, optional): The ID of the session to resume.
+
+        Returns:
+            str: The ID of the session to use.
+        """
+        with self._lock:
+            self._evict_expired()
+            session = self._sessions.get(session_id) if session_id else None
+            if session is None:
+                if session_id:
+                    self.logger.info(f"Chat session {session_id} not found, starting a new session.")
+                session_id = uuid.uuid4().hex
+                session = {"turns": [], "expires_at": 0}
+                self._sessions[session_id] = session
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+            self._sessions.move_to_end(session_id)
+            session["expires_at"] = time.monotonic() + self.ttl
+            return session_id
+
+
+    def get_history(self, session_id):
+        """
+        Return the most recent turns of a session fitting in the history token budget.
+
+        Args:
+            session_id (str): The ID of the session.
+
+        Returns:
+            tuple: The messages of the kept turns, oldest first, and their number of tokens.
+        """
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return [], 0
+
+            kept_turns = []
+            history_tokens = 0
+            for turn in reversed(session["turns"]):
+                if history_tokens + turn["tokens"] > self.max_history_tokens:
+                    break
+                kept_turns.append(turn)
+                history_tokens += turn["tokens"]
+
+            dropped = len(session["turns"]) - len(kept_turns)
+            if dropped:
+                self.logger.info(f"Chat session {session_id}: {dropped} oldest turns exceed the history budget and are not sent.")
+                # The dropped turns can never be sent again, as the history only grows
+                del session["turns"][:dropped]
+
+            messages = [message for turn in reversed(kept_turns) for message in turn["messages"]]
+            return messages, history_tokens
+
+
+    def append_turn(self, session_id, user_message, assistant_message):
+        """
+        Record a completed turn of a session.
+
+        Args:
+            session_id (str): The ID of the session.
+            user_message (str): The user message as it was sent to the model, without the retrieved documents.
+            assistant_message (str): The complete answer of the model.
+        """
+        tokens = sum(self.token_counter.count_many([user_message, assistant_message]))
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return
+            session["turns"].append({
+                "messages": [
+                    {"role": "user", "content": user_message},
+                    {"role": "assistant", "content": assistant_message},
+                ],
+                "tokens": tokens,
+            })
+
+
+    def _evict_expired(self):
+        """
+        Remove the expired sessions. Must be called with the lock held.
+        """
+        now = time.monotonic()
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if session["expires_at"] >= now:
+                break
+            del self._sessions[session_id]
+
+
+    def get_stats(self):
+        """
+        Return the number of sessions in memory.
+
+        Returns:
+            dict: The number of sessions and of turns they hold.
+        """
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "turns": sum(len(session["turns"]) for session in self._sessions.values()),
+            }
@@ -0,0 +1,19 @@
+from fastapi.responses import StreamingResponse
+
+class ClosingStreamingResponse(StreamingResponse):
+    """
+    A streaming response that runs a cleanup callback once it is finished or abandoned.
+    The callback also runs when the client disconnects before the body is iterated, in which case the
+    body generator never starts and its own finally blocks never run.
+    """
+
+    def __init__(self, content, on_close, **kwargs):
+        super().__init__(content, **kwargs)
+        self.on_close = on_close
+
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.on_close()
@@ -1,8 +1,13 @@
 import os
+import json
+import fcntl
 import faiss
 import sqlite3
+import threading
 import numpy as np
 
+from read_write_lock import ReadWriteLock
+
 class DatabaseManager:
     """
     Singleton class for managing interactions with SQLite and FAISS databases.
@@ -10,13 +15,56 @@ class DatabaseManager:
     """
     _instance = None
 
-    def __new__(cls, logger=None, sqlite_db_path=None, faiss_db_path=None):
+    # Pragmas applied to every SQLite connection. WAL lets readers proceed while an upload is writing.
+    SQLITE_PRAGMAS = {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -65536,  # Negative values are expressed in KiB (64 MiB)
+        "mmap_size": 268435456,  # 256 MiB
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,  # Milliseconds
+    }
+
+    # Number of prepared statements kept per connection
+    SQLITE_CACHED_STATEMENTS = 128
+
+    # FAISS index factory descriptions of the supported index types
+    FAISS_INDEX_TYPES = {
+        "flat": lambda config: "Flat",
+        "ivf_flat": lambda config: f"IVF{config.get('nlist', 1024)},Flat",
+        "ivf_pq": lambda config: f"IVF{config.get('nlist', 1024)},PQ{config.get('pq_m', 48)}x{config.get('pq_nbits', 8)}",
+        "hnsw": lambda config: f"HNSW{config.get('hnsw_m', 32)}",
+        "sq8": lambda config: "SQ8",
+        "sq_fp16": lambda config: "SQfp16",
+        "pq": lambda config: f"PQ{config.get('pq_m', 48)}x{config.get('pq_nbits', 8)}",
+        "ivf_sq8": lambda config: f"IVF{config.get('nlist', 1024)},SQ8",
+    }
+
+    # Stored vectors required before training the index types that do not use train_min_vectors. SQ8 only learns
+    # the range of each dimension, and PQ trains 2^pq_nbits centroids per sub-quantizer, so both need far fewer
+    # vectors than the thousands of IVF lists.
+    FAISS_TRAIN_MIN_VECTORS = {
+        "sq8": lambda config: config.get('sq_train_min_vectors', 1000),
+        "pq": lambda config: config.get('pq_train_min_vectors', 256 * config.get('pq_m', 48)),
+    }
+
+    # Index types that store the vectors uncompressed, so their search scores are exact
+    FAISS_EXACT_INDEX_TYPES = ("flat", "ivf_flat", "hnsw")
+
+    # FAISS metrics. With the inner product metric the vectors are L2-normalized, so scores are cosine similarities.
+    FAISS_METRICS = {
+        "inner_product": faiss.METRIC_INNER_PRODUCT,
+        "l2": faiss.METRIC_L2,
+    }
+
+    def __new__(cls, logger=None, sqlite_db_path=None, faiss_db_path=None, faiss_config=None):
         """
         Create or return the singleton instance of DatabaseManager.
 
         Args:
             sqlite_db_path (str, optional): Path to the SQLite database file.
             faiss_db_path (str, optional): Path to the FAISS index file.
+            faiss_config (dict, optional): The FAISS index settings (type, dimension and tuning knobs).
 
         Returns:
             DatabaseManager: The singleton instance of the DatabaseManager class.
@@ -27,6 +75,25 @@ class DatabaseManager:
             cls._instance.sqlite_db_path = None
             cls._instance.faiss_db_path = None
             cls._instance.index = None
+            cls._instance.delta_index = None
+            cls._instance.fallback_index = None
+            cls._instance._index_mmapped = False
+            cls._instance.fts_enabled = False
+            cls._instance._index_generation = None
+            cls._instance._reset_generation = None
+            cls._instance._loaded_chunk_id = 0
+            cls._instance._index_stale = False
+            cls._instance.faiss_config = {}
+            # Searches share the index, changing it or swapping it takes the lock exclusively
+            cls._instance._index_lock = ReadWriteLock()
+            # Serializes the writes of the index file; never taken while holding the index lock
+            cls._instance._save_lock = threading.Lock()
+            cls._instance._local = threading.local()
+            cls._instance._connections = []
+            cls._instance._connections_lock = threading.Lock()
+
+        if faiss_config is not None:
+            cls._instance.faiss_config = faiss_config
 
         # Initialize paths if provided
         if sqlite_db_path or faiss_db_path:
@@ -50,6 +117,9 @@ class DatabaseManager:
             self.faiss_db_path = faiss_db_path
             self._initialize_sqlite()
             self._initialize_faiss()
+            self._backfill_chunk_vectors()
+            self._migrate_faiss_metric()
+            self._sync_faiss_index()
         else:
             self.logger.info("DatabaseManager is already initialized.")
 
@@ -65,22 +135,100 @@ class DatabaseManager:
             raise ValueError("DatabaseManager is not initialized. Please provide paths to initialize it.")
 
 
+    def _get_connection(self):
+        """
+        Return the persistent SQLite connection of the calling thread, opening it on first use.
+
+        Connections are kept open for the lifetime of the thread so that the pragmas and the
+        prepared statement cache are reused across calls.
+
+        Returns:
+            sqlite3.Connection: The connection owned by the calling thread.
+        """
+        self._check_initialized()
+        conn = getattr(self._local, "connection", None)
+        if conn is None:
+            conn = sqlite3.connect(
+                self.sqlite_db_path,
+                cached_statements=self.SQLITE_CACHED_STATEMENTS,
+                check_same_thread=False
+            )
+            for pragma, value in self.SQLITE_PRAGMAS.items():
+                conn.execute(f"PRAGMA {pragma} = {value}")
+            self._local.connection = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+            self.logger.debug(f"Opened SQLite connection for thread {threading.current_thread().name}.")
+        return conn
+
+
+    def close_connections(self):
+        """
+        Close every SQLite connection opened by the DatabaseManager.
+        """
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.Error as e:
+                self.logger.error(f"Error closing SQLite connection: {e}")
+        self._local = threading.local()
+        self.logger.info(f"Closed {len(connections)} SQLite connections.")
+
+
+    def get_corpus_version(self):
+        """
+        Return the version of the document corpus, incremented whenever documents are added or removed.
+        Caches derived from the documents compare it to detect stale entries.
+
+        The version is the index generation stored in SQLite, so it also changes when another worker
+        process adds or removes documents.
+
+        Returns:
+            int: The current corpus version.
+        """
+        try:
+            return self._read_index_state(self._get_connection())[0]
+        except sqlite3.Error as e:
+            self.logger.error(f"Error reading the index generation: {e}")
+            return self._index_generation
+
+
+    @staticmethod
+    def _read_index_state(conn):
+        """
+        Read the index generation counters shared by every worker process.
+
+        Returns:
+            tuple: The generation, incremented whenever chunks are added or removed, and the generation
+                of the last cleanup, after which the FAISS index must be emptied.
+        """
+        return conn.execute('SELECT generation, reset_generation FROM index_state WHERE id = 1').fetchone()
+
+
     def _initialize_sqlite(self):
         """
         Initialize the SQLite database, ensuring necessary tables exist.
         """
         self._check_initialized()
+        conn = self._get_connection()
         try:
-            conn = sqlite3.connect(self.sqlite_db_path)
             cursor = conn.cursor()
 
-            # Create the documents table
+            # Create the documents table, with the ingestion job that stored each document
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS documents (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    title TEXT NOT NULL
+                    title TEXT NOT NULL,
+                    job_id TEXT
                 )
             ''')
+            columns = [row[1] for row in cursor.execute('PRAGMA table_info(documents)')]
+            if 'job_id' not in columns:
+                # Migrate databases created before the documents were tied to their ingestion job
+                cursor.execute('ALTER TABLE documents ADD COLUMN job_id TEXT')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_documents_job_id ON documents (job_id)')
             self.logger.info("Ensured 'documents' table exists in SQLite database.")
 
             # Create the chunks table
@@ -94,11 +242,83 @@ class DatabaseManager:
             ''')
             self.logger.info("Ensured 'chunks' table exists in SQLite database.")
 
+            # Create the chunk_vectors table, keeping the exact vector of each chunk next to its text
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS chunk_vectors (
+                    chunk_id INTEGER PRIMARY KEY,
+                    vector BLOB NOT NULL,
+                    FOREIGN KEY (chunk_id) REFERENCES chunks (id)
+                )
+            ''')
+            self.logger.info("Ensured 'chunk_vectors' table exists in SQLite database.")
+
+            # Create the index_state table, holding the generation counters every worker compares to its FAISS index
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS index_state (
+                    id INTEGER PRIMARY KEY CHECK (id = 1),
+                    generation INTEGER NOT NULL,
+                    reset_generation INTEGER NOT NULL
+                )
+            ''')
+            cursor.execute('INSERT OR IGNORE INTO index_state (id, generation, reset_generation) VALUES (1, 0, 0)')
+            self.logger.info("Ensured 'index_state' table exists in SQLite database.")
+
             conn.commit()
         except sqlite3.Error as e:
+            conn.rollback()
             self.logger.error(f"Error initializing the SQLite database: {e}")
-        finally:
-            conn.close()
+
+        self._initialize_fts()
+
+
+    def _initialize_fts(self):
+        """
+        Initialize the FTS5 full-text index over the chunks table, kept in sync by triggers.
+
+        The index is populated from the existing chunks when it is created for an existing database.
+        If SQLite is built without FTS5, the keyword search falls back to LIKE scans.
+        """
+        conn = self._get_connection()
+        try:
+            cursor = conn.cursor()
+            exists = cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'chunks_fts'"
+            ).fetchone()
+
+            # Create the chunks_fts table as an external-content index of the chunks table
+            cursor.execute('''
+                CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts
+                USING fts5(chunk_text, content='chunks', content_rowid='id')
+            ''')
+            cursor.execute('''
+                CREATE TRIGGER IF NOT EXISTS chunks_fts_insert AFTER INSERT ON chunks BEGIN
+                    INSERT INTO chunks_fts (rowid, chunk_text) VALUES (new.id, new.chunk_text);
+                END
+            ''')
+            cursor.execute('''
+                CREATE TRIGGER IF NOT EXISTS chunks_fts_delete AFTER DELETE ON chunks BEGIN
+                    INSERT INTO chunks_fts (chunks_fts, rowid, chunk_text) VALUES ('delete', old.id, old.chunk_text);
+                END
+            ''')
+            cursor.execute('''
+                CREATE TRIGGER IF NOT EXISTS chunks_fts_update AFTER UPDATE ON chunks BEGIN
+                    INSERT INTO chunks_fts (chunks_fts, rowid, chunk_text) VALUES ('delete', old.id, old.chunk_text);
+                    INSERT INTO chunks_fts (rowid, chunk_text) VALUES (new.id, new.chunk_text);
+                END
+            ''')
+
+            if not exists:
+                # Migrate existing databases by indexing the chunks stored before the FTS table existed
+                cursor.execute("INSERT INTO chunks_fts (chunks_fts) VALUES ('rebuild')")
+                self.logger.info("Populated 'chunks_fts' table from the existing chunks.")
+
+            conn.commit()
+            self.fts_enabled = True
+            self.logger.info("Ensured 'chunks_fts' table exists in SQLite database.")
+        except sqlite3.Error as e:
+            conn.rollback()
+            self.fts_enabled = False
+            self.logger.warning(f"FTS5 is unavailable, falling back to LIKE keyword search: {e}")
 
 
     def _initialize_faiss(self):
@@ -109,18 +329,449 @@ class DatabaseManager:
         try:
             if os.path.exists(self.faiss_db_path):
                 # Load existing FAISS index
-                self.index = faiss.read_index(self.faiss_db_path)
-                self.logger.info("Loaded FAISS index.")
+                self._load_faiss_index()
+                self.logger.info(f"Loaded FAISS index ({type(faiss.downcast_index(self.index.index)).__name__}"
+                                 f"{', memory-mapped' if self._index_mmapped else ''}).")
             else:
-                # Create a new FAISS index
-                self.index = faiss.IndexFlatL2(384)  # Assuming a vector dimension of 384
-                self.index = faiss.IndexIDMap(self.index)
-                faiss.write_index(self.index, self.faiss_db_path)
-                self.logger.info("Created a new FAISS index.")
+                # Create a new FAISS index, filled from the stored vectors if there are any
+                self.index = self._create_faiss_index()
+                self._apply_faiss_search_parameters(self.index)
+                self.save_faiss_index()
+                self.logger.info(f"Created a new FAISS index of type '{self.faiss_config.get('index_type', 'flat')}'.")
         except Exception as e:
             self.logger.error(f"Error initializing FAISS index: {e}")
 
-    
+
+    def _load_faiss_index(self):
+        """
+        Load the FAISS index file, memory-mapped and read-only when 'mmap' is enabled in the configuration.
+
+        A memory-mapped index is not copied into the process memory: its pages are read on demand and
+        shared through the OS page cache by every process opening the file. As it cannot be modified,
+        new vectors go to a small in-memory delta index until the next snapshot, see save_faiss_index.
+        Untrained indexes are always loaded into memory, as training modifies them.
+        """
+        index = None
+        mmapped = False
+        if self.faiss_config.get('mmap', False):
+            # IVF indexes map their inverted lists, the other types map their code arrays
+            if self.faiss_config.get('index_type', 'flat').startswith('ivf'):
+                flag = faiss.IO_FLAG_MMAP
+            else:
+                flag = getattr(faiss, 'IO_FLAG_MMAP_IFC', faiss.IO_FLAG_MMAP)
+            try:
+                index = faiss.read_index(self.faiss_db_path, flag | faiss.IO_FLAG_READ_ONLY)
+                mmapped = index.is_trained
+            except RuntimeError as e:
+                self.logger.warning(f"Could not memory-map the FAISS index, loading it into memory: {e}")
+
+        if not mmapped:
+            index = faiss.read_index(self.faiss_db_path)
+        if not isinstance(index, faiss.IndexIDMap):
+            raise ValueError(f"The FAISS index ({type(index).__name__}) is not mapped to chunk IDs. "
+                             f"Clean the documents and upload them again.")
+
+        self._apply_faiss_search_parameters(index)
+        self.index = index
+        self._index_mmapped = mmapped
+        self.delta_index = self._create_flat_index(index.metric_type) if mmapped else None
+        self.fallback_index = None
+        chunk_ids = faiss.vector_to_array(index.id_map)
+        self._loaded_chunk_id = int(chunk_ids.max()) if len(chunk_ids) else 0
+
+
+    def _create_flat_index(self, metric):
+        """
+        Create an empty exact index mapped to chunk IDs, used as delta or fallback index.
+        """
+        return faiss.IndexIDMap(faiss.IndexFlat(self.faiss_config.get('dimension', 384), metric))
+
+
+    def _add_to_faiss_index(self, chunk_ids, vectors):
+        """
+        Add vectors to the FAISS index in use, to its delta index if the index is memory-mapped, or to the
+        fallback index if it is not trained yet.
+
+        Args:
+            chunk_ids (numpy.ndarray): The IDs of the chunks as an int64 array.
+            vectors (numpy.ndarray): The vectors as a float32 matrix.
+        """
+        if not self.index.is_trained:
+            target = self.fallback_index
+        elif self._index_mmapped:
+            target = self.delta_index
+        else:
+            target = self.index
+        target.add_with_ids(np.ascontiguousarray(vectors, dtype=np.float32), chunk_ids)
+
+
+    def _reset_faiss_index(self):
+        """
+        Remove every vector from the FAISS index in use, keeping its training.
+        A memory-mapped index is read into memory first, as it cannot be modified.
+        """
+        if self._index_mmapped:
+            self.index = faiss.read_index(self.faiss_db_path)
+            self._apply_faiss_search_parameters(self.index)
+            self._index_mmapped = False
+            self.delta_index = None
+        self.index.reset()
+        self.fallback_index = None if self.index.is_trained else self._create_flat_index(self.index.metric_type)
+        self._loaded_chunk_id = 0
+
+
+    def _create_faiss_index(self):
+        """
+        Create an empty FAISS index of the configured type, mapped to chunk IDs.
+
+        Returns:
+            faiss.Index: The new index. IVF and quantized indexes must be trained before vectors can be added.
+
+        Raises:
+            ValueError: If the configured index type is not supported.
+        """
+        index_type = self.faiss_config.get('index_type', 'flat')
+        if index_type not in self.FAISS_INDEX_TYPES:
+            raise ValueError(f"Unsupported FAISS index type '{index_type}'. "
+                             f"Possible values are {', '.join(self.FAISS_INDEX_TYPES)}.")
+
+        description = self.FAISS_INDEX_TYPES[index_type](self.faiss_config)
+        index = faiss.index_factory(self.faiss_config.get('dimension', 384), f"IDMap,{description}", self._faiss_metric())
+        if index_type == 'hnsw':
+            faiss.downcast_index(index.index).hnsw.efConstruction = self.faiss_config.get('ef_construction', 40)
+        return index
+
+
+    def _faiss_metric(self):
+        """
+        Return the FAISS metric set in the configuration.
+
+        Raises:
+            ValueError: If the configured metric is not supported.
+        """
+        metric = self.faiss_config.get('metric', 'inner_product')
+        if metric not in self.FAISS_METRICS:
+            raise ValueError(f"Unsupported FAISS metric '{metric}'. Possible values are {', '.join(self.FAISS_METRICS)}.")
+        return self.FAISS_METRICS[metric]
+
+
+    def vectors_are_normalized(self):
+        """
+        Return whether the stored vectors are L2-normalized, which is the case with the inner product metric.
+        Cosine similarities with them are then plain inner products.
+
+        Returns:
+            bool: True if the stored vectors are L2-normalized.
+        """
+        return self._faiss_metric() == faiss.METRIC_INNER_PRODUCT
+
+
+    def search_scores_are_cosines(self):
+        """
+        Return whether the scores returned by search_faiss are exact cosine similarities. This is the case with the
+        inner product metric, unless a compressed index type returns approximate scores that are not refined.
+
+        Returns:
+            bool: True if the search scores are exact cosine similarities.
+        """
+        exact = self.faiss_config.get('index_type', 'flat') in self.FAISS_EXACT_INDEX_TYPES \
+            or self.faiss_config.get('refine_factor', 1) > 1
+        return self.vectors_are_normalized() and exact
+
+
+    def _prepare_vectors(self, vectors):
+        """
+        Convert vectors into a new float32 matrix, L2-normalized if the inner product metric is used.
+
+        Args:
+            vectors (list or numpy.ndarray): The vectors, one per row.
+
+        Returns:
+            numpy.ndarray: The vectors as stored and searched.
+        """
+        matrix = np.vstack(vectors).astype(np.float32)
+        if self.vectors_are_normalized():
+            faiss.normalize_L2(matrix)
+        return matrix
+
+
+    def _migrate_faiss_metric(self):
+        """
+        Rebuild the FAISS index if it was created with another metric than the configured one, as the L2
+        indexes created before the inner product metric was introduced.
+
+        Every worker process runs this at startup, so the migration holds an exclusive lock on a file next to
+        the index. The first worker rebuilds the index, the others wait and then load the migrated file.
+        """
+        if self.index is None or self.index.metric_type == self._faiss_metric():
+            return
+        with open(f"{self.faiss_db_path}.lock", "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            # Another worker may have migrated the index while this one was waiting for the lock
+            self._load_faiss_index()
+            if self.index.metric_type == self._faiss_metric():
+                self.logger.info("The FAISS index was migrated by another worker, loaded it.")
+                return
+            self.logger.warning(f"The FAISS index does not use the '{self.faiss_config.get('metric', 'inner_product')}' "
+                                f"metric, rebuilding it from the stored vectors.")
+            self.rebuild_faiss_index()
+
+
+    def _normalize_stored_vectors(self):
+        """
+        L2-normalize the vectors of the chunk_vectors table that are not normalized yet.
+        """
+        conn = self._get_connection()
+        try:
+            chunk_ids, vectors = self._load_stored_vectors()
+            pending = np.abs(np.linalg.norm(vectors, axis=1) - 1) > 1e-4
+            if not pending.any():
+                return
+            normalized = self._prepare_vectors(vectors[pending])
+            conn.executemany(
+                'UPDATE chunk_vectors SET vector = ? WHERE chunk_id = ?',
+                [(self._serialize_vector(vector), int(chunk_id)) for chunk_id, vector in zip(chunk_ids[pending], normalized)]
+            )
+            conn.commit()
+            self.logger.info(f"Normalized {int(pending.sum())} stored chunk vectors.")
+        except sqlite3.Error as e:
+            conn.rollback()
+            self.logger.error(f"Error normalizing the stored chunk vectors: {e}")
+            raise
+
+
+    def _apply_faiss_search_parameters(self, index):
+        """
+        Apply the runtime search knobs (nprobe for IVF indexes, efSearch for HNSW indexes) to an index.
+
+        Args:
+            index (faiss.Index): The index to tune.
+        """
+        base_index = faiss.downcast_index(index.index)
+        parameter_space = faiss.ParameterSpace()
+        if isinstance(base_index, faiss.IndexIVF):
+            parameter_space.set_index_parameter(index, "nprobe", self.faiss_config.get('nprobe', 16))
+        elif isinstance(base_index, faiss.IndexHNSW):
+            parameter_space.set_index_parameter(index, "efSearch", self.faiss_config.get('ef_search', 64))
+
+
+    def _load_stored_vectors(self, after_chunk_id=0):
+        """
+        Load the vectors stored in the chunk_vectors table.
+
+        Args:
+            after_chunk_id (int): Only load the vectors of the chunks with a greater ID.
+
+        Returns:
+            tuple: The chunk IDs as an int64 array and the vectors as a float32 matrix, ordered by chunk ID.
+        """
+        conn = self._get_connection()
+        rows = conn.execute(
+            'SELECT chunk_id, vector FROM chunk_vectors WHERE chunk_id > ? ORDER BY chunk_id', (after_chunk_id,)
+        ).fetchall()
+        chunk_ids = np.array([row[0] for row in rows], dtype=np.int64)
+        vectors = np.vstack([self._deserialize_vector(row[1]) for row in rows]) if rows else \
+            np.empty((0, self.faiss_config.get('dimension', 384)), dtype=np.float32)
+        return chunk_ids, vectors
+
+
+    def _populate_faiss_index(self, index):
+        """
+        Train an index if needed and add every stored vector to it.
+
+        IVF and quantized indexes are only trained once the number of stored vectors reaches the
+        threshold of their type, see _train_min_vectors. Until then the index is left empty and untrained,
+        and the vectors are kept in an in-memory flat fallback index searched instead.
+
+        Args:
+            index (faiss.Index): An empty index, which becomes the index in use.
+
+        Returns:
+            bool: True if the index is trained and holds every stored vector, False otherwise.
+        """
+        chunk_ids, vectors = self._load_stored_vectors()
+        self._loaded_chunk_id = int(chunk_ids[-1]) if len(chunk_ids) else 0
+
+        if not index.is_trained:
+            train_min_vectors = self._train_min_vectors()
+            if len(chunk_ids) < train_min_vectors:
+                self.fallback_index = self._create_flat_index(index.metric_type)
+                if len(chunk_ids):
+                    self.fallback_index.add_with_ids(np.ascontiguousarray(vectors, dtype=np.float32), chunk_ids)
+                self.logger.info(f"FAISS index not trained yet: {len(chunk_ids)} of {train_min_vectors} "
+                                 f"vectors required. Searches are exact meanwhile.")
+                return False
+
+            max_train_vectors = self.faiss_config.get('max_train_vectors', 100000)
+            sample = vectors
+            if len(vectors) > max_train_vectors:
+                sample = vectors[np.random.default_rng(0).choice(len(vectors), max_train_vectors, replace=False)]
+            self.logger.info(f"Training FAISS index on {len(sample)} vectors.")
+            index.train(np.ascontiguousarray(sample, dtype=np.float32))
+
+        if len(chunk_ids):
+            index.add_with_ids(np.ascontiguousarray(vectors, dtype=np.float32), chunk_ids)
+        self.fallback_index = None
+        self.logger.info(f"Added {len(chunk_ids)} stored vectors to the FAISS index.")
+        return True
+
+
+    def _train_min_vectors(self):
+        """
+        Return the number of stored vectors required before the index is trained.
+        The compressed types without IVF have their own thresholds, the other types use 'train_min_vectors'.
+        """
+        index_type = self.faiss_config.get('index_type', 'flat')
+        if index_type in self.FAISS_TRAIN_MIN_VECTORS:
+            return self.FAISS_TRAIN_MIN_VECTORS[index_type](self.faiss_config)
+        return self.faiss_config.get('train_min_vectors', 10000)
+
+
+    def _train_faiss_index_if_ready(self):
+        """
+        Train the index and fill it from SQLite once its fallback index holds enough vectors.
+        """
+        if self.index.is_trained or self.fallback_index is None or self.fallback_index.ntotal < self._train_min_vectors():
+            return
+        self._populate_faiss_index(self.index)
+
+
+    def rebuild_faiss_index(self):
+        """
+        Rebuild the FAISS index with the configured index type and metric from the vectors stored in SQLite.
+
+        This migrates an existing index (for example a flat L2 index) to the type and metric set in the
+        configuration. It should be run while the application is stopped, see rebuild_index.py. The
+        metric migration at startup runs it in one worker process at a time.
+        """
+        self._check_initialized()
+        self.logger.info(f"Rebuilding FAISS index as '{self.faiss_config.get('index_type', 'flat')}'.")
+        with self._index_lock.write():
+            if self.vectors_are_normalized():
+                self._normalize_stored_vectors()
+            generation, reset_generation = self._read_index_state(self._get_connection())
+            index = self._create_faiss_index()
+            self._populate_faiss_index(index)
+            self._apply_faiss_search_parameters(index)
+            self.index = index
+            self._index_mmapped = False
+            self.delta_index = None
+            self._index_generation, self._reset_generation = generation, reset_generation
+        self.save_faiss_index()
+        self.logger.info(f"FAISS index rebuilt with {index.ntotal} vectors.")
+
+
+    def _sync_faiss_index(self, exclude_ids=()):
+        """
+        Bring the FAISS index up to date with the vectors stored in SQLite by any worker process.
+
+        The index generation stored in SQLite is compared with the one the index was loaded at. When it
+        changed, only the vectors with a chunk ID above the highest one already in the index are added,
+        as chunk IDs only grow. After a cleanup, the index is emptied first.
+
+        An index marked stale, because adding vectors to it failed, is emptied and filled again from SQLite.
+
+        Args:
+            exclude_ids (set): Chunk IDs not to add, because the caller adds their vectors itself.
+        """
+        if self.index is None:
+            return
+        conn = self._get_connection()
+        generation, reset_generation = self._read_index_state(conn)
+        if generation == self._index_generation and not self._index_stale:
+            return
+
+        with self._index_lock.write():
+            if generation == self._index_generation and not self._index_stale:
+                return
+
+            if self._index_stale:
+                self.logger.info("Reloading the FAISS index from the vectors stored in SQLite.")
+                self._reset_faiss_index()
+                self._index_stale = False
+            elif self._reset_generation is not None and reset_generation != self._reset_generation:
+                self.logger.info("The documents were cleaned by another worker, emptying the FAISS index.")
+                self._reset_faiss_index()
+
+            if not self.index.is_trained and self.fallback_index is None:
+                # The index is trained and filled from SQLite, or its fallback index is
+                self._populate_faiss_index(self.index)
+            else:
+                chunk_ids, vectors = self._load_stored_vectors(after_chunk_id=self._loaded_chunk_id)
+                keep = ~np.isin(chunk_ids, list(exclude_ids))
+                if keep.any():
+                    self._add_to_faiss_index(chunk_ids[keep], vectors[keep])
+                    self.logger.info(f"Loaded {int(keep.sum())} newer vectors from SQLite into the FAISS index.")
+                if len(chunk_ids):
+                    self._loaded_chunk_id = max(self._loaded_chunk_id, int(chunk_ids[-1]))
+                # The caller adds the excluded vectors, and trains the index afterwards
+                if not exclude_ids:
+                    self._train_faiss_index_if_ready()
+
+            self._index_generation, self._reset_generation = generation, reset_generation
+
+
+    def _backfill_chunk_vectors(self):
+        """
+        Copy the vectors of an existing FAISS index into the chunk_vectors table.
+
+        Databases created before vectors were stored in SQLite only hold them in FAISS. They are
+        reconstructed from the index once, so that reranking can rely on the stored vectors. This needs
+        an index mapped to chunk IDs whose vectors can be reconstructed, as the IndexIDMap(IndexFlatL2)
+        those databases were created with.
+        """
+        conn = self._get_connection()
+        try:
+            stored_count = conn.execute('SELECT COUNT(*) FROM chunk_vectors').fetchone()[0]
+            if self.index is None or stored_count >= self.index.ntotal:
+                return
+
+            missing_count = self.index.ntotal - stored_count
+            index = faiss.downcast_index(self.index)
+            if not isinstance(index, faiss.IndexIDMap):
+                self.logger.error(f"Cannot backfill {missing_count} chunk vectors: the FAISS index ({type(index).__name__}) "
+                                  f"is not mapped to chunk IDs. Clean the documents and upload them again.")
+                return
+            base_index = faiss.downcast_index(index.index)
+            try:
+                base_index.reconstruct(0)
+            except RuntimeError as e:
+                self.logger.error(f"Cannot backfill {missing_count} chunk vectors: the vectors of the FAISS index "
+                                  f"({type(base_index).__name__}) cannot be reconstructed. Reranking will encode those "
+                                  f"chunks again and rebuild_index.py will leave them out. Clean the documents and "
+                                  f"upload them again: {e}")
+                return
+
+            self.logger.info(f"Backfilling {missing_count} chunk vectors from the FAISS index.")
+            chunk_ids = faiss.vector_to_array(index.id_map)
+            vectors = base_index.reconstruct_n(0, index.ntotal)
+            conn.executemany(
+                'INSERT OR IGNORE INTO chunk_vectors (chunk_id, vector) VALUES (?, ?)',
+                [(int(chunk_id), self._serialize_vector(vector)) for chunk_id, vector in zip(chunk_ids, vectors)]
+            )
+            conn.commit()
+            self.logger.info("Chunk vectors backfilled from the FAISS index.")
+        except Exception as e:
+            conn.rollback()
+            self.logger.error(f"Error backfilling chunk vectors from the FAISS index: {e}")
+
+
+    @staticmethod
+    def _serialize_vector(vector):
+        """
+        Convert a vector into the bytes stored in the chunk_vectors table.
+        """
+        return np.asarray(vector, dtype=np.float32).tobytes()
+
+
+    @staticmethod
+    def _deserialize_vector(blob):
+        """
+        Convert bytes from the chunk_vectors table back into a vector.
+        """
+        return np.frombuffer(blob, dtype=np.float32)
+
+
     def insert_document(self, title):
         """
         Insert a document's title into the documents table.
@@ -132,8 +783,8 @@ class DatabaseManager:
             int: The ID of the inserted document.
         """
         self._check_initialized()
+        conn = self._get_connection()
         try:
-            conn = sqlite3.connect(self.sqlite_db_path)
             cursor = conn.cursor()
             cursor.execute('INSERT INTO documents (title) VALUES (?)', (title,))
             doc_id = cursor.lastrowid
@@ -141,10 +792,9 @@ class DatabaseManager:
             conn.commit()
             return doc_id
         except sqlite3.Error as e:
+            conn.rollback()
             self.logger.error(f"Error inserting the document: {e}")
             return None
-        finally:
-            conn.close()
 
     
     def insert_chunk(self, chunk_text, document_id):
@@ -159,8 +809,8 @@ class DatabaseManager:
             int: The ID of the inserted chunk.
         """
         self._check_initialized()
+        conn = self._get_connection()
         try:
-            conn = sqlite3.connect(self.sqlite_db_path)
             cursor = conn.cursor()
             cursor.execute('INSERT INTO chunks (document_id, chunk_text) VALUES (?, ?)', (document_id, chunk_text))
             chunk_id = cursor.lastrowid
@@ -168,10 +818,9 @@ class DatabaseManager:
             conn.commit()
             return chunk_id
         except sqlite3.Error as e:
+            conn.rollback()
             self.logger.error(f"Error inserting the chunk: {e}")
             return None
-        finally:
-            conn.close()
 
     
     def add_vector_to_faiss(self, chunk_id, vector):
@@ -182,31 +831,193 @@ class DatabaseManager:
             chunk_id (int): The ID of the chunk.
             vector (numpy.ndarray): The vector to add.
         """
-        self._check_initialized()
         try:
-            self.index.add_with_ids(np.array([vector]), np.array([chunk_id]))
-            self.save_faiss_index()
-            self.logger.info(f"Vector added for chunk ID {chunk_id} to FAISS index.")
+            self.add_vectors_to_faiss([chunk_id], [vector])
         except Exception as e:
             self.logger.error(f"Error adding vector for chunk ID {chunk_id} to FAISS index: {e}")
 
 
+    def insert_documents_with_chunks(self, documents, job_id=None):
+        """
+        Insert several documents, all of their chunks and the chunk vectors in a single transaction.
+
+        The documents are tagged with the ingestion job that stores them in the same transaction, so a job
+        resumed after a crash knows which of its files are already stored.
+
+        Args:
+            documents (list): A list of (title, chunks, vectors) tuples, where chunks is a list of chunk
+                texts and vectors the list of their vectors.
+            job_id (str, optional): The ID of the ingestion job storing the documents.
+
+        Returns:
+            list: The IDs of the inserted chunks, in the same order as the input chunks.
+            None: If the transaction failed and was rolled back.
+        """
+        self._check_initialized()
+        conn = self._get_connection()
+        try:
+            cursor = conn.cursor()
+            # Take the write lock up front so the AUTOINCREMENT IDs of each batch are contiguous
+            cursor.execute('BEGIN IMMEDIATE')
+            chunk_ids = []
+            for title, chunks, vectors in documents:
+                cursor.execute('INSERT INTO documents (title, job_id) VALUES (?, ?)', (title, job_id))
+                doc_id = cursor.lastrowid
+                if not chunks:
+                    continue
+                cursor.executemany(
+                    'INSERT INTO chunks (document_id, chunk_text) VALUES (?, ?)',
+                    [(doc_id, chunk_text) for chunk_text in chunks]
+                )
+                last_id = cursor.execute('SELECT last_insert_rowid()').fetchone()[0]
+                document_chunk_ids = range(last_id - len(chunks) + 1, last_id + 1)
+                cursor.executemany(
+                    'INSERT INTO chunk_vectors (chunk_id, vector) VALUES (?, ?)',
+                    [(chunk_id, self._serialize_vector(vector)) for chunk_id, vector in zip(document_chunk_ids, self._prepare_vectors(vectors))]
+                )
+                chunk_ids.extend(document_chunk_ids)
+            # Tell every worker, including this one, that its FAISS index is behind
+            cursor.execute('UPDATE index_state SET generation = generation + 1 WHERE id = 1')
+            conn.commit()
+            self.logger.info(f"Inserted {len(documents)} documents and {len(chunk_ids)} chunks in one transaction.")
+            return chunk_ids
+        except sqlite3.Error as e:
+            conn.rollback()
+            self.logger.error(f"Error inserting documents and chunks: {e}")
+            return None
+
+
+    def fetch_job_documents(self, job_id):
+        """
+        Return the documents already stored by an ingestion job.
+
+        Args:
+            job_id (str): The ID of the ingestion job.
+
+        Returns:
+            dict: The number of chunks of each stored document, keyed by title.
+
+        Raises:
+            sqlite3.Error: If the documents cannot be read, so that the job is not indexed twice by mistake.
+        """
+        self._check_initialized()
+        conn = self._get_connection()
+        rows = conn.execute('''
+            SELECT documents.title, COUNT(chunks.id) FROM documents
+            LEFT JOIN chunks ON chunks.document_id = documents.id
+            WHERE documents.job_id = ?
+            GROUP BY documents.id
+        ''', (job_id,)).fetchall()
+        return dict(rows)
+
+
+    def add_vectors_to_faiss(self, chunk_ids, vectors, persist=True):
+        """
+        Add several vectors to the FAISS index in one call with their corresponding chunk IDs.
+
+        The vectors must already be stored in SQLite. If the index still needs training, they go to the
+        in-memory fallback index until enough vectors exist, at which point the index is trained and filled
+        from SQLite. The vectors stored by other workers in the meantime are added along with them.
+
+        If adding the vectors fails, the error is logged and the index is marked stale instead of raising:
+        the chunks are already committed to SQLite, and the next search reloads the index from there.
+
+        Args:
+            chunk_ids (list): The IDs of the chunks.
+            vectors (list or numpy.ndarray): The vectors to add, aligned with chunk_ids.
+            persist (bool): Whether to write the index to disk once the vectors are added.
+        """
+        self._check_initialized()
+        if len(chunk_ids) == 0:
+            return
+        try:
+            with self._index_lock.write():
+                if not self.index.is_trained and self.fallback_index is None:
+                    # The first sync fills the fallback index from SQLite, these vectors included
+                    self._sync_faiss_index()
+                else:
+                    # Chunks up to the loaded chunk ID were already read back from SQLite by a search
+                    pending = [(int(chunk_id), vector) for chunk_id, vector in zip(chunk_ids, vectors)
+                               if chunk_id > self._loaded_chunk_id]
+                    self._sync_faiss_index(exclude_ids={chunk_id for chunk_id, _ in pending})
+                    if pending:
+                        self._add_to_faiss_index(
+                            np.array([chunk_id for chunk_id, _ in pending], dtype=np.int64),
+                            self._prepare_vectors([vector for _, vector in pending])
+                        )
+                        self._loaded_chunk_id = max(self._loaded_chunk_id, pending[-1][0])
+                        self.logger.info(f"Added {len(pending)} vectors to FAISS index.")
+                    self._train_faiss_index_if_ready()
+                if not self.index.is_trained:
+                    return
+                # A memory-mapped index is only written again once its delta index is full, the vectors being stored in SQLite meanwhile
+                delta_full = not self._index_mmapped or self.delta_index.ntotal >= self.faiss_config.get('delta_max_vectors', 10000)
+            # Written after releasing the write lock, so searches proceed while the file is written
+            if persist and delta_full:
+                self.save_faiss_index()
+        except Exception as e:
+            # The chunks are committed, so the index catches up from SQLite rather than failing the upload
+            with self._index_lock.write():
+                self._index_stale = True
+            self.logger.error(f"Error adding {len(chunk_ids)} vectors to FAISS index, it will be reloaded from "
+                              f"the stored vectors at the next search: {e}")
+
+
     def search_sqlite(self, keywords, top_k=5):
         """
         Search for chunks in the SQLite database containing specific keywords.
 
+        All keywords are matched in a single FTS5 query and the results are ranked by BM25.
+        Without FTS5, one LIKE scan is run per keyword and every match gets the same score.
+
         Args:
             keywords (list): The list of keywords to search for.
             top_k (int): The number of top matches to return.
 
         Returns:
-            list: A list of dictionaries containing 'id' and 'chunk_text'.
+            list: A list of dictionaries containing 'id', 'text' and 'score', where a higher score is more relevant.
         """
         self._check_initialized()
+        if not keywords:
+            return []
+
+        if not self.fts_enabled:
+            return self._search_sqlite_like(keywords, top_k)
+
+        conn = self._get_connection()
+        try:
+            # Quote each keyword so that it is matched as a plain term
+            match_query = " OR ".join('"{}"'.format(keyword.replace('"', '""')) for keyword in keywords)
+            query = """
+                SELECT chunks.id, chunks.chunk_text, -bm25(chunks_fts) AS score
+                FROM chunks_fts
+                JOIN chunks ON chunks.id = chunks_fts.rowid
+                WHERE chunks_fts MATCH ?
+                ORDER BY bm25(chunks_fts)
+                LIMIT ?
+            """
+            rows = conn.execute(query, (match_query, top_k)).fetchall()
+            return [{"id": row[0], "text": row[1], "score": row[2]} for row in rows]
+        except sqlite3.Error as e:
+            self.logger.error(f"Error during SQLite search: {e}")
+            return []
+
+
+    def _search_sqlite_like(self, keywords, top_k):
+        """
+        Search for chunks containing specific keywords with one LIKE scan per keyword.
+
+        Args:
+            keywords (list): The list of keywords to search for.
+            top_k (int): The number of matches to return per keyword.
+
+        Returns:
+            list: A list of dictionaries containing 'id', 'text' and a constant 'score'.
+        """
         results = []
-        
+
+        conn = self._get_connection()
         try:
-            conn = sqlite3.connect(self.sqlite_db_path)
             cursor = conn.cursor()
 
             for keyword in keywords:
@@ -218,7 +1029,7 @@ class DatabaseManager:
                 """
                 cursor.execute(query, (f'%{keyword}%', top_k))
                 rows = cursor.fetchall()
-                results.extend([{"id": row[0], "text": row[1]} for row in rows])
+                results.extend([{"id": row[0], "text": row[1], "score": 1.0} for row in rows])
 
             # Removing duplicates and keeping unique results
             unique_results = {result['id']: result for result in results}.values()
@@ -227,31 +1038,99 @@ class DatabaseManager:
         except sqlite3.Error as e:
             self.logger.error(f"Error during SQLite search: {e}")
             return []
-        finally:
-            conn.close()
 
 
     def search_faiss(self, query_vector, top_k=5):
         """
         Search for the top_k nearest neighbors of a query vector in the FAISS index.
 
+        With a 'refine_factor' above 1, refine_factor * top_k candidates are retrieved from the index and
+        re-scored with their exact vectors stored in SQLite, which recovers the accuracy lost by the
+        compressed index types.
+
         Args:
             query_vector (numpy.ndarray): The query vector.
             top_k (int): The number of nearest neighbors to retrieve.
 
         Returns:
-            list: A list of tuples (chunk_id, distance).
+            list: A list of tuples (chunk_id, score), where a higher score is more similar. The score is the cosine
+                similarity with the inner product metric, and 1 / (1 + squared L2 distance) with the L2 metric.
         """
         self._check_initialized()
         try:
-            distances, indices = self.index.search(np.array([query_vector]), top_k)
+            self._sync_faiss_index()
+            query = self._prepare_vectors([query_vector])
+            refine_factor = self.faiss_config.get('refine_factor', 1)
+            candidates = top_k * refine_factor if refine_factor > 1 else top_k
+            # FAISS searches are thread-safe on an index that is not being changed, so they run concurrently
+            with self._index_lock.read():
+                trained = self.index.is_trained
+                if not trained:
+                    # The fallback index is exact, so its results are not refined
+                    distances, indices = self.fallback_index.search(query, top_k) if self.fallback_index is not None \
+                        else (np.empty((1, 0), dtype=np.float32), np.empty((1, 0), dtype=np.int64))
+                else:
+                    distances, indices = self.index.search(query, candidates)
+                    if self._index_mmapped and self.delta_index.ntotal:
+                        delta_distances, delta_indices = self.delta_index.search(query, candidates)
+                        distances = np.concatenate([distances, delta_distances], axis=1)
+                        indices = np.concatenate([indices, delta_indices], axis=1)
+                        # Missing results have the worst possible score, so they are sorted last
+                        order = self._rank(distances[0])[:candidates]
+                        distances, indices = distances[:, order], indices[:, order]
+
             results = [(int(idx), float(dist)) for idx, dist in zip(indices[0], distances[0]) if idx != -1]
-            return results
+            if trained and refine_factor > 1:
+                results = self._refine_results(query[0], results, top_k)
+
+            if self.index.metric_type == faiss.METRIC_INNER_PRODUCT:
+                return results
+            return [(chunk_id, 1 / (1 + distance)) for chunk_id, distance in results]
         except Exception as e:
             self.logger.error(f"Error during FAISS search: {e}")
             return []
 
 
+    def _refine_results(self, query_vector, results, top_k):
+        """
+        Re-score search candidates with their exact vectors stored in SQLite and keep the top_k.
+
+        Args:
+            query_vector (numpy.ndarray): The query vector.
+            results (list): The candidates as (chunk_id, distance) tuples, with approximate distances.
+            top_k (int): The number of nearest neighbors to keep.
+
+        Returns:
+            list: A list of tuples (chunk_id, distance) with exact distances.
+        """
+        vectors_map = self.fetch_vectors_by_ids([chunk_id for chunk_id, _ in results])
+        chunk_ids = [chunk_id for chunk_id, _ in results if chunk_id in vectors_map]
+        if not chunk_ids:
+            return results[:top_k]
+        distances = self._exact_distances(query_vector, np.vstack([vectors_map[chunk_id] for chunk_id in chunk_ids]))
+        nearest = self._rank(distances)[:top_k]
+        return [(chunk_ids[i], float(distances[i])) for i in nearest]
+
+
+    def _exact_distances(self, query_vector, vectors):
+        """
+        Compute the exact distances between a query vector and a matrix of vectors in the metric of the index,
+        like FAISS: inner products, or squared L2 distances.
+        """
+        if self.index.metric_type == faiss.METRIC_INNER_PRODUCT:
+            return vectors @ query_vector
+        return np.sum((vectors - query_vector) ** 2, axis=1)
+
+
+    def _rank(self, distances):
+        """
+        Return the positions of distances in the metric of the index, from the most to the least similar.
+        """
+        if self.index.metric_type == faiss.METRIC_INNER_PRODUCT:
+            return np.argsort(-distances, kind='stable')
+        return np.argsort(distances, kind='stable')
+
+
     def fetch_chunks_by_ids(self, chunk_ids):
         """
         Fetch chunks from SQLite based on their IDs.
@@ -266,14 +1145,14 @@ class DatabaseManager:
             self.logger.warning("Empty chunk IDs provided.")
             return {}
 
+        conn = self._get_connection()
         try:
-            conn = sqlite3.connect(self.sqlite_db_path)
             cursor = conn.cursor()
 
-            unique_ids = list(set(chunk_ids))
-            placeholders = ','.join('?' for _ in unique_ids)
-            query = f"SELECT id, chunk_text FROM chunks WHERE id IN ({placeholders})"
-            cursor.execute(query, unique_ids)
+            # Pass the IDs as one JSON array so the same prepared statement serves every call
+            unique_ids = list(set(int(chunk_id) for chunk_id in chunk_ids))
+            query = "SELECT id, chunk_text FROM chunks WHERE id IN (SELECT value FROM json_each(?))"
+            cursor.execute(query, (json.dumps(unique_ids),))
             rows = cursor.fetchall()
 
             chunks_map = {row[0]: row[1] for row in rows}
@@ -284,40 +1163,109 @@ class DatabaseManager:
         except sqlite3.Error as e:
             self.logger.error(f"Error fetching chunks: {e}")
             return {}
-        finally:
-            conn.close()
+
+
+    def fetch_vectors_by_ids(self, chunk_ids):
+        """
+        Fetch the stored vectors of chunks from SQLite based on their IDs.
+
+        Args:
+            chunk_ids (list): A list of chunk IDs.
+
+        Returns:
+            dict: A dictionary mapping chunk IDs to their vectors.
+        """
+        if not chunk_ids:
+            return {}
+
+        conn = self._get_connection()
+        try:
+            unique_ids = list(set(int(chunk_id) for chunk_id in chunk_ids))
+            query = "SELECT chunk_id, vector FROM chunk_vectors WHERE chunk_id IN (SELECT value FROM json_each(?))"
+            rows = conn.execute(query, (json.dumps(unique_ids),)).fetchall()
+            return {row[0]: self._deserialize_vector(row[1]) for row in rows}
+        except sqlite3.Error as e:
+            self.logger.error(f"Error fetching chunk vectors: {e}")
+            return {}
 
 
     def save_faiss_index(self):
         """
         Save the FAISS index to the file system.
+
+        The index is written to a temporary file which then replaces the previous one, so other
+        workers never load a partially written index. When the index is memory-mapped, a snapshot
+        merging the delta index into the index file is written, then mapped in place of the old one.
+
+        The index is only read while it is written, so searches go on meanwhile. This must not be called
+        while holding the index lock.
         """
         self._check_initialized()
         try:
-            faiss.write_index(self.index, self.faiss_db_path)
+            temp_path = f"{self.faiss_db_path}.{os.getpid()}.tmp"
+            with self._save_lock:
+                with self._index_lock.read():
+                    if self._index_mmapped:
+                        if self.delta_index.ntotal == 0:
+                            return
+                        index = self._merge_delta_index()
+                    else:
+                        index = self.index
+                    faiss.write_index(index, temp_path)
+                    os.replace(temp_path, self.faiss_db_path)
+                if self.faiss_config.get('mmap', False) and index.is_trained:
+                    with self._index_lock.write():
+                        self._load_faiss_index()
+                        # Vectors added since the snapshot was taken were only in the replaced delta index,
+                        # the next sync reads them back from SQLite
+                        self._index_generation = None
             self.logger.info(f"FAISS index saved to {self.faiss_db_path}.")
         except Exception as e:
             self.logger.error(f"Error saving FAISS index: {e}")
 
     
+    def _merge_delta_index(self):
+        """
+        Read the index file into memory and add the vectors stored since it was written.
+
+        The vectors are read back from SQLite rather than from the delta index, as another worker may
+        have written a more recent file holding some of them already.
+
+        Returns:
+            faiss.Index: The in-memory index to write as the new snapshot.
+        """
+        index = faiss.read_index(self.faiss_db_path)
+        file_chunk_ids = faiss.vector_to_array(index.id_map)
+        chunk_ids, vectors = self._load_stored_vectors(after_chunk_id=int(file_chunk_ids.max()) if len(file_chunk_ids) else 0)
+        if len(chunk_ids):
+            index.add_with_ids(np.ascontiguousarray(vectors, dtype=np.float32), chunk_ids)
+        self.logger.info(f"Merging {len(chunk_ids)} vectors into the memory-mapped FAISS index.")
+        return index
+
+    
     def clean_database(self):
         """
         Perform a full cleanup by removing all data from both the SQLite database and the FAISS index.
         """
         self._check_initialized()
+        conn = self._get_connection()
         try:
-            conn = sqlite3.connect(self.sqlite_db_path)
             cursor = conn.cursor()
+            cursor.execute('DELETE FROM chunk_vectors')
             cursor.execute('DELETE FROM chunks')
             cursor.execute('DELETE FROM documents')
-            self.logger.info("Both SQLite tables have been completely cleared.")
+            # The other workers empty their FAISS index when they see the new reset generation
+            cursor.execute('UPDATE index_state SET generation = generation + 1, reset_generation = generation + 1 WHERE id = 1')
+            generation, reset_generation = self._read_index_state(conn)
+            self.logger.info("All SQLite tables have been completely cleared.")
             conn.commit()
-            self.index.reset()
+            with self._index_lock.write():
+                self._reset_faiss_index()
+                self._index_generation, self._reset_generation = generation, reset_generation
             self.save_faiss_index()
             self.logger.info("FAISS index has been completely cleared.")
         except sqlite3.Error as e:
+            conn.rollback()
             self.logger.error(f"Error cleaning the SQLite database: {e}")
         except Exception as e:
             self.logger.error(f"Error cleaning the FAISS index: {e}")
-        finally:
-            conn.close()
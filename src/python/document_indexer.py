@@ -1,4 +1,5 @@
 import os
+import time
 
 class DocumentIndexer:
     """
@@ -14,13 +15,18 @@ class DocumentIndexer:
         self.text_vectorizer = text_vectorizer
 
 
-    def index_documents(self, folder_path):
+    def index_documents(self, folder_path, progress_callback=None, job_id=None):
         """
         Index documents from a specified folder by extracting their text and converting it to vectors.
         This function now recursively processes subdirectories as well and stores data in a database.
 
         Args:
             folder_path (str): Path to the folder containing documents to be indexed.
+            progress_callback (callable, optional): Called as progress_callback(filename, status, chunk_count, error)
+                with the status 'vectorized' once a file is vectorized, 'processed' once its chunks are stored,
+                or 'failed' with the error.
+            job_id (str, optional): The ingestion job indexing the folder. The documents are stored with it, and the
+                files already stored by an earlier attempt of the same job are skipped.
 
         Returns:
             None
@@ -29,35 +35,61 @@ class DocumentIndexer:
             self.logger.error(f"Directory not found: {folder_path}")
             return
 
-        document_count = 0
+        documents = []
+        vectors = []
+
+        # A job resumed after a crash may have stored its documents before its completion was recorded
+        stored_documents = self.database_manager.fetch_job_documents(job_id) if job_id is not None else {}
 
         for root, _, files in os.walk(folder_path):
             for filename in files:
                 file_path = os.path.join(root, filename)
 
+                if filename in stored_documents:
+                    self.logger.info(f"Skipping file already stored by ingestion job {job_id}: {filename}")
+                    if progress_callback is not None:
+                        progress_callback(filename, "processed", stored_documents[filename], None)
+                    continue
+
                 self.logger.info(f"Processing file: {filename}")
 
                 text = self.extract_text_from_file(file_path, filename)
                 if text is None:
-                    continue
-
-                doc_id = self.database_manager.insert_document(filename)
-                if doc_id is None:
+                    if progress_callback is not None:
+                        error = "Failed to extract the text." if self.text_extractor.is_supported(filename) else "Unsupported file type."
+                        progress_callback(filename, "failed", 0, error)
                     continue
 
                 chunks = self.chunk_text(text)
-                vectors = self.text_vectorizer.vectorize_chunks_with_context(chunks, window=1)
+                start_time = time.perf_counter()
+                document_vectors = self.text_vectorizer.vectorize_chunks_with_context(chunks, window=1)
+                elapsed = time.perf_counter() - start_time
+                self.logger.info(f"Vectorized {len(chunks)} chunks of {filename} in {elapsed:.2f}s "
+                                 f"({len(chunks) / elapsed if elapsed > 0 else 0:.1f} chunks/s).")
+
+                documents.append((filename, chunks, document_vectors))
+                vectors.extend(document_vectors)
+                if progress_callback is not None:
+                    progress_callback(filename, "vectorized", len(chunks), None)
+
+        if not documents:
+            self.logger.info(f"No documents to index in {folder_path}")
+            return
+
+        # Store every chunk of the upload in one transaction, then add all vectors and persist FAISS once
+        chunk_ids = self.database_manager.insert_documents_with_chunks(documents, job_id=job_id)
+        if chunk_ids is None:
+            raise RuntimeError(f"Failed to store the documents from {folder_path} in the database.")
 
-                for chunk, vector in zip(chunks, vectors):
-                    try:
-                        chunk_id = self.database_manager.insert_chunk(chunk, doc_id)
-                        if chunk_id:
-                            self.database_manager.add_vector_to_faiss(chunk_id, vector)
-                            document_count += 1
-                    except Exception as e:
-                        self.logger.error(f"Error adding chunk or vector to database/FAISS: {str(e)}")
+        # A failed FAISS add does not lose the chunks: the index is reloaded from SQLite at the next search
+        self.database_manager.add_vectors_to_faiss(chunk_ids, vectors)
 
-        self.logger.info(f"Indexed {document_count} documents from {folder_path} into database")
+        # The files are reported as processed only once their chunks are committed and searchable
+        if progress_callback is not None:
+            for filename, chunks, _ in documents:
+                progress_callback(filename, "processed", len(chunks), None)
+
+        self.logger.info(f"Indexed {len(documents)} documents ({len(chunk_ids)} chunks) from {folder_path} into database")
 
 
     def extract_text_from_file(self, file_path, filename):
@@ -72,30 +104,11 @@ class DocumentIndexer:
             str: The extracted text from the file.
             None: If the file type is unsupported or extraction fails.
         """
+        if not self.text_extractor.is_supported(filename):
+            self.logger.warning(f"Unsupported file type: {filename}")
+            return None
         try:
-            if filename.endswith('.docx'):
-                return self.text_extractor.extract_text_from_docx(file_path)
-            elif filename.endswith('.pptx'):
-                return self.text_extractor.extract_text_from_pptx(file_path)
-            elif filename.endswith('.pdf'):
-                return self.text_extractor.extract_text_from_pdf(file_path)
-            elif filename.endswith('.txt'):
-                return self.text_extractor.extract_text_from_txt(file_path)
-            elif filename.endswith('.xlsx'):
-                return self.text_extractor.extract_text_from_xlsx(file_path)
-            elif filename.endswith('.csv'):
-                return self.text_extractor.extract_text_from_csv(file_path)
-            elif filename.endswith('.html') or filename.endswith('.htm'):
-                return self.text_extractor.extract_text_from_html(file_path)
-            elif filename.endswith('.md'):
-                return self.text_extractor.extract_text_from_md(file_path)
-            elif filename.endswith('.rtf'):
-                return self.text_extractor.extract_text_from_rtf(file_path)
-            elif filename.endswith('.odt'):
-                return self.text_extractor.extract_text_from_odt(file_path)
-            else:
-                self.logger.warning(f"Unsupported file type: {filename}")
-                return None
+            return self.text_extractor.extract_text(file_path, filename)
         except Exception as e:
             self.logger.error(f"Error extracting text from file {filename}: {str(e)}")
             return None
@@ -1,4 +1,6 @@
 import nltk
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from nltk import pos_tag
 from nltk.corpus import stopwords
 from nltk.tokenize import word_tokenize
@@ -9,7 +11,7 @@ class DocumentRetriever:
     It supports both FAISS-based vector search and a hybrid approach combining vector and lexical searches.
     """
 
-    def __init__(self, logger=None, database_manager=None, text_vectorizer=None, use_hybrid_search=True, max_keywords=10):
+    def __init__(self, logger=None, database_manager=None, text_vectorizer=None, use_hybrid_search=True, max_keywords=10, search_workers=4):
         self.logger = logger
         self.database_manager = database_manager
         self.text_vectorizer = text_vectorizer
@@ -19,6 +21,9 @@ class DocumentRetriever:
             self._initialize_nltk_resources()
         self.max_keywords = max_keywords
 
+        # Runs the lexical branch of the hybrid search next to the embedding and FAISS search
+        self.search_executor = ThreadPoolExecutor(max_workers=search_workers, thread_name_prefix="hybrid-search")
+
 
     def _initialize_nltk_resources(self):
         """
@@ -71,8 +76,14 @@ class DocumentRetriever:
 
             self.logger.info(f"Initial search retrieved {len(chunks_map)} document IDs: {list(chunks_map.keys())}.")
             
-            # Return the chunks as a list of dictionaries with ID and text
-            return [{"id": chunk_id, "text": chunk_text} for chunk_id, chunk_text in chunks_map.items()]
+            # Return the chunks as a list of dictionaries with ID and text, and their cosine similarity when the
+            # FAISS scores are exact, so that reranking does not compute it again
+            similarities = dict(results) if self.database_manager.search_scores_are_cosines() else {}
+            documents = [{"id": chunk_id, "text": chunk_text} for chunk_id, chunk_text in chunks_map.items()]
+            for doc in documents:
+                if doc["id"] in similarities:
+                    doc["similarity"] = similarities[doc["id"]]
+            return documents
         except Exception as e:
             self.logger.error(f"Error during search: {e}")
             return []
@@ -119,26 +130,45 @@ class DocumentRetriever:
             return []
 
 
-    def hybrid_search(self, prompt, prompt_vector, top_n):
+    def lexical_search(self, prompt, top_k):
+        """
+        Extract keywords from a prompt and search for them in the SQLite database.
+
+        Args:
+            prompt (str): The textual query to search for.
+            top_k (int): The number of top matches to return.
+
+        Returns:
+            tuple: The extracted keywords and the list of matching chunks.
+        """
+        keywords = self.extract_keywords(prompt)
+        self.logger.debug(f"Extracted keywords for SQLite search.")
+        return keywords, self.database_manager.search_sqlite(keywords, top_k=top_k)
+
+
+    def hybrid_search(self, prompt, prompt_vector, top_n, lexical_future=None):
         """
         Perform a hybrid search combining vector and lexical search results.
+        The lexical search runs on the search executor while the FAISS search runs on the calling thread.
 
         Args:
             prompt (str): The textual query to search for.
+            prompt_vector (np.ndarray): The vector representation of the query.
             top_n (int): The number of top results to retrieve.
+            lexical_future (concurrent.futures.Future, optional): An already submitted lexical search for the prompt.
 
         Returns:
-            list: A list of the most relevant documents' metadata (ID, text, and score).
+            list: A list of the most relevant documents' metadata (ID, text, score, and the cosine similarity of
+                the FAISS results when their scores are exact).
         """
         self.logger.info("Performing hybrid search.")
 
-        # Extract keywords from the prompt
-        keywords = self.extract_keywords(prompt)
-        self.logger.debug(f"Extracted keywords for SQLite search.")
+        if lexical_future is None:
+            lexical_future = self.search_executor.submit(self.lexical_search, prompt, top_n)
 
-        # Search FAISS results and SQLite results
+        # Search FAISS results while the SQLite search runs concurrently
         faiss_results = self.database_manager.search_faiss(prompt_vector, top_k=top_n)
-        sqlite_results = self.database_manager.search_sqlite(keywords, top_k=top_n)
+        keywords, sqlite_results = lexical_future.result()
 
         # Log the found IDs
         self.logger.info(f"Found {len(faiss_results)} results in FAISS for the query vector.")
@@ -155,27 +185,34 @@ class DocumentRetriever:
         # Use a dictionary to store the results and avoid duplicates by chunk_id
         combined_results = {}
 
-        # Add FAISS results with their distances as scores
-        for chunk_id, distance in faiss_results:
+        # Add FAISS results with their similarity scores, kept as the cosine similarity when they are exact so that
+        # reranking does not compute it again
+        similarity_is_exact = self.database_manager.search_scores_are_cosines()
+        for chunk_id, score in faiss_results:
             chunk_text = chunks_map.get(chunk_id, "")
             combined_results[chunk_id] = {
                 "id": chunk_id,
                 "text": chunk_text,
-                "score": 1 / (1 + distance)  # Using FAISS score
+                "score": score  # Using FAISS score
             }
+            if similarity_is_exact:
+                combined_results[chunk_id]["similarity"] = score
 
-        # Add SQLite results, ensuring no duplicates by chunk_id
+        # Add SQLite results, ensuring no duplicates by chunk_id.
+        # BM25 scores are normalized by the best match, which keeps a lower weight (0.5) for lexical matches.
+        max_lexical_score = max((result["score"] for result in sqlite_results), default=0) or 1
         for result in sqlite_results:
             chunk_id = result["id"]
+            lexical_score = 0.5 * result["score"] / max_lexical_score
             if chunk_id not in combined_results:
                 combined_results[chunk_id] = {
                     "id": chunk_id,
                     "text": result["text"],
-                    "score": 0.5  # Lower weight for lexical matches
+                    "score": lexical_score
                 }
             else:
                 # If document already exists, update its score to keep the higher one
-                combined_results[chunk_id]["score"] = max(combined_results[chunk_id]["score"], 0.5)
+                combined_results[chunk_id]["score"] = max(combined_results[chunk_id]["score"], lexical_score)
 
         # Convert the dictionary back to a sorted list based on scores
         sorted_results = sorted(combined_results.values(), key=lambda x: x["score"], reverse=True)
@@ -199,15 +236,35 @@ class DocumentRetriever:
         try:
             self.logger.info("Reranking documents based on similarity to the prompt vector.")
 
-            # Compute similarity scores for each document
+            if not documents:
+                return []
+
+            # The FAISS results already carry their exact cosine similarity, which is reused as is.
+            # The other documents use the vectors stored at indexing time; only chunks without one are encoded.
+            documents_to_score = [doc for doc in documents if "similarity" not in doc]
+            similarities = {doc["id"]: doc["similarity"] for doc in documents if "similarity" in doc}
+            if documents_to_score:
+                vectors_map = self.database_manager.fetch_vectors_by_ids([doc["id"] for doc in documents_to_score])
+                normalized = self.database_manager.vectors_are_normalized()
+                missing_documents = [doc for doc in documents_to_score if doc["id"] not in vectors_map]
+                if missing_documents:
+                    self.logger.warning(f"No stored vector for {len(missing_documents)} documents, encoding them.")
+                    missing_vectors = self.text_vectorizer.vectorize_texts([doc["text"] for doc in missing_documents])
+                    if normalized:
+                        missing_vectors = missing_vectors / np.linalg.norm(missing_vectors, axis=1, keepdims=True)
+                    vectors_map.update({doc["id"]: vector for doc, vector in zip(missing_documents, missing_vectors)})
+
+                # Compute the similarity scores of these documents in one matrix-vector operation.
+                # Stored vectors are normalized with the inner product metric, so their norms are not recomputed.
+                matrix = np.vstack([vectors_map[doc["id"]] for doc in documents_to_score])
+                scores = self.text_vectorizer.compute_similarities_from_matrix(prompt_vector, matrix, normalized=normalized)
+                similarities.update({doc["id"]: score for doc, score in zip(documents_to_score, scores)})
+
             scored_documents = [
                 {
                     "id": doc["id"],
                     "text": doc["text"],
-                    "score": self.text_vectorizer.compute_similarity_from_vector(
-                        prompt_vector,
-                        self.text_vectorizer.vectorize_text(doc["text"])
-                    ),
+                    "score": float(similarities[doc["id"]]),
                 }
                 for doc in documents
             ]
@@ -240,10 +297,15 @@ class DocumentRetriever:
         """
         self.logger.info("Retrieving documents for prompt: %s", prompt)
 
+        # Start the keyword extraction and SQLite search before encoding the prompt, as they are independent
+        lexical_future = None
+        if self.use_hybrid_search:
+            lexical_future = self.search_executor.submit(self.lexical_search, prompt, top_n * expansion_factor)
+
         prompt_vector = self.text_vectorizer.vectorize_text(prompt)
 
         if self.use_hybrid_search:
-            results = self.hybrid_search(prompt, prompt_vector, top_n * expansion_factor)
+            results = self.hybrid_search(prompt, prompt_vector, top_n * expansion_factor, lexical_future=lexical_future)
         else:
             results = self.search_in_index(prompt_vector, top_n * expansion_factor)
         
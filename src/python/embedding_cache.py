@@ -0,0 +1,267 @@
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+import numpy as np
+from collections import OrderedDict
+
+class EmbeddingCache:
+    """
+    A content-hash-keyed cache for text embeddings.
+    It combines an in-memory LRU tier bounded by a byte budget with an optional persistent SQLite tier
+    that survives restarts, bounded by a number of entries. Both tiers evict the least recently used
+    embeddings and are tied to the model that produced them.
+    """
+
+    def __init__(self, logger=None, model_id=None, max_memory_bytes=64 * 1024 * 1024, persistent_path=None,
+                 max_persistent_entries=200000):
+        self.logger = logger
+        self.model_id = model_id
+        self.max_memory_bytes = max_memory_bytes
+        self.persistent_path = persistent_path
+        self.max_persistent_entries = max_persistent_entries
+
+        self._entries = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+
+        self.memory_hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+
+        self._conn = None
+        if persistent_path:
+            self._initialize_persistent_tier()
+
+
+    def _initialize_persistent_tier(self):
+        """
+        Open the persistent SQLite tier and drop its content if it was produced by another model.
+        """
+        try:
+            self._conn = sqlite3.connect(self.persistent_path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode = WAL")
+            self._conn.execute("PRAGMA synchronous = NORMAL")
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    key TEXT PRIMARY KEY,
+                    vector BLOB NOT NULL,
+                    last_used REAL NOT NULL DEFAULT 0
+                )
+            ''')
+            columns = [row[1] for row in self._conn.execute("PRAGMA table_info(embeddings)")]
+            if 'last_used' not in columns:
+                # Migrate caches created before the eviction, their entries being evicted first
+                self._conn.execute("ALTER TABLE embeddings ADD COLUMN last_used REAL NOT NULL DEFAULT 0")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings (last_used)")
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS metadata (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL
+                )
+            ''')
+
+            row = self._conn.execute("SELECT value FROM metadata WHERE key = 'model_id'").fetchone()
+            if row is None or row[0] != self.model_id:
+                if row is not None:
+                    self.logger.info(f"Vectorizer model changed from {row[0]} to {self.model_id}, clearing the embedding cache.")
+                self._conn.execute("DELETE FROM embeddings")
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO metadata (key, value) VALUES ('model_id', ?)",
+                    (self.model_id,)
+                )
+            # The number of entries is kept in the metadata, updated in the same transactions as the entries,
+            # so that it stays exact when several worker processes share the file
+            self._conn.execute(
+                "INSERT OR REPLACE INTO metadata (key, value) VALUES ('entries', (SELECT COUNT(*) FROM embeddings))"
+            )
+            entries = self._evict_persistent(0)
+            self._conn.commit()
+            self.logger.info(f"Persistent embedding cache opened at {self.persistent_path} with {entries} entries.")
+        except sqlite3.Error as e:
+            self.logger.error(f"Error opening the persistent embedding cache, using memory only: {e}")
+            self._conn = None
+
+
+    def _make_key(self, text):
+        """
+        Build the cache key of a text from the model identifier and the text content.
+        """
+        digest = hashlib.sha256()
+        digest.update(str(self.model_id).encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(text.encode('utf-8'))
+        return digest.hexdigest()
+
+
+    def _remember(self, key, vector):
+        """
+        Store a vector in the in-memory tier and evict the least recently used entries over budget.
+        Must be called with the lock held.
+        """
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            return
+        if vector.nbytes > self.max_memory_bytes:
+            return
+        self._entries[key] = vector
+        self._memory_bytes += vector.nbytes
+        while self._memory_bytes > self.max_memory_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._memory_bytes -= evicted.nbytes
+
+
+    def _evict_persistent(self, inserted):
+        """
+        Count the entries inserted in the persistent tier and delete the least recently used entries beyond
+        its size limit. Must be called with the lock held, in the transaction of the insertion, which the caller commits.
+
+        Args:
+            inserted (int): The number of entries inserted in the transaction.
+
+        Returns:
+            int: The number of entries of the persistent tier.
+        """
+        self._conn.execute(
+            "UPDATE metadata SET value = CAST(value AS INTEGER) + ? WHERE key = 'entries'", (inserted,)
+        )
+        entries = int(self._conn.execute("SELECT value FROM metadata WHERE key = 'entries'").fetchone()[0])
+        excess = entries - self.max_persistent_entries
+        if self.max_persistent_entries and excess > 0:
+            deleted = self._conn.execute(
+                "DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                (excess,)
+            ).rowcount
+            self._conn.execute(
+                "UPDATE metadata SET value = CAST(value AS INTEGER) - ? WHERE key = 'entries'", (deleted,)
+            )
+            entries -= deleted
+        return entries
+
+
+    def get_many(self, texts):
+        """
+        Look up the embeddings of several texts.
+
+        Args:
+            texts (list): The texts to look up.
+
+        Returns:
+            list: The cached vector of each text, or None for texts that are not cached.
+        """
+        keys = [self._make_key(text) for text in texts]
+        results = [None] * len(texts)
+        missing = {}
+
+        with self._lock:
+            for position, key in enumerate(keys):
+                vector = self._entries.get(key)
+                if vector is not None:
+                    self._entries.move_to_end(key)
+                    results[position] = vector
+                    self.memory_hits += 1
+                else:
+                    missing.setdefault(key, []).append(position)
+
+            if missing and self._conn is not None:
+                try:
+                    rows = self._conn.execute(
+                        "SELECT key, vector FROM embeddings WHERE key IN (SELECT value FROM json_each(?))",
+                        (json.dumps(list(missing)),)
+                    ).fetchall()
+                except sqlite3.Error as e:
+                    self.logger.error(f"Error reading the persistent embedding cache: {e}")
+                    rows = []
+                for key, blob in rows:
+                    vector = np.frombuffer(blob, dtype=np.float32)
+                    self._remember(key, vector)
+                    for position in missing.pop(key):
+                        results[position] = vector
+                        self.persistent_hits += 1
+
+                if rows:
+                    # Refresh the entries read back, so the eviction keeps them
+                    try:
+                        self._conn.execute(
+                            "UPDATE embeddings SET last_used = ? WHERE key IN (SELECT value FROM json_each(?))",
+                            (time.time(), json.dumps([key for key, _ in rows]))
+                        )
+                        self._conn.commit()
+                    except sqlite3.Error as e:
+                        self._conn.rollback()
+                        self.logger.error(f"Error updating the persistent embedding cache: {e}")
+
+            self.misses += sum(len(positions) for positions in missing.values())
+
+        return results
+
+
+    def put_many(self, texts, vectors):
+        """
+        Store the embeddings of several texts in both cache tiers, evicting the least recently used
+        entries of the persistent tier beyond its size limit.
+
+        Args:
+            texts (list): The texts that were vectorized.
+            vectors (list): The vectors of the texts, aligned with texts.
+        """
+        entries = []
+        now = time.time()
+        with self._lock:
+            for text, vector in zip(texts, vectors):
+                vector = np.array(vector, dtype=np.float32)
+                vector.setflags(write=False)
+                key = self._make_key(text)
+                self._remember(key, vector)
+                entries.append((key, vector.tobytes(), now))
+
+            if entries and self._conn is not None:
+                try:
+                    # A key always maps to the same vector, so existing entries are kept as they are
+                    cursor = self._conn.executemany(
+                        "INSERT OR IGNORE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)", entries
+                    )
+                    self._evict_persistent(cursor.rowcount)
+                    self._conn.commit()
+                except sqlite3.Error as e:
+                    self._conn.rollback()
+                    self.logger.error(f"Error writing to the persistent embedding cache: {e}")
+
+
+    def clear(self):
+        """
+        Remove every entry from both cache tiers.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._memory_bytes = 0
+            if self._conn is not None:
+                try:
+                    self._conn.execute("DELETE FROM embeddings")
+                    self._conn.execute("UPDATE metadata SET value = '0' WHERE key = 'entries'")
+                    self._conn.commit()
+                except sqlite3.Error as e:
+                    self._conn.rollback()
+                    self.logger.error(f"Error clearing the persistent embedding cache: {e}")
+        self.logger.info("Embedding cache cleared.")
+
+
+    def get_stats(self):
+        """
+        Return the hit and miss counters of the cache.
+
+        Returns:
+            dict: The counters, the hit rate and the memory usage of the cache.
+        """
+        with self._lock:
+            hits = self.memory_hits + self.persistent_hits
+            lookups = hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "persistent_hits": self.persistent_hits,
+                "misses": self.misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "memory_entries": len(self._entries),
+                "memory_bytes": self._memory_bytes,
+            }
@@ -0,0 +1,189 @@
+import json
+import asyncio
+import hashlib
+
+class Flight:
+    """
+    One upstream generation shared by every identical request that arrived while it was running.
+    """
+
+    def __init__(self, key):
+        self.key = key
+        self.chunks = []
+        self.done = False
+        self.subscribers = 0
+        self.task = None
+        self.new_chunk = asyncio.Event()
+
+
+    def publish(self, chunk):
+        """
+        Append a chunk and wake up the subscribers waiting for it.
+        """
+        self.chunks.append(chunk)
+        self._notify()
+
+
+    def finish(self):
+        """
+        Mark the generation as finished and wake up the subscribers.
+        """
+        self.done = True
+        self._notify()
+
+
+    def _notify(self):
+        event, self.new_chunk = self.new_chunk, asyncio.Event()
+        event.set()
+
+
+class GenerationCoalescer:
+    """
+    Singleflight coalescing of identical in-flight generations.
+    The first request starts the upstream generation; identical requests arriving while it runs subscribe to it,
+    get the already produced prefix replayed, then receive the following chunks as they are generated.
+    The upstream generation is cancelled once every subscriber has left.
+    """
+
+    def __init__(self, logger=None):
+        self.logger = logger
+        self._flights = {}
+
+        self.flights_started = 0
+        self.requests_coalesced = 0
+
+
+    @staticmethod
+    def make_key(prompt, **settings):
+        """
+        Build the key identifying identical requests.
+
+        Args:
+            prompt (str): The user prompt. It is normalized for case and whitespace.
+            **settings: Everything else the answer depends on (options, RAG state, corpus version...).
+
+        Returns:
+            str: The request key.
+        """
+        normalized_prompt = " ".join(prompt.lower().split())
+        payload = json.dumps({"prompt": normalized_prompt, "settings": settings}, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+    def is_in_flight(self, key):
+        """
+        Check whether an identical generation is currently running.
+
+        Args:
+            key (str): The request key.
+
+        Returns:
+            bool: True if a request with this key can join a running generation.
+        """
+        return key in self._flights
+
+
+    async def _run(self, flight, producer):
+        """
+        Drive the upstream generation and publish its chunks to the subscribers.
+        """
+        try:
+            async for chunk in producer:
+                flight.publish(chunk)
+        except asyncio.CancelledError:
+            self.logger.info("Coalesced generation cancelled, no subscriber left.")
+            raise
+        except Exception as e:
+            self.logger.error(f"Coalesced generation failed: {e}")
+        finally:
+            flight.finish()
+            if self._flights.get(flight.key) is flight:
+                del self._flights[flight.key]
+
+
+    def join(self, key, producer_factory):
+        """
+        Subscribe to the generation identified by key, starting it if it is not running yet.
+        Joining is synchronous, so a caller that checked is_in_flight without awaiting in between joins the
+        generation it saw, or starts one itself knowing that it had to.
+
+        Args:
+            key (str): The request key.
+            producer_factory (callable): Returns the async generator producing the chunks. Only called
+                when no identical generation is running.
+
+        Returns:
+            Flight: The generation joined. The caller must stream it with stream and then call leave.
+        """
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = Flight(key)
+            self._flights[key] = flight
+            flight.task = asyncio.create_task(self._run(flight, producer_factory()))
+            self.flights_started += 1
+        else:
+            self.requests_coalesced += 1
+            self.logger.info(f"Joining an identical generation in progress, replaying {len(flight.chunks)} chunks.")
+        flight.subscribers += 1
+        return flight
+
+
+    async def stream(self, flight, stop_event=None):
+        """
+        Stream the chunks of a joined generation.
+
+        Args:
+            flight (Flight): The generation returned by join.
+            stop_event (asyncio.Event): Set to stop streaming before the end of the generation. Other subscribers
+                keep receiving the chunks.
+
+        Yields:
+            str: Chunks of the generated response, starting from the first one.
+        """
+        position = 0
+        while True:
+            if position < len(flight.chunks):
+                position += 1
+                yield flight.chunks[position - 1]
+            elif flight.done:
+                break
+            elif stop_event is None:
+                await flight.new_chunk.wait()
+            else:
+                new_chunk = asyncio.ensure_future(flight.new_chunk.wait())
+                stopped = asyncio.ensure_future(stop_event.wait())
+                try:
+                    await asyncio.wait((new_chunk, stopped), return_when=asyncio.FIRST_COMPLETED)
+                finally:
+                    new_chunk.cancel()
+                    stopped.cancel()
+            if stop_event is not None and stop_event.is_set():
+                self.logger.info("Subscriber stopped, leaving the coalesced generation.")
+                break
+
+
+    def leave(self, flight):
+        """
+        Unsubscribe from a joined generation, which is cancelled once every subscriber has left.
+        Must be called exactly once per join, whether the generation was streamed or not.
+
+        Args:
+            flight (Flight): The generation returned by join.
+        """
+        flight.subscribers -= 1
+        if flight.subscribers == 0 and not flight.done:
+            flight.task.cancel()
+
+
+    def get_stats(self):
+        """
+        Return the counters of the coalescer.
+
+        Returns:
+            dict: The number of generations in flight, started and of requests that joined one.
+        """
+        return {
+            "in_flight": len(self._flights),
+            "flights_started": self.flights_started,
+            "requests_coalesced": self.requests_coalesced,
+        }
@@ -0,0 +1,157 @@
+import math
+import time
+import asyncio
+from collections import deque
+
+class SchedulerFullError(Exception):
+    """
+    Raised when a generation cannot be admitted because the wait queue is full.
+    """
+
+    def __init__(self, retry_after):
+        super().__init__(f"The generation queue is full. Retry after {retry_after} seconds.")
+        self.retry_after = retry_after
+
+
+class GenerationTicket:
+    """
+    A reservation for one upstream generation, either running or waiting in the queue.
+    """
+
+    def __init__(self, future, position):
+        self.future = future
+        self.position = position
+        self.enqueued_at = time.monotonic()
+        self.started_at = None
+
+
+class GenerationScheduler:
+    """
+    Admission control in front of Ollama.
+    It limits the number of concurrent upstream generations and queues the other requests in FIFO order,
+    rejecting new requests once the queue is full.
+    """
+
+    def __init__(self, logger=None, max_concurrent=4, max_queue_size=32, default_retry_after=10):
+        self.logger = logger
+        self.max_concurrent = max_concurrent
+        self.max_queue_size = max_queue_size
+        self.default_retry_after = default_retry_after
+
+        self._active = 0
+        self._waiting = deque()
+
+        self.total_admitted = 0
+        self.total_rejected = 0
+        self._total_wait_time = 0.0
+        self._total_run_time = 0.0
+        self._started = 0
+        self._completed = 0
+
+
+    def reserve(self):
+        """
+        Reserve a generation slot, or a place in the wait queue if every slot is taken.
+        Must be called from the event loop.
+
+        Returns:
+            GenerationTicket: The reservation. Its position is 0 when a slot was granted immediately,
+            otherwise its 1-based position in the wait queue.
+
+        Raises:
+            SchedulerFullError: If the wait queue is full.
+        """
+        future = asyncio.get_running_loop().create_future()
+
+        if self._active < self.max_concurrent and not self._waiting:
+            self._active += 1
+            future.set_result(None)
+            ticket = GenerationTicket(future, 0)
+        elif len(self._waiting) >= self.max_queue_size:
+            self.total_rejected += 1
+            retry_after = self.estimate_retry_after()
+            self.logger.warning(f"Generation queue full ({len(self._waiting)} waiting), rejecting request.")
+            raise SchedulerFullError(retry_after)
+        else:
+            ticket = GenerationTicket(future, len(self._waiting) + 1)
+            self._waiting.append(ticket)
+            self.logger.info(f"Generation queued at position {ticket.position}.")
+
+        self.total_admitted += 1
+        return ticket
+
+
+    async def wait(self, ticket):
+        """
+        Wait until the ticket is granted a generation slot.
+
+        Args:
+            ticket (GenerationTicket): The reservation returned by reserve.
+
+        Returns:
+            float: The time spent waiting in the queue, in seconds.
+        """
+        await asyncio.shield(ticket.future)
+        ticket.started_at = time.monotonic()
+        wait_time = ticket.started_at - ticket.enqueued_at
+        self._total_wait_time += wait_time
+        self._started += 1
+        if ticket.position:
+            self.logger.info(f"Generation started after waiting {wait_time:.2f}s from queue position {ticket.position}.")
+        return wait_time
+
+
+    def release(self, ticket):
+        """
+        Release a reservation, handing its slot over to the next request in the queue.
+        Abandoned reservations still waiting in the queue are simply removed from it.
+
+        Args:
+            ticket (GenerationTicket): The reservation to release.
+        """
+        if not ticket.future.done():
+            # The request left before being granted a slot
+            self._waiting.remove(ticket)
+            ticket.future.cancel()
+            return
+
+        if ticket.started_at is not None:
+            self._total_run_time += time.monotonic() - ticket.started_at
+            self._completed += 1
+
+        if self._waiting:
+            next_ticket = self._waiting.popleft()
+            next_ticket.future.set_result(None)
+        else:
+            self._active -= 1
+
+
+    def estimate_retry_after(self):
+        """
+        Estimate how many seconds a rejected client should wait before retrying.
+
+        Returns:
+            int: The estimated number of seconds until a place frees up in the queue.
+        """
+        if not self._completed:
+            return self.default_retry_after
+        average_run_time = self._total_run_time / self._completed
+        return max(1, math.ceil(average_run_time * (len(self._waiting) + 1) / self.max_concurrent))
+
+
+    def get_stats(self):
+        """
+        Return the current load and the counters of the scheduler.
+
+        Returns:
+            dict: The number of running and waiting generations, the limits and the average wait time.
+        """
+        return {
+            "active": self._active,
+            "waiting": len(self._waiting),
+            "max_concurrent": self.max_concurrent,
+            "max_queue_size": self.max_queue_size,
+            "total_admitted": self.total_admitted,
+            "total_rejected": self.total_rejected,
+            "average_wait_time": self._total_wait_time / self._started if self._started else 0.0,
+        }
@@ -0,0 +1,126 @@
+import time
+import argparse
+import faiss
+import numpy as np
+
+from config_loader import ConfigLoader
+from database_manager import DatabaseManager
+
+# Compare the memory, speed and recall of the FAISS index types on a synthetic corpus, using the settings of config.yaml.
+# The exact flat index is the baseline the recall is measured against: python index_report.py --vectors 100000
+
+def make_corpus(num_vectors, num_queries, dimension, seed=0):
+    """
+    Generate a synthetic corpus shaped like sentence embeddings: unit vectors grouped around topics.
+
+    Args:
+        num_vectors (int): The number of vectors of the corpus.
+        num_queries (int): The number of query vectors.
+        dimension (int): The dimension of the vectors.
+        seed (int): The seed of the random generator.
+
+    Returns:
+        tuple: The corpus and the queries as float32 matrices.
+    """
+    rng = np.random.default_rng(seed)
+    topics = rng.standard_normal((max(num_vectors // 100, 1), dimension)).astype(np.float32)
+
+    def sample(count):
+        vectors = topics[rng.integers(len(topics), size=count)] + 0.6 * rng.standard_normal((count, dimension)).astype(np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    return sample(num_vectors), sample(num_queries)
+
+
+def build_index(index_type, config, vectors):
+    """
+    Build an index of the given type the way DatabaseManager does, and fill it with the corpus.
+
+    Returns:
+        tuple: The index and the time it took to train and fill it, in seconds.
+    """
+    description = DatabaseManager.FAISS_INDEX_TYPES[index_type](config)
+    metric = DatabaseManager.FAISS_METRICS[config.get('metric', 'inner_product')]
+    index = faiss.index_factory(vectors.shape[1], f"IDMap,{description}", metric)
+    base_index = faiss.downcast_index(index.index)
+    if isinstance(base_index, faiss.IndexHNSW):
+        base_index.hnsw.efConstruction = config.get('ef_construction', 40)
+
+    start_time = time.perf_counter()
+    if not index.is_trained:
+        sample = vectors[np.random.default_rng(0).permutation(len(vectors))[:config.get('max_train_vectors', 100000)]]
+        index.train(sample)
+    index.add_with_ids(vectors, np.arange(len(vectors), dtype=np.int64))
+    build_time = time.perf_counter() - start_time
+
+    if isinstance(base_index, faiss.IndexIVF):
+        base_index.nprobe = config.get('nprobe', 16)
+    elif isinstance(base_index, faiss.IndexHNSW):
+        base_index.hnsw.efSearch = config.get('ef_search', 64)
+    return index, build_time
+
+
+def search(index, vectors, queries, k, refine_factor):
+    """
+    Run the queries one at a time, as the application does, optionally re-scoring refine_factor * k candidates
+    with the exact vectors.
+
+    Returns:
+        tuple: The IDs found for each query and the median latency in milliseconds.
+    """
+    found = np.empty((len(queries), k), dtype=np.int64)
+    latencies = []
+    for i, query in enumerate(queries):
+        start_time = time.perf_counter()
+        _, ids = index.search(query[None, :], k * refine_factor)
+        ids = ids[0][ids[0] != -1]
+        if refine_factor > 1:
+            if index.metric_type == faiss.METRIC_INNER_PRODUCT:
+                ids = ids[np.argsort(-(vectors[ids] @ query), kind='stable')]
+            else:
+                ids = ids[np.argsort(np.sum((vectors[ids] - query) ** 2, axis=1), kind='stable')]
+        latencies.append(time.perf_counter() - start_time)
+        found[i] = np.pad(ids[:k], (0, k - len(ids[:k])), constant_values=-1)
+    return found, 1000 * float(np.median(latencies))
+
+
+def recall_at_k(found, ground_truth):
+    """
+    Return the average fraction of the true k nearest neighbors found for each query.
+    """
+    return float(np.mean([len(set(f) & set(t)) / len(t) for f, t in zip(found, ground_truth)]))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the FAISS index types on a synthetic corpus.")
+    parser.add_argument("--vectors", type=int, default=100000, help="The number of vectors of the corpus.")
+    parser.add_argument("--queries", type=int, default=500, help="The number of queries.")
+    parser.add_argument("--k", type=int, default=10, help="The number of neighbors retrieved per query.")
+    parser.add_argument("--refine-factor", type=int, default=4, help="The candidates re-scored per neighbor when refining.")
+    parser.add_argument("--types", nargs="+", default=list(DatabaseManager.FAISS_INDEX_TYPES), help="The index types to compare.")
+    args = parser.parse_args()
+
+    config = ConfigLoader().load_config()['faiss']
+    vectors, queries = make_corpus(args.vectors, args.queries, config['dimension'])
+    print(f"Synthetic corpus: {args.vectors} vectors of dimension {config['dimension']}, {args.queries} queries, k={args.k}, "
+          f"{config.get('metric', 'inner_product')} metric.")
+
+    flat_index, _ = build_index("flat", config, vectors)
+    ground_truth, _ = search(flat_index, vectors, queries, args.k, 1)
+
+    header = f"{'index type':<10} {'bytes/vector':>12} {'build (s)':>10} {'latency (ms)':>13} {'recall@k':>9} " \
+             f"{'refined latency (ms)':>21} {'refined recall@k':>17}"
+    print(header)
+    print("-" * len(header))
+    for index_type in args.types:
+        index, build_time = build_index(index_type, config, vectors)
+        bytes_per_vector = faiss.serialize_index(index).nbytes / args.vectors
+        found, latency = search(index, vectors, queries, args.k, 1)
+        refined_found, refined_latency = search(index, vectors, queries, args.k, args.refine_factor)
+        print(f"{index_type:<10} {bytes_per_vector:>12.1f} {build_time:>10.2f} {latency:>13.3f} "
+              f"{recall_at_k(found, ground_truth):>9.3f} {refined_latency:>21.3f} "
+              f"{recall_at_k(refined_found, ground_truth):>17.3f}")
+        del index
+
+    print("Bytes per vector include the 8-byte chunk ID. Refined searches read the exact vectors from memory here, "
+          "the application reads them from SQLite.")
@@ -0,0 +1,349 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import sqlite3
+import threading
+
+class IngestionQueue:
+    """
+    A persistent queue of document uploads, indexed in the background by a bounded pool of worker threads.
+    Each job owns a workspace directory holding its uploaded files until they are indexed, so concurrent uploads
+    never touch each other's files. The jobs are stored in a SQLite table shared by every worker process, which
+    claim them atomically. A running job is kept alive by a heartbeat; once the heartbeat stops, because its
+    process crashed or was restarted, the job is queued again and indexed from its workspace. The documents are
+    stored with the ID of their job, so the files a crashed attempt already stored are not stored twice.
+    """
+
+    def __init__(self, logger=None, sqlite_db_path=None, workspace_path=None, document_indexer_provider=None,
+                 workers=2, max_attempts=3, heartbeat_interval=10, stale_after=60, retention=86400, poll_interval=2):
+        self.logger = logger
+        self.workspace_path = workspace_path
+        self.document_indexer_provider = document_indexer_provider
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.heartbeat_interval = heartbeat_interval
+        self.stale_after = stale_after
+        self.retention = retention
+        self.poll_interval = poll_interval
+
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads = []
+        self._running = set()
+
+        os.makedirs(self.workspace_path, exist_ok=True)
+
+        # Transactions are managed explicitly, so that a job is claimed by a single worker
+        self._connection = sqlite3.connect(sqlite_db_path, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode = WAL")
+        self._connection.execute("PRAGMA busy_timeout = 5000")
+        self._connection.execute('''
+            CREATE TABLE IF NOT EXISTS ingestion_jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                files TEXT NOT NULL,
+                error TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                heartbeat_at REAL
+            )
+        ''')
+        self._connection.execute("CREATE INDEX IF NOT EXISTS idx_ingestion_jobs_status ON ingestion_jobs (status, created_at)")
+
+
+    def start(self):
+        """
+        Start the worker threads and the heartbeat thread.
+        Jobs left queued by a previous run are picked up right away, interrupted ones once their heartbeat is stale.
+        """
+        self._stop.clear()
+        self._threads = [
+            threading.Thread(target=self._worker_loop, name=f"ingestion-{i}", daemon=True)
+            for i in range(self.workers)
+        ]
+        self._threads.append(threading.Thread(target=self._heartbeat_loop, name="ingestion-heartbeat", daemon=True))
+        for thread in self._threads:
+            thread.start()
+        self.logger.info(f"Ingestion queue started with {self.workers} workers.")
+
+
+    def stop(self):
+        """
+        Stop the idle workers and the heartbeat.
+        A job still running is abandoned with its workspace and indexed again after the restart.
+        """
+        self._stop.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout=1)
+        self._threads = []
+
+
+    def create_workspace(self):
+        """
+        Create the workspace of a new job, where its uploaded files are saved before it is submitted.
+
+        Returns:
+            tuple: The ID of the job and the path of its workspace.
+        """
+        job_id = uuid.uuid4().hex
+        workspace = self._workspace(job_id)
+        os.makedirs(workspace)
+        return job_id, workspace
+
+
+    def remove_workspace(self, job_id):
+        """
+        Remove the workspace of a job and the files it contains.
+
+        Args:
+            job_id (str): The ID of the job.
+        """
+        try:
+            shutil.rmtree(self._workspace(job_id))
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            self.logger.error(f"Failed to delete the workspace of ingestion job {job_id}: {e}")
+
+
+    def submit(self, job_id, filenames):
+        """
+        Queue a job once its files are saved in its workspace.
+
+        Args:
+            job_id (str): The ID returned by create_workspace.
+            filenames (list): The names of the files saved in the workspace.
+        """
+        files = [{"name": filename, "status": "pending", "chunks": 0, "error": None} for filename in filenames]
+        with self._lock:
+            self._connection.execute(
+                "INSERT INTO ingestion_jobs (id, status, files, created_at) VALUES (?, 'queued', ?, ?)",
+                (job_id, json.dumps(files), time.time())
+            )
+        self.logger.info(f"Ingestion job {job_id} queued with {len(files)} files.")
+        self._wake.set()
+
+
+    def get_job(self, job_id):
+        """
+        Return the progress of a job.
+
+        Args:
+            job_id (str): The ID of the job.
+
+        Returns:
+            dict: The status of the job, the progress and error of each file, and the indexing rate in chunks per second.
+                A file is 'pending', 'vectorized', then 'processed' once its chunks are stored and searchable,
+                or 'failed'.
+            None: If the job does not exist or has expired.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT status, files, error, attempts, created_at, started_at, finished_at FROM ingestion_jobs WHERE id = ?",
+                (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+
+        status, files, error, attempts, created_at, started_at, finished_at = row
+        files = json.loads(files)
+        chunks = sum(file["chunks"] for file in files)
+        elapsed = (finished_at or time.time()) - started_at if started_at is not None else 0
+        return {
+            "job_id": job_id,
+            "status": status,
+            "files": files,
+            "files_total": len(files),
+            "files_vectorized": sum(file["status"] != "pending" for file in files),
+            "files_processed": sum(file["status"] in ("processed", "failed") for file in files),
+            "chunks": chunks,
+            "chunks_per_second": round(chunks / elapsed, 1) if elapsed > 0 else 0.0,
+            "error": error,
+            "attempts": attempts,
+            "created_at": created_at,
+            "started_at": started_at,
+            "finished_at": finished_at
+        }
+
+
+    def _workspace(self, job_id):
+        """
+        Return the path of the workspace of a job.
+        """
+        return os.path.join(self.workspace_path, job_id)
+
+
+    def _worker_loop(self):
+        """
+        Index the queued jobs one at a time until the queue is stopped.
+        """
+        while not self._stop.is_set():
+            try:
+                job_id = self._claim_job()
+            except sqlite3.Error as e:
+                self.logger.error(f"Error claiming an ingestion job: {e}")
+                job_id = None
+            if job_id is None:
+                # Jobs submitted by other worker processes are found by polling
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+                continue
+            self._run_job(job_id)
+
+
+    def _claim_job(self):
+        """
+        Mark the oldest queued job as running, unless another worker claimed it first.
+
+        Returns:
+            str: The ID of the claimed job, or None if no job is queued.
+        """
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._connection.execute(
+                    "SELECT id, files FROM ingestion_jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+                ).fetchone()
+                if row is None:
+                    self._connection.execute("COMMIT")
+                    return None
+
+                # A resumed job is indexed again from the start, skipping its stored files, so its progress is reset
+                job_id, files = row
+                files = [{**file, "status": "pending", "chunks": 0, "error": None} for file in json.loads(files)]
+                now = time.time()
+                self._connection.execute(
+                    "UPDATE ingestion_jobs SET status = 'running', files = ?, attempts = attempts + 1, "
+                    "started_at = ?, heartbeat_at = ? WHERE id = ?",
+                    (json.dumps(files), now, now, job_id)
+                )
+                self._connection.execute("COMMIT")
+            except Exception:
+                self._connection.execute("ROLLBACK")
+                raise
+            self._running.add(job_id)
+        return job_id
+
+
+    def _run_job(self, job_id):
+        """
+        Index the files of a claimed job, record the outcome and remove its workspace.
+        """
+        workspace = self._workspace(job_id)
+        self.logger.info(f"Ingestion job {job_id} started.")
+        try:
+            if not os.path.isdir(workspace):
+                raise RuntimeError("The uploaded files of the job are missing.")
+            document_indexer = self.document_indexer_provider()
+            document_indexer.index_documents(
+                workspace,
+                progress_callback=lambda filename, status, chunks, error: self._record_file(job_id, filename, status, chunks, error),
+                job_id=job_id
+            )
+            with self._lock:
+                files = json.loads(self._connection.execute(
+                    "SELECT files FROM ingestion_jobs WHERE id = ?", (job_id,)
+                ).fetchone()[0])
+            if files and not any(file["status"] == "processed" for file in files):
+                raise RuntimeError("None of the uploaded files could be indexed.")
+            self._finish_job(job_id, "completed", None)
+            self.logger.info(f"Ingestion job {job_id} completed.")
+        except Exception as e:
+            self.logger.error(f"Ingestion job {job_id} failed: {e}")
+            self._finish_job(job_id, "failed", str(e))
+        finally:
+            with self._lock:
+                self._running.discard(job_id)
+            self.remove_workspace(job_id)
+
+
+    def _record_file(self, job_id, filename, status, chunks, error):
+        """
+        Record that a file of a job was vectorized, processed or failed.
+        """
+        with self._lock:
+            row = self._connection.execute("SELECT files FROM ingestion_jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return
+            files = json.loads(row[0])
+            for file in files:
+                if file["name"] == filename:
+                    file.update(status=status, chunks=chunks, error=error)
+                    break
+            else:
+                files.append({"name": filename, "status": status, "chunks": chunks, "error": error})
+            self._connection.execute(
+                "UPDATE ingestion_jobs SET files = ?, heartbeat_at = ? WHERE id = ?",
+                (json.dumps(files), time.time(), job_id)
+            )
+
+
+    def _finish_job(self, job_id, status, error):
+        """
+        Record the final status of a job.
+        """
+        try:
+            with self._lock:
+                self._connection.execute(
+                    "UPDATE ingestion_jobs SET status = ?, error = ?, finished_at = ? WHERE id = ? AND status = 'running'",
+                    (status, error, time.time(), job_id)
+                )
+        except sqlite3.Error as e:
+            self.logger.error(f"Error recording the status of ingestion job {job_id}: {e}")
+
+
+    def _heartbeat_loop(self):
+        """
+        Periodically refresh the heartbeat of the jobs running in this process, queue again the jobs whose
+        process stopped, and forget the finished jobs past their retention.
+        """
+        while not self._stop.wait(self.heartbeat_interval):
+            try:
+                self._heartbeat()
+            except sqlite3.Error as e:
+                self.logger.error(f"Error updating the ingestion jobs: {e}")
+
+
+    def _heartbeat(self):
+        """
+        Run one round of the heartbeat loop.
+        """
+        now = time.time()
+        with self._lock:
+            self._connection.executemany(
+                "UPDATE ingestion_jobs SET heartbeat_at = ? WHERE id = ?",
+                [(now, job_id) for job_id in self._running]
+            )
+            stale_jobs = self._connection.execute(
+                "SELECT id, attempts FROM ingestion_jobs WHERE status = 'running' AND heartbeat_at < ?",
+                (now - self.stale_after,)
+            ).fetchall()
+            for job_id, attempts in stale_jobs:
+                if attempts >= self.max_attempts:
+                    self._connection.execute(
+                        "UPDATE ingestion_jobs SET status = 'failed', error = ?, finished_at = ? WHERE id = ? AND status = 'running'",
+                        (f"The job was interrupted {attempts} times.", now, job_id)
+                    )
+                else:
+                    self._connection.execute(
+                        "UPDATE ingestion_jobs SET status = 'queued' WHERE id = ? AND status = 'running'", (job_id,)
+                    )
+            self._connection.execute(
+                "DELETE FROM ingestion_jobs WHERE status IN ('completed', 'failed') AND finished_at < ?",
+                (now - self.retention,)
+            )
+
+        for job_id, attempts in stale_jobs:
+            if attempts >= self.max_attempts:
+                self.logger.error(f"Ingestion job {job_id} was interrupted {attempts} times, giving up.")
+                self.remove_workspace(job_id)
+            else:
+                self.logger.warning(f"Ingestion job {job_id} was interrupted, queuing it again.")
+        if stale_jobs:
+            self._wake.set()
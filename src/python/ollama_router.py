@@ -0,0 +1,193 @@
+import time
+import asyncio
+import aiohttp
+
+class OllamaBackend:
+    """
+    The routing state of one Ollama server.
+    """
+
+    def __init__(self, url):
+        self.url = url.rstrip('/')
+        self.outstanding = 0
+        self.healthy = True
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+
+        self.total_requests = 0
+        self.total_failures = 0
+
+
+    def is_available(self, now):
+        """
+        Check whether the backend may receive requests: it passed its last health probe and its circuit is closed.
+        Once the circuit open time has elapsed, the backend is tried again.
+        """
+        return self.healthy and self.open_until <= now
+
+
+class OllamaRouter:
+    """
+    Routes the generations over several Ollama servers.
+    Each request goes to the available backend with the fewest outstanding streams. Backends failing
+    several requests in a row are ejected by a circuit breaker for a while, and backends failing their
+    periodic health probe are ejected until a probe succeeds again.
+    """
+
+    def __init__(self, logger=None, urls=None, failure_threshold=3, circuit_open_time=30,
+                 health_check_interval=10, health_check_timeout=2):
+        self.logger = logger
+        self.backends = [OllamaBackend(url) for url in urls or []]
+        self.failure_threshold = failure_threshold
+        self.circuit_open_time = circuit_open_time
+        self.health_check_interval = health_check_interval
+        self.health_check_timeout = health_check_timeout
+
+        self._health_check_task = None
+
+        if not self.backends:
+            raise ValueError("At least one Ollama backend must be configured.")
+        self.logger.info(f"Routing generations over {len(self.backends)} Ollama backends: {[backend.url for backend in self.backends]}")
+
+
+    def _select(self, exclude=()):
+        """
+        Select the least loaded available backend, excluding the given ones.
+        """
+        candidates = [backend for backend in self.backends if backend not in exclude]
+        if not candidates:
+            return None
+
+        now = time.monotonic()
+        available = [backend for backend in candidates if backend.is_available(now)]
+        if not available:
+            # Every remaining backend is ejected: trying one is better than failing the request outright
+            self.logger.warning("No healthy Ollama backend available, trying an ejected one.")
+            available = candidates
+
+        return min(available, key=lambda backend: (backend.outstanding, backend.total_requests))
+
+
+    def acquire(self, exclude=()):
+        """
+        Select the backend for a new stream and count the stream as outstanding on it.
+        Must be called from the event loop.
+
+        Args:
+            exclude (iterable): Backends already tried for this request.
+
+        Returns:
+            OllamaBackend: The least loaded available backend, or None if every backend was tried.
+        """
+        backend = self._select(exclude)
+        if backend is not None:
+            backend.outstanding += 1
+            backend.total_requests += 1
+        return backend
+
+
+    def peek(self):
+        """
+        Return the backend the next stream would be routed to, without counting a stream on it.
+
+        Returns:
+            OllamaBackend: The least loaded available backend.
+        """
+        return self._select()
+
+
+    def release(self, backend, failed=False):
+        """
+        Release a stream acquired on a backend and record its outcome for the circuit breaker.
+
+        Args:
+            backend (OllamaBackend): The backend returned by acquire.
+            failed (bool): Whether the backend failed to serve the stream.
+        """
+        backend.outstanding -= 1
+        if not failed:
+            backend.consecutive_failures = 0
+            return
+
+        backend.total_failures += 1
+        backend.consecutive_failures += 1
+        if backend.consecutive_failures >= self.failure_threshold:
+            backend.open_until = time.monotonic() + self.circuit_open_time
+            self.logger.warning(
+                f"Ollama backend {backend.url} failed {backend.consecutive_failures} times in a row, "
+                f"ejecting it for {self.circuit_open_time}s."
+            )
+
+
+    async def _probe(self, session, backend):
+        """
+        Check that a backend answers, updating its health.
+        """
+        try:
+            timeout = aiohttp.ClientTimeout(total=self.health_check_timeout)
+            async with session.get(f"{backend.url}/api/version", timeout=timeout) as response:
+                healthy = response.status == 200
+        except (asyncio.TimeoutError, aiohttp.ClientError):
+            healthy = False
+
+        if healthy and not backend.healthy:
+            self.logger.info(f"Ollama backend {backend.url} is healthy again.")
+            backend.consecutive_failures = 0
+            backend.open_until = 0.0
+        elif not healthy and backend.healthy:
+            self.logger.warning(f"Ollama backend {backend.url} failed its health check, ejecting it.")
+        backend.healthy = healthy
+
+
+    async def _run_health_checks(self, session):
+        """
+        Probe every backend periodically until cancelled.
+        """
+        while True:
+            await asyncio.gather(*(self._probe(session, backend) for backend in self.backends))
+            await asyncio.sleep(self.health_check_interval)
+
+
+    def start_health_checks(self, session):
+        """
+        Start probing the backends in the background.
+
+        Args:
+            session (aiohttp.ClientSession): The session used for the probes.
+        """
+        if self._health_check_task is None or self._health_check_task.done():
+            self._health_check_task = asyncio.create_task(self._run_health_checks(session))
+
+
+    async def stop_health_checks(self):
+        """
+        Stop probing the backends.
+        """
+        if self._health_check_task is not None:
+            self._health_check_task.cancel()
+            try:
+                await self._health_check_task
+            except asyncio.CancelledError:
+                pass
+            self._health_check_task = None
+
+
+    def get_stats(self):
+        """
+        Return the routing state of every backend.
+
+        Returns:
+            list: The URL, health, circuit state, outstanding streams and counters of each backend.
+        """
+        now = time.monotonic()
+        return [
+            {
+                "url": backend.url,
+                "healthy": backend.healthy,
+                "circuit_open": backend.open_until > now,
+                "outstanding": backend.outstanding,
+                "total_requests": backend.total_requests,
+                "total_failures": backend.total_failures,
+            }
+            for backend in self.backends
+        ]
@@ -10,4 +10,5 @@ class PromptRequest(BaseModel):
     num_ctx: int = 2048
     temperature: float = 0.8
     repeat_last_n: int = 64
-    repeat_penalty: float = 1.1
\ No newline at end of file
+    repeat_penalty: float = 1.1
+    session_id: Optional[str] = None
\ No newline at end of file
@@ -0,0 +1,102 @@
+import threading
+from contextlib import contextmanager
+
+class ReadWriteLock:
+    """
+    A reentrant lock held either by several readers at once or by a single writer.
+    Writers are preferred: new readers wait while a writer is waiting, so a steady flow of readers cannot
+    starve it. The writer may also take the read lock, but a reader cannot upgrade to the write lock.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition(threading.Lock())
+        self._readers = {}
+        self._writer = None
+        self._write_depth = 0
+        self._waiting_writers = 0
+
+
+    @contextmanager
+    def read(self):
+        """
+        Hold the lock as a reader for the duration of a with block.
+        """
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+
+
+    @contextmanager
+    def write(self):
+        """
+        Hold the lock as the writer for the duration of a with block.
+        """
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
+
+
+    def acquire_read(self):
+        """
+        Acquire the lock as a reader, waiting while a writer holds it or is waiting for it.
+        """
+        thread_id = threading.get_ident()
+        with self._condition:
+            # Reentrant reads and reads by the writer never wait, which would deadlock
+            if self._writer != thread_id and thread_id not in self._readers:
+                while self._writer is not None or self._waiting_writers:
+                    self._condition.wait()
+            self._readers[thread_id] = self._readers.get(thread_id, 0) + 1
+
+
+    def release_read(self):
+        """
+        Release the lock acquired as a reader.
+        """
+        thread_id = threading.get_ident()
+        with self._condition:
+            self._readers[thread_id] -= 1
+            if not self._readers[thread_id]:
+                del self._readers[thread_id]
+                if not self._readers:
+                    self._condition.notify_all()
+
+
+    def acquire_write(self):
+        """
+        Acquire the lock as the writer, waiting until no other thread holds it.
+
+        Raises:
+            RuntimeError: If the calling thread holds the lock as a reader only.
+        """
+        thread_id = threading.get_ident()
+        with self._condition:
+            if self._writer == thread_id:
+                self._write_depth += 1
+                return
+            if thread_id in self._readers:
+                raise RuntimeError("A read lock cannot be upgraded to a write lock.")
+
+            self._waiting_writers += 1
+            try:
+                while self._writer is not None or self._readers:
+                    self._condition.wait()
+            finally:
+                self._waiting_writers -= 1
+            self._writer = thread_id
+            self._write_depth = 1
+
+
+    def release_write(self):
+        """
+        Release the lock acquired as the writer.
+        """
+        with self._condition:
+            self._write_depth -= 1
+            if not self._write_depth:
+                self._writer = None
+                self._condition.notify_all()
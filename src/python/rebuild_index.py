@@ -0,0 +1,18 @@
+from config_loader import ConfigLoader
+from custom_logger import CustomLogger
+from database_manager import DatabaseManager
+
+# Rebuild the FAISS index with the index type and metric set in config.yaml, from the vectors stored in SQLite.
+# Stop the application before running this script: python rebuild_index.py
+if __name__ == "__main__":
+    logger = CustomLogger.get_logger(__name__)
+    config = ConfigLoader().load_config()
+
+    database_manager = DatabaseManager(
+        logger=logger,
+        sqlite_db_path=config['sqlite3']['path'],
+        faiss_db_path=config['faiss']['path'],
+        faiss_config=config['faiss']
+    )
+    database_manager.rebuild_faiss_index()
+    database_manager.close_connections()
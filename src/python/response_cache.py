@@ -0,0 +1,162 @@
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+class ResponseCache:
+    """
+    An exact-match cache of generated responses.
+    Entries are keyed on everything that affects the answer and store the streamed chunks so they can be
+    replayed. Entries expire after a TTL, are evicted in LRU order beyond the size limits, and are all
+    dropped when the document corpus changes.
+    """
+
+    def __init__(self, logger=None, max_entries=1000, max_bytes=32 * 1024 * 1024, ttl=3600,
+                 deterministic_only=True, corpus_version_provider=None):
+        self.logger = logger
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.deterministic_only = deterministic_only
+        self.corpus_version_provider = corpus_version_provider
+
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._corpus_version = None
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+
+    def is_cacheable(self, options):
+        """
+        Check whether a generation with the given sampling options may be served from the cache.
+
+        Args:
+            options (dict): The sampling options sent to the model.
+
+        Returns:
+            bool: True if the generation is deterministic or if non-deterministic generations are cached too.
+        """
+        return not self.deterministic_only or options.get('temperature') == 0
+
+
+    @staticmethod
+    def make_key(model, full_prompt, options):
+        """
+        Build the cache key of a generation.
+
+        Args:
+            model (str): The model used for the generation.
+            full_prompt (str): The complete prompt, including the master and system prompts and the retrieved context.
+            options (dict): The sampling options sent to the model.
+
+        Returns:
+            str: The cache key.
+        """
+        payload = json.dumps({"model": model, "prompt": full_prompt, "options": options}, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+    def _check_corpus_version(self):
+        """
+        Drop every entry if the document corpus changed since the entries were stored.
+        Must be called with the lock held.
+        """
+        if self.corpus_version_provider is None:
+            return
+        corpus_version = self.corpus_version_provider()
+        if corpus_version != self._corpus_version:
+            if self._entries:
+                self.logger.info("Document corpus changed, clearing the response cache.")
+            self._entries.clear()
+            self._bytes = 0
+            self._corpus_version = corpus_version
+
+
+    def get(self, key):
+        """
+        Look up a cached response.
+
+        Args:
+            key (str): The cache key of the generation.
+
+        Returns:
+            list: The chunks of the cached response, or None if the response is not cached.
+        """
+        with self._lock:
+            self._check_corpus_version()
+            entry = self._entries.get(key)
+            if entry is not None and entry["expires_at"] < time.monotonic():
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry["chunks"]
+
+
+    def put(self, key, chunks):
+        """
+        Store a complete response.
+
+        Args:
+            key (str): The cache key of the generation.
+            chunks (list): The chunks of the response, in streaming order.
+        """
+        size = sum(len(chunk.encode('utf-8')) for chunk in chunks)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            self._check_corpus_version()
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = {
+                "chunks": list(chunks),
+                "size": size,
+                "expires_at": time.monotonic() + self.ttl,
+            }
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+
+    def _remove(self, key):
+        """
+        Remove an entry. Must be called with the lock held.
+        """
+        entry = self._entries.pop(key)
+        self._bytes -= entry["size"]
+
+
+    def clear(self):
+        """
+        Remove every entry from the cache.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+        self.logger.info("Response cache cleared.")
+
+
+    def get_stats(self):
+        """
+        Return the hit and miss counters of the cache.
+
+        Returns:
+            dict: The counters, the hit rate and the size of the cache.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+            }
@@ -1,5 +1,8 @@
-import os
 import json
+import time
+import uuid
+import hashlib
+import asyncio
 import aiohttp
 
 class ResponseGenerator:
@@ -8,18 +11,172 @@ class ResponseGenerator:
     It can also augment the prompt with retrieved documents to provide additional context.
     """
 
-    def __init__(self, logger=None, model=None, master_prompt=None, system_prompt=None, document_retriever=None):
+    def __init__(self, logger=None, model=None, master_prompt=None, system_prompt=None, document_retriever=None, retrieval_executor=None,
+                 response_cache=None, semantic_cache=None, ollama_router=None, pool_size=32, keepalive_timeout=60, connect_timeout=5, first_byte_timeout=120, read_timeout=60,
+                 token_counter=None, num_ctx_buckets=None, response_reserve_tokens=512, chat_session_store=None, keep_alive="30m",
+                 preload_during_retrieval=True, shared_settings=None):
         # Initialize custom logger
         self.logger = logger
 
+        # Initialize the Ollama connection settings
+        self.ollama_router = ollama_router
+        self.pool_size = pool_size
+        self.keepalive_timeout = keepalive_timeout
+        self.connect_timeout = connect_timeout
+        self.first_byte_timeout = first_byte_timeout
+        self.read_timeout = read_timeout
+        self.keep_alive = keep_alive
+        self.preload_during_retrieval = preload_during_retrieval
+        self.session = None
+
+        # Background preload requests, referenced until they complete
+        self._preload_tasks = set()
+
         # Initialize global variables
         self.model = model
         self.master_prompt = master_prompt
-        self.system_prompt = system_prompt
+        self.shared_settings = shared_settings
+        self._system_prompt = system_prompt
         self.document_retriever = document_retriever
-        self.stop_generation = False
+        self.retrieval_executor = retrieval_executor
+        self.response_cache = response_cache
+        self.semantic_cache = semantic_cache
+        self.chat_session_store = chat_session_store
+
+        # Initialize the context window sizing
+        self.token_counter = token_counter
+        self.num_ctx_buckets = sorted(num_ctx_buckets or [])
+        self.response_reserve_tokens = response_reserve_tokens
+
+        # Stop events of the generations in progress, keyed by generation ID
+        self.active_generations = {}
 
     
+    async def start_session(self):
+        """
+        Create the shared aiohttp session used for every call to Ollama.
+        Connections are pooled and kept alive between generations.
+        """
+        if self.session is not None and not self.session.closed:
+            return
+        connector = aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=self.keepalive_timeout)
+        # Read timeouts are applied per line, see _generate_response_internal
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=self.connect_timeout)
+        self.session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+        self.ollama_router.start_health_checks(self.session)
+        self.logger.info(f"Ollama client session created with a pool of {self.pool_size} connections.")
+
+
+    async def close_session(self):
+        """
+        Close the shared aiohttp session and its pooled connections.
+        """
+        await self.ollama_router.stop_health_checks()
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+            self.logger.info("Ollama client session closed.")
+        self.session = None
+
+
+    async def _preload_model(self, backend_url):
+        """
+        Ask an Ollama backend to load the model without generating anything, and keep it loaded for keep_alive.
+        Returns immediately when the model is already loaded.
+
+        Args:
+            backend_url (str): The URL of the backend.
+
+        Returns:
+            bool: True if the model is loaded on the backend.
+        """
+        payload = {"model": self.model, "keep_alive": self.keep_alive}
+        try:
+            timeout = aiohttp.ClientTimeout(total=self.first_byte_timeout)
+            async with self.session.post(f"{backend_url}/api/generate", json=payload, timeout=timeout) as response:
+                await response.read()
+                return response.status == 200
+        except (asyncio.TimeoutError, aiohttp.ClientError) as e:
+            self.logger.warning(f"Failed to preload model {self.model} on {backend_url}: {e!r}")
+            return False
+
+
+    async def warm_up(self):
+        """
+        Preload the model on every Ollama backend, so the first requests do not pay the model loading time.
+        """
+        await self.start_session()
+        start_time = time.perf_counter()
+        results = await asyncio.gather(*(self._preload_model(backend.url) for backend in self.ollama_router.backends))
+        self.logger.info(
+            f"Model {self.model} preloaded on {sum(results)}/{len(results)} Ollama backends "
+            f"in {time.perf_counter() - start_time:.2f}s."
+        )
+
+
+    def _start_preload(self):
+        """
+        Send a preload request to the backend the next generation will most likely be routed to, without waiting
+        for it, so that loading the model overlaps with the document retrieval.
+        """
+        backend = self.ollama_router.peek()
+        task = asyncio.create_task(self._preload_model(backend.url))
+        self._preload_tasks.add(task)
+        task.add_done_callback(self._preload_tasks.discard)
+
+
+    def start_generation(self):
+        """
+        Register a new generation so that it can be stopped individually.
+
+        Returns:
+            str: The ID of the generation.
+        """
+        generation_id = uuid.uuid4().hex
+        self.active_generations[generation_id] = asyncio.Event()
+        return generation_id
+
+
+    def stop_generation(self, generation_id):
+        """
+        Request a generation in progress to stop. Its upstream Ollama stream is closed on the next token.
+
+        Args:
+            generation_id (str): The ID of the generation to stop.
+
+        Returns:
+            bool: True if the generation was in progress, False otherwise.
+        """
+        stop_event = self.active_generations.get(generation_id)
+        if stop_event is None:
+            return False
+        stop_event.set()
+        self.logger.info(f"Stop requested for generation {generation_id}.")
+        return True
+
+
+    def get_stop_event(self, generation_id):
+        """
+        Return the event set when a stop is requested for a generation.
+
+        Args:
+            generation_id (str): The ID of the generation.
+
+        Returns:
+            asyncio.Event: The stop event, or None if the generation is not registered.
+        """
+        return self.active_generations.get(generation_id)
+
+
+    def end_generation(self, generation_id):
+        """
+        Unregister a generation once its response is complete.
+
+        Args:
+            generation_id (str): The ID of the generation.
+        """
+        self.active_generations.pop(generation_id, None)
+
+
     def set_model(self, model):
         """
         Set the model globally.
@@ -42,71 +199,477 @@ class ResponseGenerator:
         self.logger.debug(f"Master prompt set to: {self.master_prompt}")
 
     
+    @property
+    def system_prompt(self):
+        """
+        The system prompt text, read from the shared settings when they are configured so that every worker uses the same one.
+        """
+        if self.shared_settings is not None:
+            return self.shared_settings.get("system_prompt")
+        return self._system_prompt
+
+
     def set_system_prompt(self, system_prompt):
         """
-        Set the system prompt text globally.
+        Set the system prompt text globally, for every worker when shared settings are configured.
 
         Args:
             system_prompt (str): The system prompt text to set.
         """
-        self.system_prompt = system_prompt
-        self.logger.debug(f"System prompt set to: {self.system_prompt}")
+        if self.shared_settings is not None:
+            self.shared_settings.set("system_prompt", system_prompt)
+        else:
+            self._system_prompt = system_prompt
+        self.logger.debug(f"System prompt set to: {system_prompt}")
 
     
-    async def _generate_response_internal(self, full_prompt, num_ctx, temperature, repeat_last_n, repeat_penalty):
+    def set_document_retriever(self, document_retriever):
+        """
+        Set the document retriever used for retrieval-augmented generation, once it is initialized.
+
+        Args:
+            document_retriever (DocumentRetriever): The document retriever.
+        """
+        self.document_retriever = document_retriever
+
+
+    def set_response_cache(self, response_cache):
+        """
+        Set the exact-match response cache, once it is initialized.
+
+        Args:
+            response_cache (ResponseCache): The response cache.
         """
-        Internal method to generate a response from a fully constructed prompt.
+        self.response_cache = response_cache
+
+
+    def set_semantic_cache(self, semantic_cache):
+        """
+        Set the semantic answer cache, once it is initialized.
+
+        Args:
+            semantic_cache (SemanticCache): The semantic cache.
+        """
+        self.semantic_cache = semantic_cache
+
+
+    async def _generate_response_internal(self, path, payload, generation_id=None, on_complete=None, cache_key=None):
+        """
+        Internal method to generate a response from a fully constructed request.
         Sends a request to an external API for text generation using a specified model and streams the response back.
 
         Args:
-            full_prompt (str): The complete prompt ready to be sent to the model.
-            num_ctx (int): Sets the size of the context window used to generate the next token.
-            temperature (float): Adjusts the creativity of the model's responses. Higher values lead to more creative outputs.
-            repeat_last_n (int): Sets how far back the model looks to prevent repetition.
-            repeat_penalty (float): Controls the penalty for repetitions. A higher value penalizes repetitions more strongly.
+            path (str): The API path, for a single prompt or a chat turn.
+            payload (dict): The request built by _build_request.
+            generation_id (str, optional): The ID used to stop the generation.
+            on_complete (callable, optional): Called with the full response once the model reports it is done.
+            cache_key (str, optional): The key under which the complete response is stored in the response cache.
 
         Yields:
             str: Chunks of the generated response.
         """
-        url = f"http://{os.getenv('OLLAMA_HOST')}:11434/api/generate"
+        self.logger.info(f"Generating response")
+
+        stop_event = self.active_generations.get(generation_id)
+        generated_chunks = []
+
+        await self.start_session()
+        try:
+            backend, response, line = await self._open_stream(path, payload)
+        except (asyncio.TimeoutError, aiohttp.ClientError) as e:
+            self.logger.error(f"No Ollama backend answered: {e!r}")
+            yield "An error occurred regarding the Ollama container."
+            return
+
+        completed = False
+        failed = False
+        try:
+            while line:
+                if stop_event is not None and stop_event.is_set():
+                    self.logger.info(f"Generation {generation_id} stopped.")
+                    break
+                try:
+                    data = json.loads(line.decode('utf-8'))
+                    if data.get('done', False):
+                        completed = True
+                        break
+                    if "messages" not in payload:
+                        generated_chunks.append(data.get('response', ''))
+                    else:
+                        generated_chunks.append(data.get('message', {}).get('content', ''))
+                    yield generated_chunks[-1]
+                except json.JSONDecodeError as e:
+                    self.logger.error(f"JSONDecodeError: {e}")
+                    cache_key = None
+                    yield "Error decoding JSON"
+                line = await asyncio.wait_for(response.content.readline(), timeout=self.read_timeout)
+        except asyncio.TimeoutError:
+            failed = True
+            self.logger.error(f"Timed out waiting for the Ollama response from {backend.url}.")
+            yield "An error occurred regarding the Ollama container."
+        except aiohttp.ClientError as e:
+            failed = True
+            self.logger.error(f"ClientError from {backend.url}: {e}")
+            yield "An error occurred regarding the Ollama container."
+        finally:
+            # Drop the connection when the stream is stopped, cancelled or abandoned, so Ollama stops decoding
+            if completed:
+                response.release()
+            else:
+                response.close()
+            self.ollama_router.release(backend, failed=failed)
+
+        # Only complete responses are cached
+        if completed and cache_key is not None:
+            self.response_cache.put(cache_key, generated_chunks)
+        if completed and on_complete is not None:
+            on_complete(''.join(generated_chunks))
+
+
+    async def _open_stream(self, path, payload):
+        """
+        Send a generation request to the least loaded Ollama backend and wait for the first line of its stream.
+        Backends failing to answer before the first byte are skipped and the request fails over to the next one.
+
+        Args:
+            path (str): The API path of the request.
+            payload (dict): The JSON body of the request.
+
+        Returns:
+            tuple: The backend serving the stream, the response and the first line of the stream.
+
+        Raises:
+            asyncio.TimeoutError: If the last backend tried did not send the first byte in time.
+            aiohttp.ClientError: If the last backend tried failed, or no backend is left to try.
+        """
+        tried = []
+        last_error = aiohttp.ClientError("No Ollama backend available.")
+        while True:
+            backend = self.ollama_router.acquire(exclude=tried)
+            if backend is None:
+                raise last_error
+            tried.append(backend)
+
+            response = None
+
+            async def send():
+                nonlocal response
+                response = await self.session.post(f"{backend.url}{path}", json=payload)
+                if response.status >= 500:
+                    raise aiohttp.ClientResponseError(
+                        response.request_info, response.history, status=response.status, message=response.reason
+                    )
+                return await response.content.readline()
+
+            try:
+                # Wait longer for the first line, as Ollama may need to load the model first
+                line = await asyncio.wait_for(send(), timeout=self.first_byte_timeout)
+                return backend, response, line
+            except (asyncio.TimeoutError, aiohttp.ClientError) as e:
+                last_error = e
+                if response is not None:
+                    response.close()
+                self.ollama_router.release(backend, failed=True)
+                self.logger.warning(f"Ollama backend {backend.url} did not answer: {e!r}.")
+            except BaseException:
+                if response is not None:
+                    response.close()
+                self.ollama_router.release(backend)
+                raise
+
+
+    def _semantic_partition(self, num_ctx, temperature, repeat_last_n, repeat_penalty, top_n=None):
+        """
+        Build the key of the settings an answer depends on, so the semantic cache only
+        reuses answers produced with the same model, prompts, retrieval and sampling options.
+
+        Returns:
+            str: The partition key.
+        """
+        settings = json.dumps([
+            self.model, self.master_prompt, self.system_prompt, top_n,
+            num_ctx, temperature, repeat_last_n, repeat_penalty
+        ])
+        return hashlib.sha256(settings.encode('utf-8')).hexdigest()
+
+
+    async def _lookup_semantic_cache(self, prompt, partition):
+        """
+        Look up the answer of a similar prompt in the semantic cache without blocking the event loop.
+        The corpus version is read before the lookup, so that it is the one the answer is built from.
+
+        Returns:
+            tuple: The cached answer, or None on a miss or if the cache is disabled, and the corpus version.
+        """
+        if self.semantic_cache is None:
+            return None, None
+
+        def lookup():
+            corpus_version = self.semantic_cache.get_corpus_version()
+            return self.semantic_cache.lookup(prompt, partition), corpus_version
+
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self.retrieval_executor, lookup)
+        except Exception as e:
+            self.logger.error(f"Error looking up the semantic cache: {e}")
+            return None, None
+
+
+    def _store_in_semantic_cache(self, prompt, partition, corpus_version):
+        """
+        Build a callback storing a complete answer in the semantic cache in the background.
+        The answer is dropped if the corpus changed since the given version, read when the request started.
+
+        Returns:
+            callable: The callback, or None if the cache is disabled.
+        """
+        if self.semantic_cache is None:
+            return None
+
+        def log_error(future):
+            if future.exception() is not None:
+                self.logger.error(f"Error storing in the semantic cache: {future.exception()}")
+
+        def store(answer):
+            future = asyncio.get_running_loop().run_in_executor(
+                self.retrieval_executor, self.semantic_cache.store, prompt, partition, answer, corpus_version
+            )
+            future.add_done_callback(log_error)
+        return store
+
+
+    def _build_system_prefix(self):
+        """
+        Build the static beginning of every prompt, made of the master prompt and the system instructions.
+        It stays byte-identical across requests and turns, so Ollama can reuse its prompt cache.
+
+        Returns:
+            str: The system prefix.
+        """
+        return f"""
+{self.master_prompt}
+
+System Instructions:
+{self.system_prompt or 'No specific system instructions provided.'}
+"""
+
+
+    def _build_user_message(self, prompt, documents=None):
+        """
+        Build the variable part of a prompt, with the context documents before the user question.
+
+        Args:
+            prompt (str): The input prompt.
+            documents (list, optional): The texts of the documents to include as context.
+
+        Returns:
+            str: The user message.
+        """
+        context = "\n".join(documents) if documents else "No relevant documents provided."
+        return f"""
+Context Documents:
+{context}
+
+User Question:
+{prompt}
+"""
+
+
+    def _select_num_ctx(self, prompt_tokens, max_num_ctx):
+        """
+        Select the smallest context window bucket holding the prompt and the response.
+
+        Args:
+            prompt_tokens (int): The number of tokens of the full prompt.
+            max_num_ctx (int): The context window requested by the client, used as the upper bound.
+
+        Returns:
+            int: The context window size to request from the model.
+        """
+        required = prompt_tokens + self.response_reserve_tokens
+        for bucket in self.num_ctx_buckets:
+            if required <= bucket <= max_num_ctx:
+                return bucket
+        return max_num_ctx
+
+
+    def _pack_context(self, prompt, documents, num_ctx, history_tokens=0):
+        """
+        Greedily fill the token budget with the retrieved documents, in order of relevance, and size the
+        context window to the packed prompt. Documents that do not fit in the remaining budget are dropped.
+
+        Args:
+            prompt (str): The input prompt.
+            documents (list): The texts of the retrieved documents, the most relevant first.
+            num_ctx (int): The context window requested by the client, used as the upper bound.
+            history_tokens (int): The number of tokens of the conversation history sent with the prompt.
+
+        Returns:
+            tuple: The user message and the context window size to request from the model.
+        """
+        if self.token_counter is None:
+            return self._build_user_message(prompt, documents), num_ctx
+
+        base_tokens = history_tokens + sum(self.token_counter.count_many(
+            [self._build_system_prefix(), self._build_user_message(prompt)]
+        ))
+        budget = num_ctx - self.response_reserve_tokens - base_tokens
+
+        packed_documents = []
+        used_tokens = 0
+        dropped_tokens = 0
+        for document, tokens in zip(documents, self.token_counter.count_many(documents)):
+            # Each document is followed by a line break in the prompt
+            tokens += 1
+            if used_tokens + tokens <= budget:
+                packed_documents.append(document)
+                used_tokens += tokens
+            else:
+                dropped_tokens += tokens
+
+        selected_num_ctx = self._select_num_ctx(base_tokens + used_tokens, num_ctx)
+        if documents:
+            dropped_count = len(documents) - len(packed_documents)
+            self.logger.info(
+                f"Context packing used {used_tokens} tokens for {len(packed_documents)} documents and dropped "
+                f"{dropped_tokens} tokens from {dropped_count} documents."
+            )
+            if not packed_documents:
+                self.logger.warning("No retrieved document fits in the context window, continuing with just the prompt.")
+        self.logger.info(f"Prompt uses {base_tokens + used_tokens} tokens, using num_ctx {selected_num_ctx} (requested {num_ctx}).")
+
+        return self._build_user_message(prompt, packed_documents), selected_num_ctx
+
+
+    def _get_session_history(self, session_id):
+        """
+        Return the conversation history of a chat session, capped by the history token budget.
+
+        Returns:
+            tuple: The history messages and their number of tokens.
+        """
+        if session_id is None or self.chat_session_store is None:
+            return [], 0
+        return self.chat_session_store.get_history(session_id)
+
+
+    def _build_request(self, user_message, num_ctx, temperature, repeat_last_n, repeat_penalty, session_id=None, history=None):
+        """
+        Build the request answering a user message, as a single prompt or as the next turn of a chat session.
+        Chat turns are sent to the chat endpoint with the history, so Ollama reuses the prefix of the previous turns.
+
+        Args:
+            user_message (str): The user message, with its context documents.
+            num_ctx (int): Sets the size of the context window used to generate the next token.
+            temperature (float): Adjusts the creativity of the model's responses.
+            repeat_last_n (int): Sets how far back the model looks to prevent repetition.
+            repeat_penalty (float): Controls the penalty for repetitions.
+            session_id (str, optional): The chat session the turn belongs to.
+            history (list, optional): The history messages of the chat session.
+
+        Returns:
+            tuple: The API path, the payload, and the key of the response in the response cache, or None if the
+                response is not cacheable.
+        """
         payload = {
             "model": self.model,
-            "prompt": full_prompt,
             "options": {
                 "num_ctx": num_ctx,
                 "temperature": temperature,
                 "repeat_last_n": repeat_last_n,
                 "repeat_penalty": repeat_penalty
-            }
+            },
+            "keep_alive": self.keep_alive
         }
+        if session_id is None or self.chat_session_store is None:
+            path = "/api/generate"
+            full_prompt = payload["prompt"] = self._build_system_prefix() + user_message
+        else:
+            messages = [{"role": "system", "content": self._build_system_prefix()}]
+            messages.extend(history or [])
+            messages.append({"role": "user", "content": user_message})
+            path = "/api/chat"
+            payload["messages"] = messages
+            full_prompt = json.dumps(messages)
 
-        self.logger.info(f"Generating response")
+        cache_key = None
+        if self.response_cache is not None and self.response_cache.is_cacheable(payload["options"]):
+            cache_key = self.response_cache.make_key(self.model, full_prompt, payload["options"])
+        return path, payload, cache_key
 
-        async with aiohttp.ClientSession() as session:
-            try:
-                async with session.post(url, json=payload) as response:
-                    async for line in response.content:
-                        if self.stop_generation:
-                            self.stop_generation = False
-                            break
-                        if line:
-                            try:
-                                data = json.loads(line.decode('utf-8'))
-                                if data.get('done', False):
-                                    break
-                                yield data.get('response', '')
-                            except json.JSONDecodeError as e:
-                                self.logger.error(f"JSONDecodeError: {e}")
-                                yield "Error decoding JSON"
-            except aiohttp.ClientError as e:
-                self.logger.error(f"ClientError: {e}")
-                yield "An error occurred regarding the Ollama container."
 
-    
-    async def generate_response(self, prompt, num_ctx, temperature, repeat_last_n, repeat_penalty):
+    async def _prepare_request(self, prepared):
         """
-        Generate a response asynchronously based on a given prompt without document retrieval.
-        Constructs a full prompt and delegates to the internal generation method.
+        Build the request of a prepared response, retrieving the documents first if it was prepared with top_n.
+        The request, its cache key and the callback recording the turn of a chat session are set on prepared.
+
+        Args:
+            prepared (dict): The prepared response returned by prepare_response.
+        """
+        prompt, top_n, num_ctx, session_id = prepared["prompt"], prepared["top_n"], prepared["num_ctx"], prepared["session_id"]
+        history, history_tokens = self._get_session_history(session_id)
+        loop = asyncio.get_running_loop()
+
+        if top_n is None:
+            # Packing counts tokens with the tokenizer, so it runs on the retrieval executor like with documents
+            user_message, num_ctx = await loop.run_in_executor(
+                self.retrieval_executor,
+                self._pack_context,
+                prompt,
+                [],
+                num_ctx,
+                history_tokens
+            )
+            history_message = user_message
+        else:
+            # Let Ollama load the model while the documents are retrieved
+            if self.preload_during_retrieval:
+                await self.start_session()
+                self._start_preload()
+
+            self.logger.info(f"Retrieving documents")
+
+            # Retrieve documents based on the input prompt without blocking the event loop
+            documents = await loop.run_in_executor(
+                self.retrieval_executor,
+                self.document_retriever.retrieve_documents,
+                prompt,
+                top_n
+            )
+
+            if not documents:
+                self.logger.warning("No relevant documents found, continuing with just the prompt.")
+                documents = ["No relevant documents found."]
+
+            # Fit the retrieved documents in the token budget and size the context window to the packed prompt
+            user_message, num_ctx = await loop.run_in_executor(
+                self.retrieval_executor,
+                self._pack_context,
+                prompt,
+                documents,
+                num_ctx,
+                history_tokens
+            )
+            # The retrieved documents are only sent with this turn, the history keeps the bare question
+            history_message = self._build_user_message(prompt)
+
+        prepared["path"], prepared["payload"], prepared["cache_key"] = self._build_request(
+            user_message, num_ctx, prepared["temperature"], prepared["repeat_last_n"], prepared["repeat_penalty"],
+            session_id, history
+        )
+        if session_id is not None and self.chat_session_store is not None:
+            prepared["on_complete"] = lambda answer: self.chat_session_store.append_turn(session_id, history_message, answer)
+
+
+    async def prepare_response(self, prompt, num_ctx, temperature, repeat_last_n, repeat_penalty, top_n=None, session_id=None):
+        """
+        Prepare the response to a prompt before a generation slot is reserved for it, by looking up the semantic cache
+        and the response cache. A cached answer is then replayed without a slot, so it neither waits behind the
+        running generations nor gets rejected when the queue is full.
+
+        The response cache is keyed on the full prompt, so a response it may serve is built here, with its documents
+        retrieved. The other responses are built once they have a slot, so rejected requests do not retrieve documents.
 
         Args:
             prompt (str): The input prompt to generate a response for.
@@ -114,28 +677,104 @@ class ResponseGenerator:
             temperature (float): Adjusts the creativity of the model's responses. Higher values lead to more creative outputs.
             repeat_last_n (int): Sets how far back the model looks to prevent repetition.
             repeat_penalty (float): Controls the penalty for repetitions. A higher value penalizes repetitions more strongly.
+            top_n (int, optional): The number of documents to retrieve for providing context, or None to answer
+                without document retrieval.
+            session_id (str, optional): The chat session to continue. The answer depends on its history, so it is
+                not looked up in the semantic cache.
+
+        Returns:
+            dict: The prepared response, to pass to generate_prepared_response. Its "cached_chunks" are the chunks
+                of the cached answer, or None if the answer must be generated.
+        """
+        prepared = {
+            "prompt": prompt,
+            "top_n": top_n,
+            "num_ctx": num_ctx,
+            "temperature": temperature,
+            "repeat_last_n": repeat_last_n,
+            "repeat_penalty": repeat_penalty,
+            "session_id": session_id,
+            "cached_chunks": None,
+            "on_complete": None,
+            "path": None,
+            "payload": None,
+            "cache_key": None,
+        }
+        if session_id is None:
+            partition = self._semantic_partition(num_ctx, temperature, repeat_last_n, repeat_penalty, top_n=top_n)
+            cached_answer, corpus_version = await self._lookup_semantic_cache(prompt, partition)
+            if cached_answer is not None:
+                self.logger.info("Found the answer of a similar prompt in the semantic cache.")
+                prepared["cached_chunks"] = [cached_answer]
+                return prepared
+            prepared["on_complete"] = self._store_in_semantic_cache(prompt, partition, corpus_version)
+
+        if self.response_cache is not None and self.response_cache.is_cacheable({"temperature": temperature}):
+            await self._prepare_request(prepared)
+            if prepared["cache_key"] is not None:
+                prepared["cached_chunks"] = self.response_cache.get(prepared["cache_key"])
+                if prepared["cached_chunks"] is not None:
+                    self.logger.info("Found the response in the response cache.")
+        return prepared
+
+
+    async def generate_prepared_response(self, prepared, generation_id=None):
+        """
+        Generate a prepared response, retrieving documents to provide additional context if it was prepared with
+        top_n, or replay it if it was found in a cache.
+
+        Args:
+            prepared (dict): The prepared response returned by prepare_response.
+            generation_id (str, optional): The ID used to stop the generation.
 
         Yields:
             str: Chunks of the generated response.
         """
-        full_prompt = f"""
-{self.master_prompt}
+        on_complete = prepared["on_complete"]
+        cached_chunks = prepared["cached_chunks"]
+        if cached_chunks is not None:
+            self.logger.info("Replaying response from the cache.")
+            stop_event = self.active_generations.get(generation_id)
+            for chunk in cached_chunks:
+                if stop_event is not None and stop_event.is_set():
+                    break
+                yield chunk
+            # A semantic cache hit has no callback, so it is not stored again
+            if on_complete is not None:
+                on_complete(''.join(cached_chunks))
+            return
 
-System Instructions:
-{self.system_prompt or 'No specific system instructions provided.'}
+        if prepared["payload"] is None:
+            await self._prepare_request(prepared)
+            on_complete = prepared["on_complete"]
+        async for chunk in self._generate_response_internal(prepared["path"], prepared["payload"], generation_id,
+                                                            on_complete, prepared["cache_key"]):
+            yield chunk
 
-User Question:
-{prompt}
 
-Context Documents:
-No relevant documents provided.
-"""
+    async def generate_response(self, prompt, num_ctx, temperature, repeat_last_n, repeat_penalty, generation_id=None, session_id=None):
+        """
+        Generate a response asynchronously based on a given prompt without document retrieval.
+        Constructs a full prompt and delegates to the internal generation method.
+
+        Args:
+            prompt (str): The input prompt to generate a response for.
+            num_ctx (int): Sets the size of the context window used to generate the next token.
+            temperature (float): Adjusts the creativity of the model's responses. Higher values lead to more creative outputs.
+            repeat_last_n (int): Sets how far back the model looks to prevent repetition.
+            repeat_penalty (float): Controls the penalty for repetitions. A higher value penalizes repetitions more strongly.
+            generation_id (str, optional): The ID used to stop the generation.
+            session_id (str, optional): The chat session to continue. The answer depends on its history.
 
-        async for chunk in self._generate_response_internal(full_prompt, num_ctx, temperature, repeat_last_n, repeat_penalty):
+        Yields:
+            str: Chunks of the generated response.
+        """
+        prepared = await self.prepare_response(prompt, num_ctx, temperature, repeat_last_n, repeat_penalty, session_id=session_id)
+        async for chunk in self.generate_prepared_response(prepared, generation_id):
             yield chunk
 
     
-    async def generate_response_with_retriever(self, prompt, top_n, num_ctx, temperature, repeat_last_n, repeat_penalty):
+    async def generate_response_with_retriever(self, prompt, top_n, num_ctx, temperature, repeat_last_n, repeat_penalty, generation_id=None, session_id=None):
         """
         Generate a response using retrieved documents to provide additional context.
         Retrieves a specified number of relevant documents based on the input prompt,
@@ -148,32 +787,12 @@ No relevant documents provided.
             temperature (float): Adjusts the creativity of the model's responses. Higher values lead to more creative outputs.
             repeat_last_n (int): Sets how far back the model looks to prevent repetition.
             repeat_penalty (float): Controls the penalty for repetitions. A higher value penalizes repetitions more strongly.
+            generation_id (str, optional): The ID used to stop the generation.
+            session_id (str, optional): The chat session to continue. The answer depends on its history.
 
         Yields:
             str: Chunks of the generated response.
         """
-        self.logger.info(f"Retrieving documents")
-
-        # Retrieve documents based on the input prompt
-        documents = self.document_retriever.retrieve_documents(prompt, top_n)
-
-        if not documents:
-            self.logger.warning("No relevant documents found, continuing with just the prompt.")
-            documents = ["No relevant documents found."]
-
-        # Augment the prompt with retrieved documents
-        full_prompt = f"""
-{self.master_prompt}
-
-System Instructions:
-{self.system_prompt or 'No specific system instructions provided.'}
-
-Context Documents:
-{'\n'.join(documents) if documents else 'No relevant documents provided.'}
-
-User Question:
-{prompt}
-"""
-
-        async for chunk in self._generate_response_internal(full_prompt, num_ctx, temperature, repeat_last_n, repeat_penalty):
+        prepared = await self.prepare_response(prompt, num_ctx, temperature, repeat_last_n, repeat_penalty, top_n=top_n, session_id=session_id)
+        async for chunk in self.generate_prepared_response(prepared, generation_id):
             yield chunk
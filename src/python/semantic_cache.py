@@ -0,0 +1,162 @@
+import time
+import faiss
+import threading
+import numpy as np
+from collections import OrderedDict
+
+class SemanticCache:
+    """
+    A cache of answers to previously answered prompts, matched by meaning rather than exact text.
+    Prompts are embedded with the TextVectorizer and searched in a small dedicated FAISS inner-product index
+    of normalized vectors, so the search scores are cosine similarities.
+    """
+
+    def __init__(self, logger=None, text_vectorizer=None, dimension=384, similarity_threshold=0.92,
+                 max_entries=1000, ttl=86400, corpus_version_provider=None):
+        self.logger = logger
+        self.text_vectorizer = text_vectorizer
+        self.dimension = dimension
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.corpus_version_provider = corpus_version_provider
+
+        self.index = faiss.IndexIDMap(faiss.IndexFlatIP(dimension))
+        self._entries = OrderedDict()
+        self._next_id = 0
+        self._corpus_version = None
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+
+    def _vectorize(self, prompt):
+        """
+        Embed a prompt as a normalized float32 row vector.
+        """
+        vector = np.array([self.text_vectorizer.vectorize_text(prompt)], dtype=np.float32)
+        faiss.normalize_L2(vector)
+        return vector
+
+
+    def _check_corpus_version(self):
+        """
+        Drop every entry if the document corpus changed since the entries were stored.
+        Must be called with the lock held.
+        """
+        if self.corpus_version_provider is None:
+            return
+        corpus_version = self.corpus_version_provider()
+        if corpus_version != self._corpus_version:
+            if self._entries:
+                self.logger.info("Document corpus changed, clearing the semantic cache.")
+            self.index.reset()
+            self._entries.clear()
+            self._corpus_version = corpus_version
+
+
+    def get_corpus_version(self):
+        """
+        Return the current version of the document corpus. Callers capture it when a request starts and pass it
+        to store, so that an answer built from an older corpus is not stored.
+
+        Returns:
+            int: The corpus version, or None if the cache does not track it.
+        """
+        if self.corpus_version_provider is None:
+            return None
+        return self.corpus_version_provider()
+
+
+    def _remove(self, entry_id):
+        """
+        Remove an entry from the index and the entries. Must be called with the lock held.
+        """
+        self._entries.pop(entry_id, None)
+        self.index.remove_ids(np.array([entry_id], dtype=np.int64))
+
+
+    def lookup(self, prompt, partition):
+        """
+        Find the cached answer of a prompt similar enough to the given one.
+
+        Args:
+            prompt (str): The incoming prompt.
+            partition (str): A key of the settings affecting the answer (model, prompts, options...).
+                Only answers produced with the same settings are returned.
+
+        Returns:
+            str: The cached answer, or None if no similar prompt was answered.
+        """
+        vector = self._vectorize(prompt)
+
+        with self._lock:
+            self._check_corpus_version()
+            if self.index.ntotal:
+                similarities, ids = self.index.search(vector, min(8, self.index.ntotal))
+                now = time.monotonic()
+                for similarity, entry_id in zip(similarities[0], ids[0]):
+                    if entry_id == -1 or similarity < self.similarity_threshold:
+                        break
+                    entry = self._entries.get(int(entry_id))
+                    if entry is None or entry["partition"] != partition:
+                        continue
+                    if entry["expires_at"] < now:
+                        self._remove(int(entry_id))
+                        continue
+                    self._entries.move_to_end(int(entry_id))
+                    self.hits += 1
+                    self.logger.info(f"Semantic cache hit with similarity {similarity:.3f} to prompt: {entry['prompt']}")
+                    return entry["answer"]
+
+            self.misses += 1
+            return None
+
+
+    def store(self, prompt, partition, answer, corpus_version=None):
+        """
+        Store the answer of a prompt, evicting the least recently used entries beyond the size limit.
+
+        Args:
+            prompt (str): The answered prompt.
+            partition (str): A key of the settings that produced the answer.
+            answer (str): The complete answer.
+            corpus_version (int, optional): The corpus version returned by get_corpus_version when the request
+                started. The answer is dropped if documents were added or removed since then.
+        """
+        vector = self._vectorize(prompt)
+
+        with self._lock:
+            self._check_corpus_version()
+            if corpus_version is not None and corpus_version != self._corpus_version:
+                self.logger.info("Document corpus changed during the generation, not caching the answer.")
+                return
+            entry_id = self._next_id
+            self._next_id += 1
+            self.index.add_with_ids(vector, np.array([entry_id], dtype=np.int64))
+            self._entries[entry_id] = {
+                "prompt": prompt,
+                "partition": partition,
+                "answer": answer,
+                "expires_at": time.monotonic() + self.ttl,
+            }
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+
+    def get_stats(self):
+        """
+        Return the hit and miss counters of the cache.
+
+        Returns:
+            dict: The counters, the hit rate and the number of cached answers.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+            }
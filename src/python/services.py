@@ -1,17 +1,22 @@
 import os
+import time
 import asyncio
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 
+from chat_session_store import ChatSessionStore
 from config_loader import ConfigLoader
 from custom_logger import CustomLogger
-from database_manager import DatabaseManager
-from document_indexer import DocumentIndexer
-from document_retriever import DocumentRetriever
+from generation_coalescer import GenerationCoalescer
+from generation_scheduler import GenerationScheduler
+from ollama_router import OllamaRouter
 from response_generator import ResponseGenerator
-from text_extractor import TextExtractor
-from text_vectorizer import TextVectorizer
+from shared_settings import SharedSettings
+from ingestion_queue import IngestionQueue
+from token_counter import TokenCounter
 
 class Services:
     """
@@ -33,7 +38,9 @@ class Services:
 
     def _initialize(self):
         """
-        Initializes various components of the application.
+        Initializes the components of the application.
+        The components needed for plain chat are created right away, while the heavy ones (models, indexes,
+        parsers) are initialized concurrently in the background, so the HTTP server starts immediately.
         """
         self.logger = CustomLogger.get_logger(__name__)
 
@@ -41,51 +48,101 @@ class Services:
         config_loader = ConfigLoader()
         self.config = config_loader.load_config()
 
-        self.logger.info("Initializing text extractor.")
-        self.text_extractor = TextExtractor(
-            logger=self.logger
-        )
-
-        self.logger.info("Initializing text vectorizer.")
-        self.text_vectorizer = TextVectorizer(
+        # The mutable settings live in SQLite, so that every worker process sees the same ones
+        self.logger.info("Initializing shared settings.")
+        self.shared_settings = SharedSettings(
             logger=self.logger,
-            model_path=self.config['settings']['vectorizer_model_path']
+            sqlite_db_path=self.config['sqlite3']['path'],
+            defaults={"rag_enabled": False, "system_prompt": None}
         )
 
-        self.logger.info("Initializing database manager.")
-        self.database_manager = DatabaseManager(
+        # Uploads are indexed in the background once the document indexer is initialized
+        self.logger.info("Initializing ingestion queue.")
+        self.ingestion_queue = IngestionQueue(
             logger=self.logger,
             sqlite_db_path=self.config['sqlite3']['path'],
-            faiss_db_path=self.config['faiss']['path']
+            workspace_path=self.config['ingestion']['workspace_path'],
+            document_indexer_provider=self.get_document_indexer,
+            workers=self.config['ingestion']['workers'],
+            max_attempts=self.config['ingestion']['max_attempts'],
+            heartbeat_interval=self.config['ingestion']['heartbeat_interval'],
+            stale_after=self.config['ingestion']['stale_after'],
+            retention=self.config['ingestion']['retention']
         )
 
-        self.logger.info("Initializing document indexer.")
-        self.document_indexer = DocumentIndexer(
+        self.logger.info("Initializing retrieval executor.")
+        self.retrieval_executor = ThreadPoolExecutor(
+            max_workers=self.config['settings']['retrieval_workers'],
+            thread_name_prefix="retrieval"
+        )
+
+        # The tokenizer is loaded in the background, token counts are estimated meanwhile
+        self.logger.info("Initializing token counter.")
+        self.token_counter = TokenCounter(
             logger=self.logger,
-            database_manager=self.database_manager,
-            text_extractor=self.text_extractor,
-            text_vectorizer=self.text_vectorizer
+            chars_per_token=self.config['context']['chars_per_token']
         )
 
-        self.logger.info("Initializing document retriever.")
-        self.document_retriever = DocumentRetriever(
+        self.chat_session_store = None
+        if self.config['chat_sessions']['enabled']:
+            self.logger.info("Initializing chat session store.")
+            self.chat_session_store = ChatSessionStore(
+                logger=self.logger,
+                token_counter=self.token_counter,
+                max_history_tokens=self.config['chat_sessions']['max_history_tokens'],
+                ttl=self.config['chat_sessions']['ttl'],
+                max_sessions=self.config['chat_sessions']['max_sessions']
+            )
+
+        self.logger.info("Initializing Ollama router.")
+        self.ollama_router = OllamaRouter(
             logger=self.logger,
-            database_manager=self.database_manager,
-            text_vectorizer=self.text_vectorizer,
-            use_hybrid_search=self.config['settings']['use_hybrid_search'],
-            max_keywords=self.config['settings']['max_keywords']
+            urls=self.config['ollama']['backends'] or [f"http://{self.config['ollama']['host'] or os.getenv('OLLAMA_HOST')}:{self.config['ollama']['port']}"],
+            failure_threshold=self.config['ollama']['failure_threshold'],
+            circuit_open_time=self.config['ollama']['circuit_open_time'],
+            health_check_interval=self.config['ollama']['health_check_interval'],
+            health_check_timeout=self.config['ollama']['health_check_timeout']
         )
 
+        # The document retriever and the caches are set once they are initialized
         self.logger.info("Initializing response generator.")
         self.response_generator = ResponseGenerator(
             logger=self.logger,
             model=self.config['settings']['model'],
             master_prompt=self.config['settings']['master_prompt'],
-            document_retriever=self.document_retriever
+            retrieval_executor=self.retrieval_executor,
+            ollama_router=self.ollama_router,
+            pool_size=self.config['ollama']['pool_size'],
+            keepalive_timeout=self.config['ollama']['keepalive_timeout'],
+            connect_timeout=self.config['ollama']['connect_timeout'],
+            first_byte_timeout=self.config['ollama']['first_byte_timeout'],
+            read_timeout=self.config['ollama']['read_timeout'],
+            token_counter=self.token_counter,
+            num_ctx_buckets=self.config['context']['num_ctx_buckets'],
+            response_reserve_tokens=self.config['context']['response_reserve_tokens'],
+            chat_session_store=self.chat_session_store,
+            keep_alive=self.config['ollama']['keep_alive'],
+            preload_during_retrieval=self.config['ollama']['preload_during_retrieval'],
+            shared_settings=self.shared_settings
         )
 
+        self.logger.info("Initializing generation scheduler.")
+        self.generation_scheduler = GenerationScheduler(
+            logger=self.logger,
+            max_concurrent=self.config['scheduler']['max_concurrent_generations'],
+            max_queue_size=self.config['scheduler']['max_queue_size'],
+            default_retry_after=self.config['scheduler']['retry_after']
+        )
+
+        self.generation_coalescer = None
+        if self.config['scheduler']['coalesce_identical_requests']:
+            self.logger.info("Initializing generation coalescer.")
+            self.generation_coalescer = GenerationCoalescer(
+                logger=self.logger
+            )
+
         self.logger.info("Initializing FastAPI application.")
-        self.app = FastAPI()
+        self.app = FastAPI(lifespan=self._lifespan)
 
         static_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "../resources/static"))
         html_templates_path = os.path.join(static_path, 'html')
@@ -93,10 +150,244 @@ class Services:
         self.app.mount("/static", StaticFiles(directory=static_path), name="static")
         self.templates = Jinja2Templates(directory=html_templates_path)
 
-        self.rag_enabled = False
+        self._initialize_components()
+
+    def _initialize_components(self):
+        """
+        Starts the initialization of the heavy components in the background.
+        Each component waits for the components it depends on, the others are initialized concurrently.
+        """
+        self.components = {}
+        components = [
+            ("text_extractor", self._create_text_extractor, ()),
+            ("embedding_cache", self._create_embedding_cache, ()),
+            ("text_vectorizer", self._create_text_vectorizer, ("embedding_cache",)),
+            ("database_manager", self._create_database_manager, ()),
+            ("tokenizer", self._load_tokenizer, ()),
+            ("document_indexer", self._create_document_indexer, ("database_manager", "text_extractor", "text_vectorizer")),
+            ("document_retriever", self._create_document_retriever, ("database_manager", "text_vectorizer")),
+            ("response_cache", self._create_response_cache, ("database_manager",)),
+            ("semantic_cache", self._create_semantic_cache, ("database_manager", "text_vectorizer")),
+        ]
+
+        # One thread per component, so components waiting for their dependencies never starve the others
+        executor = ThreadPoolExecutor(max_workers=len(components), thread_name_prefix="initialization")
+        self._initialization_start = time.perf_counter()
+        for name, factory, dependencies in components:
+            self.components[name] = executor.submit(self._initialize_component, name, factory, dependencies)
+        executor.shutdown(wait=False)
+
+    def _initialize_component(self, name, factory, dependencies):
+        """
+        Initializes a component once its dependencies are ready, logging the time it took.
+
+        Args:
+        - name: The name of the component.
+        - factory: Creates the component from its dependencies.
+        - dependencies: The names of the components it depends on.
+        """
+        try:
+            arguments = [self.components[dependency].result() for dependency in dependencies]
+            start_time = time.perf_counter()
+            component = factory(*arguments)
+            self.logger.info(
+                f"Initialized {name} in {time.perf_counter() - start_time:.2f}s "
+                f"({time.perf_counter() - self._initialization_start:.2f}s after startup)."
+            )
+            return component
+        except Exception as e:
+            self.logger.error(f"Failed to initialize {name}: {e}")
+            raise
+
+    # The heavy modules are imported by the factories, so importing them does not delay the server startup
+    def _create_text_extractor(self):
+        """
+        Creates the text extractor, which imports the document parsers.
+        """
+        from text_extractor import TextExtractor
+        return TextExtractor(
+            logger=self.logger
+        )
+
+    def _create_embedding_cache(self):
+        """
+        Creates the embedding cache, or returns None if it is disabled.
+        """
+        if not self.config['embedding_cache']['enabled']:
+            return None
+        from embedding_cache import EmbeddingCache
+        return EmbeddingCache(
+            logger=self.logger,
+            model_id=self.config['settings']['vectorizer_model_path'],
+            max_memory_bytes=self.config['embedding_cache']['max_memory_mb'] * 1024 * 1024,
+            persistent_path=self.config['embedding_cache']['path'] if self.config['embedding_cache']['persistent'] else None,
+            max_persistent_entries=self.config['embedding_cache']['max_persistent_entries']
+        )
+
+    def _create_text_vectorizer(self, embedding_cache):
+        """
+        Creates the text vectorizer, which loads the SentenceTransformer model.
+        """
+        from text_vectorizer import TextVectorizer
+        return TextVectorizer(
+            logger=self.logger,
+            model_path=self.config['settings']['vectorizer_model_path'],
+            batch_size=self.config['settings']['vectorizer_batch_size'],
+            embedding_cache=embedding_cache
+        )
+
+    def _create_database_manager(self):
+        """
+        Creates the database manager, which opens SQLite and loads the FAISS index.
+        """
+        from database_manager import DatabaseManager
+        return DatabaseManager(
+            logger=self.logger,
+            sqlite_db_path=self.config['sqlite3']['path'],
+            faiss_db_path=self.config['faiss']['path'],
+            faiss_config=self.config['faiss']
+        )
+
+    def _load_tokenizer(self):
+        """
+        Loads the tokenizer of the served model into the token counter.
+        """
+        if self.config['context']['tokenizer_path']:
+            self.token_counter.load_tokenizer(self.config['context']['tokenizer_path'])
+        else:
+            self.logger.warning(f"No tokenizer configured, context packing and num_ctx sizing use token counts estimated at "
+                                f"{self.token_counter.chars_per_token} characters per token.")
+        return self.token_counter
+
+    def _create_document_indexer(self, database_manager, text_extractor, text_vectorizer):
+        """
+        Creates the document indexer.
+        """
+        from document_indexer import DocumentIndexer
+        return DocumentIndexer(
+            logger=self.logger,
+            database_manager=database_manager,
+            text_extractor=text_extractor,
+            text_vectorizer=text_vectorizer
+        )
+
+    def _create_document_retriever(self, database_manager, text_vectorizer):
+        """
+        Creates the document retriever, which loads the NLTK resources, and hands it to the response generator.
+        """
+        from document_retriever import DocumentRetriever
+        document_retriever = DocumentRetriever(
+            logger=self.logger,
+            database_manager=database_manager,
+            text_vectorizer=text_vectorizer,
+            use_hybrid_search=self.config['settings']['use_hybrid_search'],
+            max_keywords=self.config['settings']['max_keywords'],
+            search_workers=self.config['settings']['retrieval_workers']
+        )
+        self.response_generator.set_document_retriever(document_retriever)
+        return document_retriever
+
+    def _create_response_cache(self, database_manager):
+        """
+        Creates the response cache and hands it to the response generator, or returns None if it is disabled.
+        """
+        if not self.config['response_cache']['enabled']:
+            return None
+        from response_cache import ResponseCache
+        response_cache = ResponseCache(
+            logger=self.logger,
+            max_entries=self.config['response_cache']['max_entries'],
+            max_bytes=self.config['response_cache']['max_memory_mb'] * 1024 * 1024,
+            ttl=self.config['response_cache']['ttl'],
+            deterministic_only=self.config['response_cache']['deterministic_only'],
+            corpus_version_provider=database_manager.get_corpus_version
+        )
+        self.response_generator.set_response_cache(response_cache)
+        return response_cache
+
+    def _create_semantic_cache(self, database_manager, text_vectorizer):
+        """
+        Creates the semantic cache and hands it to the response generator, or returns None if it is disabled.
+        """
+        if not self.config['semantic_cache']['enabled']:
+            return None
+        from semantic_cache import SemanticCache
+        semantic_cache = SemanticCache(
+            logger=self.logger,
+            text_vectorizer=text_vectorizer,
+            dimension=self.config['faiss']['dimension'],
+            similarity_threshold=self.config['semantic_cache']['similarity_threshold'],
+            max_entries=self.config['semantic_cache']['max_entries'],
+            ttl=self.config['semantic_cache']['ttl'],
+            corpus_version_provider=database_manager.get_corpus_version
+        )
+        self.response_generator.set_semantic_cache(semantic_cache)
+        return semantic_cache
 
-        self.generating_response = False
-        self._response_lock = asyncio.Lock()
+    def is_ready(self, name):
+        """
+        Returns whether a background component is initialized.
+
+        Args:
+        - name: The name of the component.
+        """
+        future = self.components[name]
+        return future.done() and future.exception() is None
+
+    def get_ready_component(self, name):
+        """
+        Returns a background component if it is initialized, None otherwise.
+
+        Args:
+        - name: The name of the component.
+        """
+        return self.components[name].result() if self.is_ready(name) else None
+
+    async def wait_for_component(self, name):
+        """
+        Waits without blocking the event loop until a background component is initialized, and returns it.
+        Raises the initialization error if the component failed to initialize.
+
+        Args:
+        - name: The name of the component.
+        """
+        return await asyncio.wrap_future(self.components[name])
+
+    def get_readiness(self):
+        """
+        Returns the initialization state of each background component: "ready", "initializing" or "failed".
+        """
+        readiness = {}
+        for name, future in self.components.items():
+            if not future.done():
+                readiness[name] = "initializing"
+            elif future.exception() is not None:
+                readiness[name] = "failed"
+            else:
+                readiness[name] = "ready"
+        return readiness
+
+    @asynccontextmanager
+    async def _lifespan(self, app: FastAPI):
+        """
+        Opens the shared resources when the application starts and releases them on shutdown.
+        """
+        await self.response_generator.start_session()
+        self.ingestion_queue.start()
+        # Load the model in the background so the server accepts requests meanwhile
+        warm_up_task = None
+        if self.config['ollama']['warm_up_on_startup']:
+            warm_up_task = asyncio.create_task(self.response_generator.warm_up())
+        yield
+        if warm_up_task is not None and not warm_up_task.done():
+            warm_up_task.cancel()
+        await self.response_generator.close_session()
+        self.ingestion_queue.stop()
+        self.retrieval_executor.shutdown(wait=False)
+        database_manager = self.get_ready_component("database_manager")
+        if database_manager is not None:
+            database_manager.close_connections()
+        self.shared_settings.close()
 
     def get_app(self):
         """
@@ -125,34 +416,76 @@ class Services:
     def get_text_extractor(self):
         """
         Returns the text extractor instance responsible for extracting text from files or documents.
+        Blocks until it is initialized.
         """
-        return self.text_extractor
+        return self.components["text_extractor"].result()
 
     def get_text_vectorizer(self):
         """
         Returns the text vectorizer instance responsible for converting text into vector representations.
+        Blocks until it is initialized.
+        """
+        return self.components["text_vectorizer"].result()
+
+    def get_embedding_cache(self):
+        """
+        Returns the embedding cache instance, or None if the cache is disabled.
+        Blocks until it is initialized.
+        """
+        return self.components["embedding_cache"].result()
+
+    def get_response_cache(self):
+        """
+        Returns the response cache instance, or None if the cache is disabled.
+        Blocks until it is initialized.
+        """
+        return self.components["response_cache"].result()
+
+    def get_semantic_cache(self):
         """
-        return self.text_vectorizer
+        Returns the semantic cache instance, or None if the cache is disabled.
+        Blocks until it is initialized.
+        """
+        return self.components["semantic_cache"].result()
+
+    def get_shared_settings(self):
+        """
+        Returns the shared settings instance holding the mutable settings of every worker process.
+        """
+        return self.shared_settings
+
+    def get_ingestion_queue(self):
+        """
+        Returns the ingestion queue instance indexing the uploaded documents in the background.
+        """
+        return self.ingestion_queue
+
+    def get_chat_session_store(self):
+        """
+        Returns the chat session store instance, or None if chat sessions are disabled.
+        """
+        return self.chat_session_store
 
     def get_database_manager(self):
         """
         Returns the database manager instance used to interact with the SQLite
-        and FAISS databases.
+        and FAISS databases. Blocks until it is initialized.
         """
-        return self.database_manager
+        return self.components["database_manager"].result()
 
     def get_document_retriever(self):
         """
         Returns the document retriever instance used for retrieving relevant documents.
+        Blocks until it is initialized.
         """
-        return self.document_retriever
+        return self.components["document_retriever"].result()
 
     def get_document_indexer(self):
         """
         Returns the document indexer instance responsible for indexing and
-        searching documents.
+        searching documents. Blocks until it is initialized.
         """
-        return self.document_indexer
+        return self.components["document_indexer"].result()
 
     def get_response_generator(self):
         """
@@ -161,49 +494,38 @@ class Services:
         """
         return self.response_generator
 
-    def is_rag_enabled(self):
+    def get_ollama_router(self):
         """
-        Returns the current state of the RAG (retrieval-augmented generation) flag.
-        This flag determines whether retrieval-augmented generation is enabled or not.
+        Returns the Ollama router instance that balances the generations over the Ollama backends.
         """
-        return self.rag_enabled
+        return self.ollama_router
 
-    def set_rag_enabled(self, value: bool):
+    def get_generation_scheduler(self):
         """
-        Sets the RAG (retrieval-augmented generation) flag to the specified value.
-        This flag determines whether retrieval-augmented generation is enabled or not.
-        
-        Args:
-        - value: Boolean value to enable or disable RAG.
+        Returns the generation scheduler instance that limits the number of concurrent generations.
         """
-        self.rag_enabled = value
-    
-    async def is_generating_response(self):
+        return self.generation_scheduler
+
+    def get_generation_coalescer(self):
         """
-        Returns the current state of the response generation flag.
-        This flag determines whether a response is being generated or not.
-        Thread-safe using asyncio.Lock.
+        Returns the generation coalescer instance sharing identical generations in progress, or None if disabled.
         """
-        async with self._response_lock:
-            return self.generating_response
+        return self.generation_coalescer
 
-    async def set_generating_response(self, value: bool):
+    def is_rag_enabled(self):
         """
-        Sets the current state of the generation flag to the specified value.
-        This flag determines whether a response is being generated or not.
-        Thread-safe using asyncio.Lock.
-        
-        Args:
-        - value: Boolean value to set if a response is being generated or not.
+        Returns the current state of the RAG (retrieval-augmented generation) flag.
+        This flag determines whether retrieval-augmented generation is enabled or not.
+        It is shared by every worker process.
         """
-        async with self._response_lock:
-            self.generating_response = value
+        return self.shared_settings.get("rag_enabled")
 
-    def get_response_lock(self):
+    def set_rag_enabled(self, value: bool):
         """
-        Returns the asyncio.Lock used for thread-safe access to generating_response.
+        Sets the RAG (retrieval-augmented generation) flag to the specified value for every worker process.
+        This flag determines whether retrieval-augmented generation is enabled or not.
         
-        Returns:
-            asyncio.Lock: The lock object.
+        Args:
+        - value: Boolean value to enable or disable RAG.
         """
-        return self._response_lock
+        self.shared_settings.set("rag_enabled", value)
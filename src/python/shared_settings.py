@@ -0,0 +1,88 @@
+import json
+import sqlite3
+import threading
+
+class SharedSettings:
+    """
+    The mutable application settings (RAG state, system prompt...) shared by every worker process.
+    The settings are stored in a SQLite table, so a change made through one worker applies to all of them.
+    They are cached in memory and only read again once another connection has written to the database.
+    """
+
+    def __init__(self, logger=None, sqlite_db_path=None, defaults=None):
+        self.logger = logger
+        self.defaults = dict(defaults or {})
+
+        self._lock = threading.Lock()
+        self._values = {}
+        self._data_version = None
+
+        self._connection = sqlite3.connect(sqlite_db_path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode = WAL")
+        self._connection.execute("PRAGMA busy_timeout = 5000")
+        self._connection.execute('''
+            CREATE TABLE IF NOT EXISTS app_settings (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            )
+        ''')
+        self._connection.commit()
+
+
+    def _refresh(self):
+        """
+        Read the settings again if another connection changed the database since the last read.
+        Must be called with the lock held.
+        """
+        # data_version only changes when another connection commits, so reads are skipped otherwise
+        data_version = self._connection.execute("PRAGMA data_version").fetchone()[0]
+        if data_version == self._data_version:
+            return
+        rows = self._connection.execute("SELECT key, value FROM app_settings").fetchall()
+        self._values = {key: json.loads(value) for key, value in rows}
+        self._data_version = data_version
+
+
+    def get(self, key):
+        """
+        Return the current value of a setting.
+
+        Args:
+            key (str): The name of the setting.
+
+        Returns:
+            The value set by any worker, or the default value if it was never set.
+        """
+        with self._lock:
+            try:
+                self._refresh()
+            except sqlite3.Error as e:
+                self.logger.error(f"Error reading the shared settings, using the cached values: {e}")
+            return self._values.get(key, self.defaults.get(key))
+
+
+    def set(self, key, value):
+        """
+        Change a setting for every worker.
+
+        Args:
+            key (str): The name of the setting.
+            value: The new value. It must be serializable to JSON.
+        """
+        with self._lock:
+            self._connection.execute(
+                "INSERT INTO app_settings (key, value) VALUES (?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+                (key, json.dumps(value))
+            )
+            self._connection.commit()
+            self._values[key] = value
+        self.logger.debug(f"Shared setting '{key}' set to: {value}")
+
+
+    def close(self):
+        """
+        Close the connection to the settings database.
+        """
+        with self._lock:
+            self._connection.close()
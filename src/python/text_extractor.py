@@ -1,21 +1,63 @@
-import pandas as pd
-from docx import Document
-from bs4 import BeautifulSoup
-import markdown2
-from odf import opendocument, text
-from PyPDF2 import PdfReader
-from pptx import Presentation
-from striprtf.striprtf import rtf_to_text
-from openpyxl import load_workbook
+import os
 
 class TextExtractor:
     """
     A class to extract text from various file formats including CSV, DOCX, HTML, Markdown, PDF, PPTX, ODT, RTF, and TXT.
+    Each parser library is imported by its extraction method on first use, so processes only load the parsers they need.
     """
+
+    # Extraction method of each supported file extension
+    EXTRACTORS = {
+        '.csv': 'extract_text_from_csv',
+        '.docx': 'extract_text_from_docx',
+        '.htm': 'extract_text_from_html',
+        '.html': 'extract_text_from_html',
+        '.md': 'extract_text_from_md',
+        '.odt': 'extract_text_from_odt',
+        '.pdf': 'extract_text_from_pdf',
+        '.pptx': 'extract_text_from_pptx',
+        '.rtf': 'extract_text_from_rtf',
+        '.txt': 'extract_text_from_txt',
+        '.xlsx': 'extract_text_from_xlsx',
+    }
     
     def __init__(self, logger=None):
         self.logger = logger
 
+
+    def is_supported(self, filename):
+        """
+        Check whether text can be extracted from a file.
+
+        Args:
+            filename (str): The name of the file.
+
+        Returns:
+            bool: True if the file extension is supported.
+        """
+        return os.path.splitext(filename)[1].lower() in self.EXTRACTORS
+
+
+    def extract_text(self, file_path, filename=None):
+        """
+        Extract text from a file with the extraction method registered for its extension.
+
+        Args:
+            file_path (str): Path to the file.
+            filename (str, optional): The name of the file, used to find its extension. Defaults to the file path.
+
+        Returns:
+            str: Text content from the file.
+
+        Raises:
+            ValueError: If the file extension is not supported.
+        """
+        extension = os.path.splitext(filename or file_path)[1].lower()
+        method_name = self.EXTRACTORS.get(extension)
+        if method_name is None:
+            raise ValueError(f"Unsupported file type: {filename or file_path}")
+        return getattr(self, method_name)(file_path)
+
     
     def extract_text_from_csv(self, file_path):
         """
@@ -27,6 +69,7 @@ class TextExtractor:
         Returns:
             str: Text content from the CSV file.
         """
+        import pandas as pd
         self.logger.info(f"Extracting text from CSV file: {file_path}")
         df = pd.read_csv(file_path)
         return df.to_string(index=False)
@@ -42,6 +85,7 @@ class TextExtractor:
         Returns:
             str: Text content from the DOCX file.
         """
+        from docx import Document
         self.logger.info(f"Extracting text from DOCX file: {file_path}")
         doc = Document(file_path)
         return "\n".join([para.text for para in doc.paragraphs])
@@ -57,6 +101,7 @@ class TextExtractor:
         Returns:
             str: Text content from the HTML file.
         """
+        from bs4 import BeautifulSoup
         self.logger.info(f"Extracting text from HTML file: {file_path}")
         with open(file_path, 'r', encoding='utf-8') as file:
             soup = BeautifulSoup(file, 'html.parser')
@@ -73,6 +118,8 @@ class TextExtractor:
         Returns:
             str: Text content from the Markdown file.
         """
+        import markdown2
+        from bs4 import BeautifulSoup
         self.logger.info(f"Extracting text from Markdown file: {file_path}")
         with open(file_path, 'r', encoding='utf-8') as file:
             html = markdown2.markdown(file.read())
@@ -90,6 +137,7 @@ class TextExtractor:
         Returns:
             str: Text content from the ODT file.
         """
+        from odf import opendocument, text
         self.logger.info(f"Extracting text from ODT file: {file_path}")
         doc = opendocument.load(file_path)
         text_content = []
@@ -108,6 +156,7 @@ class TextExtractor:
         Returns:
             str: Text content from the PDF file.
         """
+        from PyPDF2 import PdfReader
         self.logger.info(f"Extracting text from PDF file: {file_path}")
         reader = PdfReader(file_path)
         text = []
@@ -126,6 +175,7 @@ class TextExtractor:
         Returns:
             str: Text content from the PPTX file.
         """
+        from pptx import Presentation
         self.logger.info(f"Extracting text from PPTX file: {file_path}")
         prs = Presentation(file_path)
         text = []
@@ -146,6 +196,7 @@ class TextExtractor:
         Returns:
             str: Text content from the RTF file.
         """
+        from striprtf.striprtf import rtf_to_text
         self.logger.info(f"Extracting text from RTF file: {file_path}")
         with open(file_path, 'r', encoding='utf-8') as file:
             return rtf_to_text(file.read())
@@ -176,6 +227,7 @@ class TextExtractor:
         Returns:
             str: Text content from the XLSX file.
         """
+        from openpyxl import load_workbook
         self.logger.info(f"Extracting text from XLSX file: {file_path}")
         workbook = load_workbook(file_path, data_only=True)
         text = []
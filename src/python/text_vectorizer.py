@@ -6,8 +6,10 @@ class TextVectorizer:
     A class responsible for converting text into vector representations using a pre-trained SentenceTransformer model.
     """
 
-    def __init__(self, logger=None, model_path=None):
+    def __init__(self, logger=None, model_path=None, batch_size=64, embedding_cache=None):
         self.logger = logger
+        self.batch_size = batch_size
+        self.embedding_cache = embedding_cache
         
         if model_path is None:
             raise ValueError("model_path must be provided. Please configure 'vectorizer_model_path' in config.yaml")
@@ -38,6 +40,25 @@ class TextVectorizer:
         return similarity
 
 
+    def compute_similarities_from_matrix(self, vector, matrix, normalized=False):
+        """
+        Compute the cosine similarity between a vector and every row of a matrix in one operation.
+
+        Args:
+            vector (np.ndarray): The reference vector.
+            matrix (np.ndarray): A matrix with one vector per row.
+            normalized (bool): Whether the rows of the matrix are already L2-normalized, in which case
+                only the norm of the reference vector is computed.
+
+        Returns:
+            np.ndarray: The cosine similarity of each row with the reference vector.
+        """
+        if normalized:
+            return (matrix @ vector) / np.linalg.norm(vector)
+        norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(vector)
+        return (matrix @ vector) / norms
+
+
     def vectorize_text(self, text):
         """
         Convert the input text into a vector representation using a pre-trained model.
@@ -48,55 +69,105 @@ class TextVectorizer:
         Returns:
             numpy.ndarray: The vector representation of the input text.
         """
+        if self.embedding_cache is not None:
+            cached_vector = self.embedding_cache.get_many([text])[0]
+            if cached_vector is not None:
+                self.logger.debug("Embedding cache hit for text of length %d", len(text))
+                return cached_vector
+
         self.logger.info("Vectorizing text of length %d", len(text))
         try:
-            return self.model.encode(text)
+            vector = self.model.encode(text)
+            if self.embedding_cache is not None:
+                self.embedding_cache.put_many([text], [vector])
+            return vector
         except Exception as e:
             self.logger.error(f"Error during vectorization: {str(e)}")
             raise
 
 
-    def vectorize_chunks_with_context(self, chunks, window=1):
+    def vectorize_texts(self, texts, batch_size=None):
+        """
+        Convert a list of texts into vector representations using batched model calls.
+
+        Args:
+            texts (list): The texts to be vectorized.
+            batch_size (int, optional): The number of texts encoded per model call.
+                Defaults to the batch size configured for the vectorizer.
+
+        Returns:
+            numpy.ndarray: A matrix with one vector per input text.
+        """
+        texts = list(texts)
+        batch_size = batch_size or self.batch_size
+
+        cached_vectors = [None] * len(texts)
+        if self.embedding_cache is not None:
+            cached_vectors = self.embedding_cache.get_many(texts)
+        missing_positions = [position for position, vector in enumerate(cached_vectors) if vector is None]
+        if not missing_positions:
+            self.logger.debug("Embedding cache hit for all %d texts", len(texts))
+            return np.vstack(cached_vectors) if texts else np.empty((0, 0), dtype=np.float32)
+
+        self.logger.info("Vectorizing %d texts with a batch size of %d", len(missing_positions), batch_size)
+        try:
+            missing_texts = [texts[position] for position in missing_positions]
+            encoded_vectors = np.asarray(self.model.encode(missing_texts, batch_size=batch_size))
+            if self.embedding_cache is not None:
+                self.embedding_cache.put_many(missing_texts, encoded_vectors)
+            for position, vector in zip(missing_positions, encoded_vectors):
+                cached_vectors[position] = vector
+            return np.vstack(cached_vectors)
+        except Exception as e:
+            self.logger.error(f"Error during batch vectorization: {str(e)}")
+            raise
+
+
+    def vectorize_chunks_with_context(self, chunks, window=1, batch_size=None):
         """
         Vectorize chunks with context using similarity-based dynamic weighting.
 
+        All context windows are encoded in batched model calls and the weighting
+        against the left and right neighbours is computed as a single matrix operation.
+
         Args:
             chunks (list): List of text chunks.
             window (int): Number of neighboring chunks to include on each side.
+            batch_size (int, optional): The number of windows encoded per model call.
 
         Returns:
             list: List of context-enhanced vectors for each chunk.
         """
-        # Step 1: Concatenate neighbors and vectorize each chunk
-        concatenated_vectors = []
-        for i in range(len(chunks)):
-            start = max(0, i - window)
-            end = min(len(chunks), i + window + 1)
-            combined_chunk = " ".join(chunks[start:end])
-            vector = self.vectorize_text(combined_chunk)
-            concatenated_vectors.append(vector)
-
-        # Step 2: Apply dynamic weighting based on similarity
-        enhanced_vectors = []
-        for i in range(len(concatenated_vectors)):
-            central_vector = concatenated_vectors[i]
-            
-            left_context = concatenated_vectors[max(0, i - 1)]
-            right_context = concatenated_vectors[min(len(concatenated_vectors) - 1, i + 1)]
-            
-            left_similarity = self.compute_similarity_from_vector(central_vector, left_context)
-            right_similarity = self.compute_similarity_from_vector(central_vector, right_context)
-            
-            total_similarity = left_similarity + right_similarity + 1
-            central_weight = 1 / total_similarity
-            left_weight = left_similarity / total_similarity
-            right_weight = right_similarity / total_similarity
-
-            enhanced_vector = (
-                central_weight * central_vector + 
-                left_weight * left_context + 
-                right_weight * right_context
-            )
-            enhanced_vectors.append(enhanced_vector)
-
-        return enhanced_vectors
+        if not chunks:
+            return []
+
+        # Step 1: Concatenate neighbors and vectorize all windows in batches
+        combined_chunks = [
+            " ".join(chunks[max(0, i - window):min(len(chunks), i + window + 1)])
+            for i in range(len(chunks))
+        ]
+        concatenated_vectors = self.vectorize_texts(combined_chunks, batch_size=batch_size)
+
+        # Step 2: Apply dynamic weighting based on similarity to the adjacent windows
+        indices = np.arange(len(concatenated_vectors))
+        left_indices = np.maximum(indices - 1, 0)
+        right_indices = np.minimum(indices + 1, len(concatenated_vectors) - 1)
+        left_context = concatenated_vectors[left_indices]
+        right_context = concatenated_vectors[right_indices]
+
+        norms = np.linalg.norm(concatenated_vectors, axis=1)
+        left_similarity = np.einsum('ij,ij->i', concatenated_vectors, left_context) / (norms * norms[left_indices])
+        right_similarity = np.einsum('ij,ij->i', concatenated_vectors, right_context) / (norms * norms[right_indices])
+
+        total_similarity = left_similarity + right_similarity + 1
+        central_weight = (1 / total_similarity)[:, None]
+        left_weight = (left_similarity / total_similarity)[:, None]
+        right_weight = (right_similarity / total_similarity)[:, None]
+
+        enhanced_vectors = (
+            central_weight * concatenated_vectors +
+            left_weight * left_context +
+            right_weight * right_context
+        )
+
+        return list(enhanced_vectors)
@@ -0,0 +1,66 @@
+import math
+
+class TokenCounter:
+    """
+    A class responsible for counting the tokens of a text as the served model sees them.
+    It uses the Hugging Face tokenizer of the model when one is configured, and otherwise falls back to an
+    estimate based on the number of characters per token.
+    """
+
+    def __init__(self, logger=None, tokenizer_path=None, chars_per_token=4):
+        self.logger = logger
+        self.chars_per_token = chars_per_token
+        self.tokenizer = None
+
+        if tokenizer_path:
+            self.load_tokenizer(tokenizer_path)
+
+
+    def load_tokenizer(self, tokenizer_path):
+        """
+        Load the tokenizer of the served model, keeping the estimate if it is not available.
+        Token counts are estimated until the tokenizer is loaded, so it can be loaded in the background.
+
+        Args:
+            tokenizer_path (str): The path or Hugging Face identifier of the tokenizer.
+        """
+        try:
+            from transformers import AutoTokenizer
+            self.tokenizer = AutoTokenizer.from_pretrained(tokenizer_path)
+            self.logger.info(f"Loaded tokenizer from {tokenizer_path} for token counting.")
+        except Exception as e:
+            self.logger.error(f"Could not load tokenizer from {tokenizer_path}, context packing and num_ctx sizing use "
+                              f"estimated token counts instead: {e}")
+
+
+    def count(self, text):
+        """
+        Count the tokens of a text.
+
+        Args:
+            text (str): The text to count the tokens of.
+
+        Returns:
+            int: The number of tokens.
+        """
+        if not text:
+            return 0
+        if self.tokenizer is not None:
+            return len(self.tokenizer.encode(text, add_special_tokens=False))
+        return math.ceil(len(text) / self.chars_per_token)
+
+
+    def count_many(self, texts):
+        """
+        Count the tokens of several texts.
+
+        Args:
+            texts (list): The texts to count the tokens of.
+
+        Returns:
+            list: The number of tokens of each text.
+        """
+        if self.tokenizer is not None and texts:
+            encodings = self.tokenizer(list(texts), add_special_tokens=False)["input_ids"]
+            return [len(ids) for ids in encodings]
+        return [self.count(text) for text in texts]
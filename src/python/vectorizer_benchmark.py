@@ -0,0 +1,117 @@
+import time
+import random
+import logging
+import argparse
+import numpy as np
+
+from config_loader import ConfigLoader
+from text_vectorizer import TextVectorizer
+
+# Compare the per-chunk context vectorization that TextVectorizer used before batching with the batched
+# vectorize_chunks_with_context, on a fixed synthetic corpus, and check that both produce the same vectors.
+# Uses the vectorizer model of config.yaml: python vectorizer_benchmark.py --chunks 200
+
+def make_chunks(num_chunks, chunk_words, seed=0):
+    """
+    Generate a reproducible corpus of chunks made of pseudo-words, split like DocumentIndexer.chunk_text does.
+
+    Args:
+        num_chunks (int): The number of chunks.
+        chunk_words (int): The number of words per chunk.
+        seed (int): The seed of the random generator.
+
+    Returns:
+        list: The chunks.
+    """
+    rng = random.Random(seed)
+    syllables = ["ka", "lo", "mi", "ne", "ru", "sa", "ti", "vo", "an", "el", "or", "is"]
+    vocabulary = ["".join(rng.choice(syllables) for _ in range(rng.randint(1, 4))) for _ in range(2000)]
+    return [" ".join(rng.choice(vocabulary) for _ in range(chunk_words)) for _ in range(num_chunks)]
+
+
+def vectorize_chunks_per_chunk(vectorizer, chunks, window=1):
+    """
+    The context vectorization before batching: one model call per window, and the similarity weighting
+    computed one chunk at a time.
+
+    Returns:
+        list: The context-enhanced vector of each chunk.
+    """
+    concatenated_vectors = []
+    for i in range(len(chunks)):
+        start = max(0, i - window)
+        end = min(len(chunks), i + window + 1)
+        combined_chunk = " ".join(chunks[start:end])
+        concatenated_vectors.append(vectorizer.vectorize_text(combined_chunk))
+
+    enhanced_vectors = []
+    for i in range(len(concatenated_vectors)):
+        central_vector = concatenated_vectors[i]
+        left_context = concatenated_vectors[max(0, i - 1)]
+        right_context = concatenated_vectors[min(len(concatenated_vectors) - 1, i + 1)]
+
+        left_similarity = vectorizer.compute_similarity_from_vector(central_vector, left_context)
+        right_similarity = vectorizer.compute_similarity_from_vector(central_vector, right_context)
+
+        total_similarity = left_similarity + right_similarity + 1
+        enhanced_vectors.append(
+            central_vector / total_similarity +
+            left_similarity / total_similarity * left_context +
+            right_similarity / total_similarity * right_context
+        )
+    return enhanced_vectors
+
+
+def best_time(function, repeat):
+    """
+    Run a function several times and return its last result and its fastest run time, in seconds.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start_time)
+    return result, best
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the batched context vectorization against the per-chunk one.")
+    parser.add_argument("--chunks", type=int, default=200, help="The number of chunks of the corpus.")
+    parser.add_argument("--chunk-words", type=int, default=500, help="The number of words per chunk.")
+    parser.add_argument("--window", type=int, default=1, help="The number of neighboring chunks on each side.")
+    parser.add_argument("--batch-size", type=int, default=None, help="The batch size, defaults to the configured one.")
+    parser.add_argument("--repeat", type=int, default=3, help="The number of runs, the fastest one is reported.")
+    parser.add_argument("--tolerance", type=float, default=1e-4, help="The largest difference allowed between the vectors.")
+    args = parser.parse_args()
+
+    settings = ConfigLoader().load_config()['settings']
+    # No embedding cache, so that every run encodes the windows again
+    vectorizer = TextVectorizer(
+        logger=logging.getLogger("vectorizer_benchmark"),
+        model_path=settings['vectorizer_model_path'],
+        batch_size=args.batch_size or settings['vectorizer_batch_size']
+    )
+    chunks = make_chunks(args.chunks, args.chunk_words)
+    print(f"Synthetic corpus: {args.chunks} chunks of {args.chunk_words} words, window {args.window}, "
+          f"batch size {vectorizer.batch_size}.")
+
+    # Load the model weights and warm up the kernels before timing
+    vectorizer.vectorize_chunks_with_context(chunks[:8], window=args.window)
+
+    per_chunk_vectors, per_chunk_time = best_time(
+        lambda: vectorize_chunks_per_chunk(vectorizer, chunks, window=args.window), args.repeat
+    )
+    batched_vectors, batched_time = best_time(
+        lambda: vectorizer.vectorize_chunks_with_context(chunks, window=args.window), args.repeat
+    )
+
+    print(f"{'path':<10} {'time (s)':>9} {'chunks/s':>9}")
+    print(f"{'per-chunk':<10} {per_chunk_time:>9.2f} {args.chunks / per_chunk_time:>9.1f}")
+    print(f"{'batched':<10} {batched_time:>9.2f} {args.chunks / batched_time:>9.1f}")
+    print(f"Speedup: {per_chunk_time / batched_time:.2f}x")
+
+    # Batches pad the windows to the same length, so the vectors only match up to float32 rounding
+    difference = float(np.max(np.abs(np.vstack(per_chunk_vectors) - np.vstack(batched_vectors))))
+    print(f"Largest difference between the vectors: {difference:.2e}")
+    if difference > args.tolerance:
+        raise SystemExit(f"The batched vectors differ from the per-chunk ones by more than {args.tolerance}.")
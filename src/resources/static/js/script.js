@@ -1,4 +1,6 @@
 let isGeneratingResponse = false;
+let currentGenerationId = null;
+let currentSessionId = null;
 
 /**
  * Initializes Notyf for displaying dismissible notifications
@@ -88,8 +90,16 @@ async function uploadDocuments() {
             method: 'POST',
             body: formData
         });
+        if (response.status === 400) {
+            // The upload was rejected, for instance because several files have the same name
+            const error = await response.json();
+            notyf.error(error.detail);
+            return;
+        }
         if (!response.ok) throw new Error('Failed to upload documents.');
-        notyf.success('Documents uploaded successfully.');
+        const data = await response.json();
+        notyf.success('Documents uploaded, indexing in progress.');
+        trackIngestionJob(data.job_id);
     } catch (error) {
         console.error('Error uploading documents:', error);
         notyf.error('Error uploading documents. Please try again.');
@@ -97,6 +107,47 @@ async function uploadDocuments() {
 }
 
 
+/**
+ * Polls the status of an ingestion job, showing its progress until the documents are indexed.
+ * @param {string} jobId - The ID of the job returned by the upload.
+ */
+async function trackIngestionJob(jobId) {
+    const fileCount = document.getElementById('file-count');
+
+    while (true) {
+        await new Promise(resolve => setTimeout(resolve, 1000));
+
+        let job;
+        try {
+            const response = await fetch(`/jobs/${jobId}`);
+            if (!response.ok) throw new Error('Failed to get the job status.');
+            job = await response.json();
+        } catch (error) {
+            console.error('Error getting the indexing status:', error);
+            notyf.error('Error getting the indexing status.');
+            return;
+        }
+
+        if (job.status === 'queued') {
+            fileCount.textContent = 'Waiting to be indexed...';
+        } else if (job.status === 'running') {
+            fileCount.textContent = `Indexing: ${job.files_vectorized}/${job.files_total} files vectorized (${job.chunks_per_second} chunks/s)`;
+        } else {
+            fileCount.textContent = 'No files selected';
+            for (let file of job.files.filter(file => file.error)) {
+                notyf.error(`The file "${file.name}" could not be indexed: ${file.error}`);
+            }
+            if (job.status === 'completed') {
+                notyf.success(`Documents indexed successfully (${job.chunks} chunks).`);
+            } else {
+                notyf.error(`Error indexing documents: ${job.error}`);
+            }
+            return;
+        }
+    }
+}
+
+
 /**
  * Updates the file count display based on the number of selected files.
  */
@@ -168,6 +219,14 @@ document.getElementById('rag-toggle').addEventListener('change', function() {
 });
 
 
+/**
+ * Starts a new conversation whenever the conversation memory is turned on or off.
+ */
+document.getElementById('memory-toggle').addEventListener('change', function() {
+    currentSessionId = null;
+});
+
+
 /**
  * Toggles the visibility of the vertical menu with an animated slide effect.
  */
@@ -232,7 +291,8 @@ function prepareGenerationRequestBody(prompt, numCtx, temperature, repeatLastN,
         num_ctx: numCtx,
         temperature: temperature,
         repeat_last_n: repeatLastN,
-        repeat_penalty: repeatPenalty
+        repeat_penalty: repeatPenalty,
+        session_id: document.getElementById('memory-toggle').checked ? (currentSessionId || "new") : undefined
     };
 }
 
@@ -249,6 +309,8 @@ async function sendGenerationRequest(body) {
         body: JSON.stringify(body)
     });
     if (!response.ok) throw new Error("API error");
+    currentGenerationId = response.headers.get("X-Generation-ID");
+    currentSessionId = response.headers.get("X-Session-ID") || currentSessionId;
     return response;
 }
 
@@ -344,7 +406,8 @@ async function generateResponse() {
 
 
 async function stopGeneration() {
-    const response = await fetch("/stop-generation", {
+    if (!currentGenerationId) return;
+    const response = await fetch(`/stop-generation/${currentGenerationId}`, {
         method: "POST",
     });
     if (!response.ok) throw new Error("API error");
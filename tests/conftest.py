@@ -0,0 +1,13 @@
+import os
+import sys
+import logging
+import pytest
+
+# The application modules import each other by name from src/python, as when the application runs
+SOURCE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src", "python"))
+sys.path.insert(0, SOURCE_DIR)
+
+
+@pytest.fixture
+def logger():
+    return logging.getLogger("tests")
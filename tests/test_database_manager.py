@@ -0,0 +1,99 @@
+import os
+
+import faiss
+import numpy as np
+import pytest
+
+from database_manager import DatabaseManager
+
+
+@pytest.fixture
+def open_manager(tmp_path, logger):
+    """
+    Open DatabaseManager instances on the same databases, standing for the worker processes of the application.
+    The singleton is reset before each one, so every call returns a separate manager.
+    """
+    managers = []
+
+    def open_manager(**faiss_config):
+        DatabaseManager._instance = None
+        manager = DatabaseManager(logger=logger, sqlite_db_path=str(tmp_path / "documents.db"),
+                                  faiss_db_path=str(tmp_path / "index.faiss"),
+                                  faiss_config={"index_type": "flat", "dimension": 4, **faiss_config})
+        managers.append(manager)
+        return manager
+
+    yield open_manager
+    for manager in managers:
+        manager.close_connections()
+    DatabaseManager._instance = None
+
+
+def store_document(manager, title, vectors, job_id=None):
+    chunks = [f"{title} chunk {i}" for i in range(len(vectors))]
+    chunk_ids = manager.insert_documents_with_chunks([(title, chunks, vectors)], job_id=job_id)
+    manager.add_vectors_to_faiss(chunk_ids, vectors)
+    return chunk_ids
+
+
+def test_vectors_added_by_another_worker_are_searchable(open_manager):
+    first = open_manager()
+    second = open_manager()
+    assert first is not second
+    version = second.get_corpus_version()
+
+    chunk_ids = store_document(first, "report", [[1.0, 0.0, 0.0, 0.0], [0.0, 1.0, 0.0, 0.0]])
+
+    assert second.get_corpus_version() == version + 1
+    results = second.search_faiss(np.array([0.0, 2.0, 0.0, 0.0]), top_k=1)
+    assert results[0][0] == chunk_ids[1]
+    assert results[0][1] == pytest.approx(1.0)
+    assert second.index.ntotal == 2
+
+    # Vectors stored by the second worker are not added twice when it syncs
+    more_ids = store_document(second, "notes", [[0.0, 0.0, 1.0, 0.0]])
+    assert second.index.ntotal == 3
+    assert first.search_faiss(np.array([0.0, 0.0, 1.0, 0.0]), top_k=1)[0][0] == more_ids[0]
+    assert first.index.ntotal == 3
+
+
+def test_cleanup_by_another_worker_empties_the_index(open_manager):
+    first = open_manager()
+    second = open_manager()
+    store_document(first, "report", [[1.0, 0.0, 0.0, 0.0]])
+    assert len(second.search_faiss(np.array([1.0, 0.0, 0.0, 0.0]), top_k=1)) == 1
+
+    first.clean_database()
+    assert second.search_faiss(np.array([1.0, 0.0, 0.0, 0.0]), top_k=1) == []
+    assert second.index.ntotal == 0
+
+
+def test_job_documents_are_reported_with_their_chunks(open_manager):
+    manager = open_manager()
+    store_document(manager, "a.txt", [[1.0, 0.0, 0.0, 0.0], [0.0, 1.0, 0.0, 0.0]], job_id="job")
+    store_document(manager, "b.txt", [[0.0, 0.0, 1.0, 0.0]], job_id="other job")
+    assert manager.fetch_job_documents("job") == {"a.txt": 2}
+    assert manager.fetch_job_documents("missing") == {}
+
+
+def test_l2_index_is_migrated_to_the_inner_product_metric(open_manager, tmp_path):
+    legacy = open_manager(metric="l2")
+    vectors = [[3.0, 4.0, 0.0, 0.0], [0.0, 0.0, 0.0, 2.0]]
+    chunk_ids = store_document(legacy, "report", vectors)
+    legacy.save_faiss_index()
+    assert faiss.read_index(str(tmp_path / "index.faiss")).metric_type == faiss.METRIC_L2
+
+    migrated = open_manager(metric="inner_product")
+    assert migrated.index.metric_type == faiss.METRIC_INNER_PRODUCT
+    assert migrated.index.ntotal == 2
+    # The stored vectors were normalized, so the scores are cosine similarities
+    _, stored = migrated._load_stored_vectors()
+    assert np.linalg.norm(stored, axis=1) == pytest.approx([1.0, 1.0])
+    results = migrated.search_faiss(np.array([6.0, 8.0, 0.0, 0.0]), top_k=2)
+    assert [chunk_id for chunk_id, _ in results] == chunk_ids
+    assert [score for _, score in results] == pytest.approx([1.0, 0.0], abs=1e-6)
+
+    # The migrated file is loaded as is by the next worker
+    assert faiss.read_index(str(tmp_path / "index.faiss")).metric_type == faiss.METRIC_INNER_PRODUCT
+    assert os.path.exists(str(tmp_path / "index.faiss.lock"))
+    assert open_manager(metric="inner_product").index.ntotal == 2
@@ -0,0 +1,104 @@
+import asyncio
+
+import pytest
+
+from generation_scheduler import GenerationScheduler, SchedulerFullError
+
+
+def test_admits_up_to_max_concurrent_then_queues(logger):
+    async def scenario():
+        scheduler = GenerationScheduler(logger=logger, max_concurrent=2, max_queue_size=2)
+        tickets = [scheduler.reserve() for _ in range(4)]
+        assert [ticket.position for ticket in tickets] == [0, 0, 1, 2]
+        assert [ticket.future.done() for ticket in tickets] == [True, True, False, False]
+        assert scheduler.get_stats()["active"] == 2
+        assert scheduler.get_stats()["waiting"] == 2
+
+    asyncio.run(scenario())
+
+
+def test_rejects_when_the_queue_is_full(logger):
+    async def scenario():
+        scheduler = GenerationScheduler(logger=logger, max_concurrent=1, max_queue_size=1, default_retry_after=7)
+        scheduler.reserve()
+        scheduler.reserve()
+        with pytest.raises(SchedulerFullError) as error:
+            scheduler.reserve()
+        assert error.value.retry_after == 7
+        assert scheduler.get_stats()["total_rejected"] == 1
+        assert scheduler.get_stats()["total_admitted"] == 2
+
+    asyncio.run(scenario())
+
+
+def test_waiting_requests_start_in_fifo_order(logger):
+    async def scenario():
+        scheduler = GenerationScheduler(logger=logger, max_concurrent=1, max_queue_size=10)
+        running = scheduler.reserve()
+        started = []
+
+        async def generation(name, ticket):
+            await scheduler.wait(ticket)
+            started.append(name)
+            await asyncio.sleep(0)
+            scheduler.release(ticket)
+
+        # The tickets are reserved in order, but their tasks are started in reverse order
+        tickets = [(name, scheduler.reserve()) for name in "abcd"]
+        tasks = [asyncio.create_task(generation(name, ticket)) for name, ticket in reversed(tickets)]
+        await asyncio.sleep(0)
+        assert started == []
+
+        scheduler.release(running)
+        await asyncio.gather(*tasks)
+        assert started == ["a", "b", "c", "d"]
+        assert scheduler.get_stats()["active"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_new_requests_do_not_overtake_the_queue(logger):
+    async def scenario():
+        scheduler = GenerationScheduler(logger=logger, max_concurrent=1, max_queue_size=10)
+        first = scheduler.reserve()
+        waiting = scheduler.reserve()
+        scheduler.release(first)
+        # The freed slot went to the waiting request, so a new one is queued behind it
+        assert waiting.future.done()
+        late = scheduler.reserve()
+        assert late.position == 1
+        assert not late.future.done()
+
+    asyncio.run(scenario())
+
+
+def test_abandoned_waiting_request_leaves_the_queue(logger):
+    async def scenario():
+        scheduler = GenerationScheduler(logger=logger, max_concurrent=1, max_queue_size=1)
+        running = scheduler.reserve()
+        abandoned = scheduler.reserve()
+        scheduler.release(abandoned)
+        assert abandoned.future.cancelled()
+        # Its place in the queue is free again, and the slot is still held by the running request
+        queued = scheduler.reserve()
+        scheduler.release(running)
+        assert queued.future.done()
+        assert scheduler.get_stats()["active"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_retry_after_follows_the_average_run_time(logger):
+    async def scenario():
+        scheduler = GenerationScheduler(logger=logger, max_concurrent=2, max_queue_size=10)
+        ticket = scheduler.reserve()
+        await scheduler.wait(ticket)
+        # Pretend the generation ran for a little under 4 seconds
+        ticket.started_at -= 3.9
+        scheduler.release(ticket)
+        for _ in range(3):
+            scheduler.reserve()
+        # One waiting request plus the rejected one, shared by 2 slots: 4 * 2 / 2 seconds
+        assert scheduler.estimate_retry_after() == 4
+
+    asyncio.run(scenario())
@@ -0,0 +1,149 @@
+import os
+
+import pytest
+
+from ingestion_queue import IngestionQueue
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeIndexer:
+    """
+    Indexes every file of the workspace into one chunk, reporting the progress like DocumentIndexer.
+    """
+
+    def __init__(self):
+        self.calls = []
+
+    def index_documents(self, folder_path, progress_callback=None, job_id=None):
+        self.calls.append((sorted(os.listdir(folder_path)), job_id))
+        for filename in sorted(os.listdir(folder_path)):
+            progress_callback(filename, "vectorized", 1, None)
+            progress_callback(filename, "processed", 1, None)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr("ingestion_queue.time.time", clock)
+    return clock
+
+
+def make_queue(tmp_path, logger, indexer, **kwargs):
+    # Every queue opens the same database and workspace, like the worker processes of the application
+    return IngestionQueue(logger=logger, sqlite_db_path=str(tmp_path / "jobs.db"),
+                          workspace_path=str(tmp_path / "workspace"),
+                          document_indexer_provider=lambda: indexer, stale_after=60, **kwargs)
+
+
+def submit_job(queue, filenames):
+    job_id, workspace = queue.create_workspace()
+    for filename in filenames:
+        with open(os.path.join(workspace, filename), "w") as file:
+            file.write("text")
+    queue.submit(job_id, filenames)
+    return job_id, workspace
+
+
+def test_job_is_indexed_and_its_workspace_removed(tmp_path, logger, clock):
+    indexer = FakeIndexer()
+    queue = make_queue(tmp_path, logger, indexer)
+    job_id, workspace = submit_job(queue, ["a.txt", "b.txt"])
+
+    assert queue._claim_job() == job_id
+    assert queue._claim_job() is None
+    queue._run_job(job_id)
+
+    job = queue.get_job(job_id)
+    assert job["status"] == "completed"
+    assert (job["files_vectorized"], job["files_processed"], job["chunks"]) == (2, 2, 2)
+    assert indexer.calls == [(["a.txt", "b.txt"], job_id)]
+    assert not os.path.exists(workspace)
+
+
+def test_interrupted_job_is_queued_again_and_resumed(tmp_path, logger, clock):
+    indexer = FakeIndexer()
+    crashed = make_queue(tmp_path, logger, indexer)
+    job_id, workspace = submit_job(crashed, ["a.txt"])
+    # The worker claims the job and its process dies before finishing it
+    assert crashed._claim_job() == job_id
+
+    survivor = make_queue(tmp_path, logger, indexer)
+    clock.now += 30
+    survivor._heartbeat()
+    assert survivor.get_job(job_id)["status"] == "running"
+
+    clock.now += 31
+    survivor._heartbeat()
+    assert survivor.get_job(job_id)["status"] == "queued"
+
+    assert survivor._claim_job() == job_id
+    survivor._run_job(job_id)
+    job = survivor.get_job(job_id)
+    assert (job["status"], job["attempts"]) == ("completed", 2)
+    # The resumed attempt passes the same job ID, so the indexer skips the files already stored
+    assert indexer.calls == [(["a.txt"], job_id)]
+    assert not os.path.exists(workspace)
+
+
+def test_running_job_is_kept_alive_by_its_heartbeat(tmp_path, logger, clock):
+    queue = make_queue(tmp_path, logger, FakeIndexer())
+    job_id, _ = submit_job(queue, ["a.txt"])
+    assert queue._claim_job() == job_id
+
+    for _ in range(5):
+        clock.now += 50
+        queue._heartbeat()
+    assert queue.get_job(job_id)["status"] == "running"
+
+
+def test_job_fails_after_max_attempts(tmp_path, logger, clock):
+    queue = make_queue(tmp_path, logger, FakeIndexer(), max_attempts=2)
+    other = make_queue(tmp_path, logger, FakeIndexer(), max_attempts=2)
+    job_id, workspace = submit_job(queue, ["a.txt"])
+
+    for _ in range(2):
+        assert queue._claim_job() == job_id
+        # Forget the job as a crashed process would
+        queue._running.clear()
+        clock.now += 61
+        other._heartbeat()
+
+    job = queue.get_job(job_id)
+    assert (job["status"], job["attempts"]) == ("failed", 2)
+    assert job["error"] == "The job was interrupted 2 times."
+    assert queue._claim_job() is None
+    assert not os.path.exists(workspace)
+
+
+def test_job_fails_when_no_file_could_be_indexed(tmp_path, logger, clock):
+    class FailingIndexer:
+        def index_documents(self, folder_path, progress_callback=None, job_id=None):
+            progress_callback("a.txt", "failed", 0, "Unsupported file type.")
+
+    queue = make_queue(tmp_path, logger, FailingIndexer())
+    job_id, _ = submit_job(queue, ["a.txt"])
+    queue._run_job(queue._claim_job())
+
+    job = queue.get_job(job_id)
+    assert job["status"] == "failed"
+    assert job["files"][0]["error"] == "Unsupported file type."
+
+
+def test_finished_jobs_are_forgotten_after_the_retention(tmp_path, logger, clock):
+    queue = make_queue(tmp_path, logger, FakeIndexer(), retention=3600)
+    job_id, _ = submit_job(queue, ["a.txt"])
+    queue._run_job(queue._claim_job())
+
+    clock.now += 3599
+    queue._heartbeat()
+    assert queue.get_job(job_id) is not None
+    clock.now += 2
+    queue._heartbeat()
+    assert queue.get_job(job_id) is None
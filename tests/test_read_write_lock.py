@@ -0,0 +1,104 @@
+import time
+import threading
+
+import pytest
+
+from read_write_lock import ReadWriteLock
+
+
+def run_in_thread(function):
+    thread = threading.Thread(target=function, daemon=True)
+    thread.start()
+    return thread
+
+
+def wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def test_readers_share_the_lock():
+    lock = ReadWriteLock()
+    inside = threading.Barrier(3, timeout=2)
+
+    def reader():
+        with lock.read():
+            inside.wait()
+
+    threads = [run_in_thread(reader) for _ in range(3)]
+    for thread in threads:
+        thread.join(2)
+    assert not any(thread.is_alive() for thread in threads)
+
+
+def test_read_and_write_are_reentrant():
+    lock = ReadWriteLock()
+    with lock.read():
+        with lock.read():
+            pass
+    with lock.write():
+        with lock.write():
+            # The writer may also read
+            with lock.read():
+                pass
+        assert lock._writer == threading.get_ident()
+    assert lock._writer is None
+    assert not lock._readers
+
+
+def test_read_lock_cannot_be_upgraded():
+    lock = ReadWriteLock()
+    with lock.read():
+        with pytest.raises(RuntimeError):
+            lock.acquire_write()
+    # The failed upgrade left the lock usable
+    with lock.write():
+        pass
+
+
+def test_writer_waits_for_the_readers():
+    lock = ReadWriteLock()
+    events = []
+    lock.acquire_read()
+
+    def writer():
+        with lock.write():
+            events.append("write")
+
+    thread = run_in_thread(writer)
+    wait_until(lambda: lock._waiting_writers == 1)
+    events.append("read released")
+    lock.release_read()
+    thread.join(2)
+    assert events == ["read released", "write"]
+
+
+def test_waiting_writer_blocks_new_readers():
+    lock = ReadWriteLock()
+    events = []
+    lock.acquire_read()
+
+    def writer():
+        with lock.write():
+            events.append("write")
+
+    def reader():
+        with lock.read():
+            events.append("read")
+
+    writer_thread = run_in_thread(writer)
+    wait_until(lambda: lock._waiting_writers == 1)
+    reader_thread = run_in_thread(reader)
+    time.sleep(0.05)
+    # The new reader queues behind the waiting writer instead of joining the current reader
+    assert events == []
+
+    # A reader already holding the lock can still take it again without deadlocking
+    with lock.read():
+        pass
+    lock.release_read()
+    writer_thread.join(2)
+    reader_thread.join(2)
+    assert events == ["write", "read"]
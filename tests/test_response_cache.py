@@ -0,0 +1,87 @@
+from response_cache import ResponseCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_cache(logger, **kwargs):
+    return ResponseCache(logger=logger, **kwargs)
+
+
+def test_key_depends_on_the_model_prompt_and_options():
+    key = ResponseCache.make_key("llama3", "prompt", {"temperature": 0})
+    assert key == ResponseCache.make_key("llama3", "prompt", {"temperature": 0})
+    assert key != ResponseCache.make_key("mistral", "prompt", {"temperature": 0})
+    assert key != ResponseCache.make_key("llama3", "other prompt", {"temperature": 0})
+    assert key != ResponseCache.make_key("llama3", "prompt", {"temperature": 0, "num_ctx": 4096})
+
+
+def test_only_deterministic_generations_are_cacheable(logger):
+    assert make_cache(logger).is_cacheable({"temperature": 0})
+    assert not make_cache(logger).is_cacheable({"temperature": 0.7})
+    assert make_cache(logger, deterministic_only=False).is_cacheable({"temperature": 0.7})
+
+
+def test_entries_expire_after_the_ttl(monkeypatch, logger):
+    clock = FakeClock()
+    monkeypatch.setattr("response_cache.time.monotonic", clock)
+    cache = make_cache(logger, ttl=60)
+    cache.put("key", ["Hello", " world"])
+
+    clock.now += 59
+    assert cache.get("key") == ["Hello", " world"]
+    clock.now += 2
+    assert cache.get("key") is None
+    assert cache.get_stats()["entries"] == 0
+    assert cache.get_stats()["bytes"] == 0
+
+
+def test_least_recently_used_entry_is_evicted_beyond_max_entries(logger):
+    cache = make_cache(logger, max_entries=2)
+    cache.put("a", ["a"])
+    cache.put("b", ["b"])
+    # Reading "a" makes "b" the least recently used entry
+    assert cache.get("a") == ["a"]
+    cache.put("c", ["c"])
+    assert cache.get("b") is None
+    assert cache.get("a") == ["a"]
+    assert cache.get("c") == ["c"]
+
+
+def test_entries_are_evicted_beyond_max_bytes(logger):
+    cache = make_cache(logger, max_bytes=10)
+    cache.put("a", ["12345"])
+    cache.put("b", ["1234"])
+    assert cache.get_stats()["bytes"] == 9
+    cache.put("c", ["123"])
+    assert cache.get("a") is None
+    assert cache.get_stats()["bytes"] == 7
+    # Sizes are counted in UTF-8 bytes, and a response larger than the whole cache is not stored
+    cache.put("d", ["é" * 6])
+    assert cache.get("d") is None
+    assert cache.get("b") == ["1234"]
+
+
+def test_entries_are_dropped_when_the_corpus_changes(logger):
+    corpus = {"version": 1}
+    cache = make_cache(logger, corpus_version_provider=lambda: corpus["version"])
+    cache.put("key", ["answer"])
+    assert cache.get("key") == ["answer"]
+
+    corpus["version"] = 2
+    assert cache.get("key") is None
+    assert cache.get_stats()["entries"] == 0
+
+
+def test_stats_count_hits_and_misses(logger):
+    cache = make_cache(logger)
+    cache.put("key", ["answer"])
+    cache.get("key")
+    cache.get("missing")
+    stats = cache.get_stats()
+    assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 0.5)
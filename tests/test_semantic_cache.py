@@ -0,0 +1,88 @@
+import numpy as np
+
+from semantic_cache import SemanticCache
+
+
+class FakeVectorizer:
+    """
+    Embeds prompts with fixed vectors, so that the cosine similarities between them are known.
+    """
+
+    VECTORS = {
+        "What is the refund policy?": [1.0, 0.0, 0.0],
+        # Cosine similarity 0.95 with the first prompt
+        "What's the refund policy?": [0.95, np.sqrt(1 - 0.95 ** 2), 0.0],
+        # Cosine similarity 0.8 with the first prompt
+        "How do refunds work?": [0.8, 0.0, 0.6],
+        "Who wrote the report?": [0.0, 0.0, 1.0],
+    }
+
+    def vectorize_text(self, text):
+        return np.array(self.VECTORS[text], dtype=np.float32)
+
+
+def make_cache(logger, **kwargs):
+    return SemanticCache(logger=logger, text_vectorizer=FakeVectorizer(), dimension=3,
+                         similarity_threshold=0.9, **kwargs)
+
+
+def test_similar_prompts_above_the_threshold_hit(logger):
+    cache = make_cache(logger)
+    cache.store("What is the refund policy?", "llama3", "Refunds within 30 days.")
+    assert cache.lookup("What's the refund policy?", "llama3") == "Refunds within 30 days."
+    assert cache.lookup("How do refunds work?", "llama3") is None
+    assert cache.lookup("Who wrote the report?", "llama3") is None
+    stats = cache.get_stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 2, 1)
+
+
+def test_answers_are_only_returned_within_their_partition(logger):
+    cache = make_cache(logger)
+    cache.store("What is the refund policy?", "llama3", "Refunds within 30 days.")
+    assert cache.lookup("What is the refund policy?", "mistral") is None
+    cache.store("What is the refund policy?", "mistral", "30 days.")
+    assert cache.lookup("What is the refund policy?", "mistral") == "30 days."
+    assert cache.lookup("What is the refund policy?", "llama3") == "Refunds within 30 days."
+
+
+def test_entries_expire_after_the_ttl(monkeypatch, logger):
+    now = {"value": 1000.0}
+    monkeypatch.setattr("semantic_cache.time.monotonic", lambda: now["value"])
+    cache = make_cache(logger, ttl=60)
+    cache.store("What is the refund policy?", "llama3", "Refunds within 30 days.")
+    now["value"] += 61
+    assert cache.lookup("What is the refund policy?", "llama3") is None
+    assert cache.get_stats()["entries"] == 0
+
+
+def test_least_recently_used_entry_is_evicted_beyond_max_entries(logger):
+    cache = make_cache(logger, max_entries=1)
+    cache.store("What is the refund policy?", "llama3", "Refunds within 30 days.")
+    cache.store("Who wrote the report?", "llama3", "The finance team.")
+    assert cache.lookup("What is the refund policy?", "llama3") is None
+    assert cache.lookup("Who wrote the report?", "llama3") == "The finance team."
+    assert cache.index.ntotal == 1
+
+
+def test_entries_are_dropped_when_the_corpus_changes(logger):
+    corpus = {"version": 1}
+    cache = make_cache(logger, corpus_version_provider=lambda: corpus["version"])
+    cache.store("What is the refund policy?", "llama3", "Refunds within 30 days.")
+    assert cache.lookup("What is the refund policy?", "llama3") == "Refunds within 30 days."
+
+    corpus["version"] = 2
+    assert cache.lookup("What is the refund policy?", "llama3") is None
+    assert cache.index.ntotal == 0
+
+
+def test_answer_generated_on_an_older_corpus_is_not_stored(logger):
+    corpus = {"version": 1}
+    cache = make_cache(logger, corpus_version_provider=lambda: corpus["version"])
+    started_on = cache.get_corpus_version()
+    # Documents are indexed while the answer is being generated
+    corpus["version"] = 2
+    cache.store("What is the refund policy?", "llama3", "Refunds within 30 days.", corpus_version=started_on)
+    assert cache.get_stats()["entries"] == 0
+
+    cache.store("What is the refund policy?", "llama3", "Refunds within 14 days.", corpus_version=cache.get_corpus_version())
+    assert cache.lookup("What is the refund policy?", "llama3") == "Refunds within 14 days."
@@ -0,0 +1,43 @@
+import os
+import sys
+import json
+import subprocess
+
+from conftest import SOURCE_DIR
+from text_extractor import TextExtractor
+
+# The top-level modules of the parser libraries, imported by the extraction methods on first use
+PARSER_MODULES = ["pandas", "docx", "bs4", "markdown2", "odf", "PyPDF2", "pptx", "striprtf", "openpyxl"]
+
+
+def test_import_does_not_load_the_parsers():
+    # A fresh interpreter, since other tests may have loaded the parsers already
+    code = (
+        "import sys, json\n"
+        "from text_extractor import TextExtractor\n"
+        "extractor = TextExtractor()\n"
+        "extractor.is_supported('report.pdf')\n"
+        f"print(json.dumps([name for name in {PARSER_MODULES!r} if name in sys.modules]))\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=SOURCE_DIR,
+        env={**os.environ, "PYTHONPATH": SOURCE_DIR},
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    assert json.loads(result.stdout) == []
+
+
+def test_every_extension_has_an_extraction_method():
+    for extension, method_name in TextExtractor.EXTRACTORS.items():
+        assert callable(getattr(TextExtractor, method_name)), extension
+
+
+def test_extensions_match_case_insensitively():
+    extractor = TextExtractor()
+    assert extractor.is_supported("notes.TXT")
+    assert extractor.is_supported("archive/report.Pdf")
+    assert not extractor.is_supported("image.png")
+    assert not extractor.is_supported("README")